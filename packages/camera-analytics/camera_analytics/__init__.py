@@ -1,6 +1,13 @@
 """ObservAI camera analytics package."""
 
 from .config import AnalyticsConfig, load_config
-from .run import main
+
+
+def main() -> None:
+  # run.py pulls in ultralytics/torch; keep importing the package (e.g. in supervisor workers) light
+  from .run import main as run_main
+
+  run_main()
+
 
 __all__ = ["AnalyticsConfig", "load_config", "main"]
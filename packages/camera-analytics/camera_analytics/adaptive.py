@@ -0,0 +1,108 @@
+"""Feedback controller that trades detection quality for frame rate."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .config import AdaptiveConfig, QualityLevel
+
+
+@dataclass
+class QualityChange:
+  ts: float
+  from_level: int
+  to_level: int
+  reason: str
+
+  def to_dict(self) -> Dict[str, object]:
+    return {"ts": round(self.ts, 3), "from": self.from_level, "to": self.to_level, "reason": self.reason}
+
+
+class QualityController:
+  """
+  Walk a ladder of quality levels to keep the pipeline near ``target_fps``.
+
+  Two signals are combined:
+
+  - measured FPS, the frames actually processed per second;
+  - achievable FPS, ``1000 / per-frame processing ms`` from the stage timings.
+
+  The controller steps down only when both are below ``target * low_ratio``. A
+  source that is simply slow (a 5 FPS camera) therefore does not degrade
+  quality. It steps up when the achievable rate clears ``target * high_ratio``.
+  The gap between the two ratios, the ``hold_seconds`` a condition must persist
+  and the ``cooldown_seconds`` between changes keep it from oscillating.
+  """
+
+  def __init__(self, config: AdaptiveConfig, history: int = 20) -> None:
+    if not config.levels:
+      raise ValueError("Adaptive quality control needs at least one level")
+    self.config = config
+    self.level_index = config.start_level
+    self.changes: List[QualityChange] = []
+    self.change_count = 0
+    self.history = history
+    self.last_fps = 0.0
+    self.last_achievable_fps = 0.0
+    self._pressure_since: Optional[float] = None
+    self._headroom_since: Optional[float] = None
+    self._last_change = 0.0
+
+  @property
+  def level(self) -> QualityLevel:
+    return self.config.levels[self.level_index]
+
+  def update(self, fps: float, frame_ms: float, now: Optional[float] = None) -> Optional[QualityLevel]:
+    """Feed one measurement; returns the new level when the controller moves."""
+    now = time.time() if now is None else now
+    target = self.config.target_fps
+    achievable = 1000.0 / frame_ms if frame_ms > 0 else float("inf")
+    self.last_fps = fps
+    self.last_achievable_fps = achievable
+
+    pressure = fps < target * self.config.low_ratio and achievable < target * self.config.low_ratio
+    headroom = achievable > target * self.config.high_ratio
+    self._pressure_since = (self._pressure_since or now) if pressure else None
+    self._headroom_since = (self._headroom_since or now) if headroom else None
+
+    if now - self._last_change < self.config.cooldown_seconds:
+      return None
+
+    if pressure and now - self._pressure_since >= self.config.hold_seconds:
+      if self.level_index < len(self.config.levels) - 1:
+        return self._move(self.level_index + 1, now, f"fps {fps:.1f} (achievable {achievable:.1f}) < target {target:.1f}")
+    elif headroom and now - self._headroom_since >= self.config.hold_seconds:
+      if self.level_index > 0:
+        return self._move(self.level_index - 1, now, f"achievable fps {achievable:.1f} > target {target:.1f}")
+    return None
+
+  def _move(self, index: int, now: float, reason: str) -> QualityLevel:
+    change = QualityChange(ts=now, from_level=self.level_index, to_level=index, reason=reason)
+    self.changes.append(change)
+    self.change_count += 1
+    del self.changes[: -self.history]
+    self.level_index = index
+    self._last_change = now
+    self._pressure_since = None
+    self._headroom_since = None
+    level = self.level
+    print(
+      f"[INFO] Quality level {change.from_level} -> {change.to_level} "
+      f"(imgsz={level.imgsz}, stride={level.vid_stride}, face every {level.face_interval} frames): {reason}"
+    )
+    return level
+
+  def to_dict(self) -> Dict[str, object]:
+    level = self.level
+    return {
+      "level": self.level_index,
+      "imgsz": level.imgsz,
+      "vidStride": level.vid_stride,
+      "faceInterval": level.face_interval,
+      "targetFps": self.config.target_fps,
+      "achievableFps": round(min(self.last_achievable_fps, 999.0), 1),
+      "changeCount": self.change_count,
+      "changes": [change.to_dict() for change in self.changes[-5:]],
+    }
@@ -0,0 +1,182 @@
+"""Constant-memory aggregates of zone visit durations: running totals, rolling windows and percentile sketches."""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+# Rolling windows reported next to the all-time figures, keyed by their label
+DEFAULT_WINDOWS: Dict[str, float] = {"5m": 300.0, "15m": 900.0, "60m": 3600.0}
+
+
+@dataclass
+class DurationSummary:
+  visits: int = 0
+  average_seconds: float = 0.0
+  longest_seconds: float = 0.0
+  p50_seconds: float = 0.0
+  p90_seconds: float = 0.0
+
+  def to_dict(self) -> Dict[str, object]:
+    return {
+      "visits": self.visits,
+      "avgSeconds": round(self.average_seconds, 1),
+      "longestSeconds": round(self.longest_seconds, 1),
+      "p50Seconds": round(self.p50_seconds, 1),
+      "p90Seconds": round(self.p90_seconds, 1),
+    }
+
+
+class LogBuckets:
+  """
+  Log-spaced histogram layout for a quantile sketch (as in DDSketch).
+
+  Bucket 0 holds values up to ``min_value``, and bucket i holds values in
+  (min_value * gamma**(i-1), min_value * gamma**i]. Reading a bucket back as
+  its estimator keeps quantiles within ``relative_accuracy`` of the true
+  value. Values above ``max_value`` land in the last bucket.
+  """
+
+  def __init__(self, relative_accuracy: float = 0.03, min_value: float = 0.5, max_value: float = 86400.0) -> None:
+    self.gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+    self.log_gamma = math.log(self.gamma)
+    self.min_value = min_value
+    self.size = int(math.ceil(math.log(max_value / min_value) / self.log_gamma)) + 1
+    upper = min_value * self.gamma ** np.arange(self.size)
+    self.values = np.concatenate([[min_value / 2.0], 2.0 * upper[1:] / (1.0 + self.gamma)])
+
+  def index(self, value: float) -> int:
+    if value <= self.min_value:
+      return 0
+    return min(self.size - 1, int(math.ceil(math.log(value / self.min_value) / self.log_gamma)))
+
+  def quantiles(self, counts: np.ndarray, total: int, quantiles: Sequence[float]) -> np.ndarray:
+    ranks = np.ceil(np.asarray(quantiles) * total).clip(1, total)
+    return self.values[np.searchsorted(np.cumsum(counts), ranks)]
+
+
+class DurationStats:
+  """
+  Streaming statistics for one zone's completed visit durations.
+
+  ``add`` and the rolling-window upkeep are O(1) in the number of visits seen,
+  and memory is fixed by the sketch layout and the longest window. All-time
+  visits, mean and longest are exact. Percentiles come from the sketch, and
+  windows move in ``bucket_seconds`` steps. Summaries are cached until the
+  next ``add`` or window step, so reading them every metrics tick is cheap.
+  """
+
+  def __init__(
+    self,
+    windows: Dict[str, float] = DEFAULT_WINDOWS,
+    bucket_seconds: float = 60.0,
+    buckets: Optional[LogBuckets] = None,
+  ) -> None:
+    self.buckets = buckets or LogBuckets()
+    self.bucket_seconds = bucket_seconds
+    self.labels = list(windows)
+    self.spans = [max(1, int(round(seconds / bucket_seconds))) for seconds in windows.values()]
+    self.slots = max(self.spans, default=1)
+
+    self.count = 0
+    self.total = 0.0
+    self.longest = 0.0
+    self.sketch = np.zeros(self.buckets.size, dtype=np.int64)
+
+    # Ring of per-bucket sketches, plus running totals for every window over the ring
+    self.ring_counts = np.zeros((self.slots, self.buckets.size), dtype=np.int32)
+    self.ring_totals = np.zeros(self.slots, dtype=np.float64)
+    self.ring_longest = np.zeros(self.slots, dtype=np.float64)
+    self.ring_visits = np.zeros(self.slots, dtype=np.int64)
+    self.window_counts = np.zeros((len(self.spans), self.buckets.size), dtype=np.int64)
+    self.window_totals = np.zeros(len(self.spans), dtype=np.float64)
+    self.window_visits = np.zeros(len(self.spans), dtype=np.int64)
+    self.current: Optional[int] = None
+
+    self._summary_cache: Optional[DurationSummary] = None
+    self._windows_cache: Optional[Dict[str, DurationSummary]] = None
+
+  def _advance(self, now: float) -> None:
+    bucket = int(now // self.bucket_seconds)
+    if self.current is None:
+      self.current = bucket
+      return
+    if bucket - self.current >= self.slots:
+      # Idle for longer than the longest window: everything has expired
+      self.ring_counts[:] = 0
+      self.ring_totals[:] = 0.0
+      self.ring_longest[:] = 0.0
+      self.ring_visits[:] = 0
+      self.window_counts[:] = 0
+      self.window_totals[:] = 0.0
+      self.window_visits[:] = 0
+      self.current = bucket
+      self._windows_cache = None
+      return
+    if self.current < bucket:
+      self._windows_cache = None
+    while self.current < bucket:
+      self.current += 1
+      # The bucket span steps old leaves each window; for the longest window that is this slot
+      for window, span in enumerate(self.spans):
+        leaving = (self.current - span) % self.slots
+        self.window_counts[window] -= self.ring_counts[leaving]
+        self.window_totals[window] -= self.ring_totals[leaving]
+        self.window_visits[window] -= self.ring_visits[leaving]
+      slot = self.current % self.slots
+      self.ring_counts[slot] = 0
+      self.ring_totals[slot] = 0.0
+      self.ring_longest[slot] = 0.0
+      self.ring_visits[slot] = 0
+
+  def add(self, duration: float, now: float) -> None:
+    self._advance(now)
+    duration = max(0.0, float(duration))
+    index = self.buckets.index(duration)
+    self.count += 1
+    self.total += duration
+    self.longest = max(self.longest, duration)
+    self.sketch[index] += 1
+
+    slot = self.current % self.slots
+    self.ring_counts[slot, index] += 1
+    self.ring_totals[slot] += duration
+    self.ring_longest[slot] = max(self.ring_longest[slot], duration)
+    self.ring_visits[slot] += 1
+    self.window_counts[:, index] += 1
+    self.window_totals += duration
+    self.window_visits += 1
+    self._summary_cache = None
+    self._windows_cache = None
+
+  def _summary(self, counts: np.ndarray, visits: int, total: float, longest: float) -> DurationSummary:
+    if visits == 0:
+      return DurationSummary()
+    p50, p90 = np.minimum(self.buckets.quantiles(counts, visits, (0.5, 0.9)), longest).tolist()
+    return DurationSummary(visits, total / visits, longest, p50, p90)
+
+  def summary(self) -> DurationSummary:
+    """All-time figures."""
+    if self._summary_cache is None:
+      self._summary_cache = self._summary(self.sketch, self.count, self.total, self.longest)
+    return self._summary_cache
+
+  def windows(self, now: float) -> Dict[str, DurationSummary]:
+    """Figures for every rolling window ending at ``now``."""
+    self._advance(now)
+    if self._windows_cache is not None:
+      return self._windows_cache
+    result: Dict[str, DurationSummary] = {}
+    for window, (label, span) in enumerate(zip(self.labels, self.spans)):
+      visits = int(self.window_visits[window])
+      if visits == 0:
+        result[label] = DurationSummary()
+        continue
+      slots = (self.current - np.arange(span)) % self.slots
+      longest = float(self.ring_longest[slots].max())
+      result[label] = self._summary(self.window_counts[window], visits, float(self.window_totals[window]), longest)
+    self._windows_cache = result
+    return result
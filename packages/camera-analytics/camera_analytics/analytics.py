@@ -1,11 +1,10 @@
 from __future__ import annotations
 
-import json
+import math
 import time
-from collections import defaultdict, deque
-from dataclasses import dataclass, field
+from collections import deque
 from pathlib import Path
-from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
 
 import cv2
 import numpy as np
@@ -17,74 +16,66 @@ except Exception:  # pragma: no cover - handled at runtime
 
 from ultralytics import YOLO
 
-from .config import AnalyticsConfig, EntranceLine, Zone
-from .geometry import heatmap_bin, line_side, point_in_polygon
+from .adaptive import QualityController
+from .aggregates import DurationStats
+from .capture import DROP_OLDEST, LatestFrameCapture, SequentialCapture, is_live_source, open_capture
+from .config import AnalyticsConfig, QualityLevel, Zone
+from .demographics import (
+  DemographicsJob,
+  DemographicsScheduler,
+  DemographicsWorker,
+  FaceObservation,
+  TrackSnapshot,
+  build_mosaic,
+  detect_faces,
+  match_faces,
+  match_mosaic_faces,
+)
+from .detectors import DetectorSpec, load_detector
+from .detlog import DetectionLogWriter
+from .geometry import (
+  CompiledZones,
+  EntranceSegments,
+  NormalizedBox,
+  ZoneRaster,
+  foot_points,
+  zones_bounding_box,
+)
+from .heatmap import HeatmapAccumulator
+from .motion import MotionGate
 from .metrics import (
   ActivePersonSnapshot,
   CameraMetrics,
+  EntranceSnapshot,
   QueueSnapshot,
   TableSnapshot,
+  AGE_BUCKETS,
   bucket_for_age,
-  default_age_buckets,
 )
+from .reid import ReidCache, normalize_embedding
+from .runtime import ort_session_options
+from .tracks import ENTERING, EXITING, GENDERS, PRESENT, STATES, TrackedPerson, TrackTable
+from .writer import MetricsWriter
 
+if TYPE_CHECKING:
+  from .history import MetricsHistory
 
-@dataclass
-class TrackedPerson:
-  track_id: int
-  first_seen: float
-  last_seen: float
-  bbox_norm: Tuple[float, float, float, float]
-  prev_center_norm: Optional[Tuple[float, float]] = None
-  center_norm: Tuple[float, float] = (0.0, 0.0)
-  counted_in: bool = False
-  counted_out: bool = False
-  inside: bool = False
-  age: Optional[float] = None
-  gender: str = "unknown"
-  state: str = "entering"
-  active_zones: Dict[str, float] = field(default_factory=dict)
-
-  # Temporal smoothing for demographics
-  age_history: deque = field(default_factory=lambda: deque(maxlen=24))
-  gender_history: deque = field(default_factory=lambda: deque(maxlen=24))
-  gender_confidence: float = 0.5
-
-  def contains_pixel(self, px: float, py: float) -> bool:
-    x1, y1, x2, y2 = self.bbox_norm
-    return x1 <= px <= x2 and y1 <= py <= y2
-
-  def update_age(self, new_age: float, max_samples: int = 10) -> None:
-    """Update age with temporal smoothing - increased samples for stability"""
-    if new_age is None:
-      return
-    self.age_history.append(float(new_age))
-    samples = list(self.age_history)
-    if len(samples) >= 3:
-      self.age = float(np.median(samples))
-    else:
-      self.age = float(np.mean(samples))
 
-  def update_gender(self, new_gender: str, max_samples: int = 10) -> None:
-    """Update gender with majority voting - increased samples for stability"""
-    if not new_gender or new_gender == "unknown":
-      return
+def _result_tracks(result) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+  """Extract (track ids, pixel xyxy boxes) from an ultralytics tracking result."""
+  if result.boxes.id is None:
+    return None, None
+  boxes = result.boxes.xyxy.cpu().numpy()
+  track_ids = result.boxes.id.int().cpu().numpy()
+  return track_ids, boxes
 
-    self.gender_history.append(new_gender)
-    if len(self.gender_history) > max_samples:
-      self.gender_history.popleft()
 
-    male_votes = self.gender_history.count("male")
-    female_votes = self.gender_history.count("female")
-
-    total_votes = len(self.gender_history)
-    if total_votes == 0:
-      return
-
-    if male_votes / total_votes >= 0.6:
-      self.gender = "male"
-    elif female_votes / total_votes >= 0.6:
-      self.gender = "female"
+def offset_boxes(boxes: Optional[np.ndarray], offset: Tuple[int, int]) -> Optional[np.ndarray]:
+  """Shift pixel xyxy boxes from crop coordinates back into the full frame."""
+  if boxes is None or offset == (0, 0):
+    return boxes
+  ox, oy = offset
+  return boxes + np.array([ox, oy, ox, oy], dtype=boxes.dtype)
 
 
 class CameraAnalyticsEngine:
@@ -93,12 +84,22 @@ class CameraAnalyticsEngine:
     config: AnalyticsConfig,
     source: str | int,
     output_path: Path,
-    model_path: str = "yolov8n.pt",
+    model_path: Optional[str] = "yolov8n.pt",
     sample_interval: float = 1.0,
     display: bool = False,
     show_zones: bool = False,
     on_metrics: Optional[Callable[[Dict[str, object]], None]] = None,
     on_tracks: Optional[Callable[[List[Dict[str, object]]], None]] = None,
+    model: Optional[YOLO] = None,
+    detector: Optional[DetectorSpec] = None,
+    live: Optional[bool] = None,
+    capture_buffer: int = 1,
+    drop_policy: str = DROP_OLDEST,
+    demographics: bool = True,
+    record_path: Optional[Path] = None,
+    track_ttl: Optional[float] = None,
+    async_demographics: bool = True,
+    camera_id: Optional[str] = None,
   ) -> None:
     self.config = config
     self.source = source
@@ -109,33 +110,37 @@ class CameraAnalyticsEngine:
     self.on_metrics = on_metrics
     self.on_tracks = on_tracks
 
-    self.model = YOLO(model_path)
-    # Optimize YOLO runtime configuration
-    try:
-      self.model.overrides['verbose'] = False
-      self.model.overrides['conf'] = 0.5
-      self.model.overrides['iou'] = 0.45
-      self.model.overrides['max_det'] = 50
-      self.model.overrides['half'] = False
-      self.model.overrides['device'] = 'cpu'
-    except Exception:  # pragma: no cover - safety guard
-      pass
+    # A pre-loaded model can be shared between engines (see multi.py); with neither a
+    # model nor a model_path the engine only runs analytics on detections fed to it
+    self.detector_spec = detector or DetectorSpec()
+    if model is None and model_path is not None:
+      model = load_detector(model_path, self.detector_spec)
+    self.model = model
 
     # Frame skipping for face analysis
     self.face_detection_interval = 10
     self.frame_count = 0
 
-    # Adjust video stride for remote streams to improve stability
+    # Live sources are read on a capture thread into a latest-frame buffer, so a
+    # slow frame loop drops stale frames instead of letting the decoder back up.
+    # Recorded files are read sequentially and honour vid_stride instead.
+    self.live = is_live_source(self.source) if live is None else live
+    self.capture_buffer = capture_buffer
+    self.drop_policy = drop_policy
+    self.capture: Optional[LatestFrameCapture | SequentialCapture] = None
     self.vid_stride = 1
-    if isinstance(self.source, str):
-      source_str = str(self.source)
-      if source_str.startswith(("rtsp://", "rtmp://", "http://", "https://")):
-        self.vid_stride = 2
-        print(f"[INFO] Remote stream detected. Using vid_stride={self.vid_stride} for efficiency")
+    self.imgsz = self.detector_spec.imgsz
+    if self.live:
+      print(f"[INFO] Live source detected. Latest-frame capture (buffer={capture_buffer}, policy={drop_policy})")
 
-    if FaceAnalysis is not None:
+    if FaceAnalysis is not None and demographics:
       try:
-        self.face_app = FaceAnalysis(name="buffalo_s", providers=["CPUExecutionProvider"])
+        # Respect a per-process thread budget when one is configured (see supervisor.py)
+        session_options = ort_session_options()
+        face_kwargs = {"sess_options": session_options} if session_options is not None else {}
+        self.face_app = FaceAnalysis(
+          name="buffalo_s", providers=["CPUExecutionProvider"], **face_kwargs
+        )
         self.face_app.prepare(ctx_id=0, det_size=(320, 320))
         print("[INFO] InsightFace initialized (buffalo_s model)")
       except Exception as err:  # pragma: no cover - runtime-only
@@ -144,11 +149,34 @@ class CameraAnalyticsEngine:
     else:
       self.face_app = None
 
-    self.tracks: Dict[int, TrackedPerson] = {}
+    # Face analysis runs on a worker thread; results are applied by track id when ready
+    self.demographics_worker: Optional[DemographicsWorker] = None
+    if self.face_app is not None and async_demographics:
+      self.demographics_worker = DemographicsWorker(self._analyse_faces, on_drop=self._refund_face_budget)
+    self.reid: Optional[ReidCache] = None
+    if self.face_app is not None and self.config.reid.enabled:
+      self.reid = ReidCache(self.config.reid)
+    self.face_scheduler: Optional[DemographicsScheduler] = None
+    if self.face_app is not None and self.config.demographics.schedule:
+      self.face_scheduler = DemographicsScheduler(self.config.demographics)
+
+    # Seconds a track may go unseen before it is dropped (and counted out); overrides the config
+    self.track_ttl = self.config.tracking.ttl_seconds if track_ttl is None else track_ttl
     self.people_in = 0
     self.people_out = 0
-    self.heatmap = np.zeros(
-      (self.config.heatmap.grid_height, self.config.heatmap.grid_width), dtype=np.float32
+    # Doors are finite segments; every track's step is tested against all of them at once
+    self.entrances = self.config.all_entrances()
+    self.entrance_ids: List[str] = [entrance.id for entrance in self.entrances]
+    self.entrance_geometry = EntranceSegments(self.entrances)
+    self.entrance_counts: Dict[str, Dict[str, int]] = {
+      entrance_id: {"in": 0, "out": 0} for entrance_id in self.entrance_ids
+    }
+    heatmap_config = self.config.heatmap
+    self.heatmap = HeatmapAccumulator(
+      heatmap_config.grid_width,
+      heatmap_config.grid_height,
+      half_life=heatmap_config.half_life_seconds,
+      sigma=heatmap_config.sigma_cells,
     )
 
     # zone stats keyed by zone id
@@ -163,340 +191,584 @@ class CameraAnalyticsEngine:
     else:
       self.queue_id = None
 
-    self.zone_active_members: Dict[str, Dict[int, float]] = defaultdict(dict)
-    self.zone_completed_durations: Dict[str, list[float]] = defaultdict(list)
+    # Polygons are compiled once; membership for all tracks is one array call per frame
+    self.zone_ids: List[str] = list(self.zone_definitions)
+    self.zone_geometry: CompiledZones | ZoneRaster = CompiledZones(
+      [zone.polygon for zone in self.zone_definitions.values()]
+    )
+    if self.config.zone_raster.enabled and self.zone_ids:
+      raster_config = self.config.zone_raster
+      self.zone_geometry = ZoneRaster(self.zone_geometry, raster_config.width, raster_config.height)
+      print(
+        f"[INFO] Zone raster {raster_config.width}x{raster_config.height}: "
+        f"{self.zone_geometry.agreement():.2%} agreement with the zone polygons"
+      )
+
+    # Live tracks in NumPy columns (boxes, centres, times, flags, zone membership), one row per track
+    self.tracks = TrackTable(self.zone_ids)
+    # Completed visit durations per zone, summarised in constant memory
+    self.zone_durations: Dict[str, DurationStats] = {zone_id: DurationStats() for zone_id in self.zone_ids}
 
     # Performance metrics
     self.fps = 0.0
     self.fps_counter = 0
     self.fps_start_time = time.time()
+    self.last_write = 0.0
+    # Clock of the most recent frame; wall time live, media time for offline runs
+    self.last_timestamp = time.time()
+    # Stats objects owned by an outer runner, reported next to our own under "pipeline"
+    self.extra_pipeline_stats: Dict[str, object] = {}
+    # Per-stage processing time (ms, moving average) feeding the quality controller
+    self.stage_ms: Dict[str, float] = {}
+
+    # Optional log of tracker output and face attributes for model-free replay (see replay.py)
+    self.recorder: Optional[DetectionLogWriter] = None
+    if record_path is not None:
+      self.recorder = DetectionLogWriter(record_path)
+      print(f"[INFO] Recording detections to {record_path}")
+
+    self.history: Optional[MetricsHistory] = None
+    if self.config.history.enabled:
+      # Imported here so `python -m camera_analytics.history` does not import itself twice
+      from .history import open_history, source_camera_key
+
+      self.history = open_history(self.config.history, self.output_path, camera_id or source_camera_key(source))
+      print(f"[INFO] Metrics history for '{self.history.camera}' in {self.history.path}")
+    # Metrics files and history samples are written off the frame loop
+    self.metrics_writer = MetricsWriter(self.output_path, history=self.history)
+    self.detection_skipped = False
+
+    # Restrict inference to the region covering all configured zones
+    self.roi_norm: Optional[NormalizedBox] = None
+    if self.config.roi.enabled:
+      self.roi_norm = self._resolve_roi()
+
+    self.motion: Optional[MotionGate] = None
+    if self.config.motion.enabled:
+      self.motion = MotionGate(self.config.motion)
+      print(f"[INFO] Motion gating enabled (refresh every {self.config.motion.refresh_seconds:.1f}s)")
+
+    self.quality: Optional[QualityController] = None
+    if self.config.adaptive.enabled:
+      self.quality = QualityController(self.config.adaptive)
+      self._apply_quality(self.quality.level)
+      print(f"[INFO] Adaptive quality enabled (target {self.config.adaptive.target_fps:.1f} FPS)")
 
   def run(self) -> None:
-    last_write = 0.0
-
-    results = self.model.track(
-      source=self.source,
-      stream=True,
-      verbose=False,
-      classes=[0],
-      tracker="bytetrack.yaml",
-      persist=True,
-      imgsz=512,
-      device='cpu',
-      vid_stride=self.vid_stride,
-    )
+    self.capture = self.open_capture()
 
     print("[INFO] Starting camera analytics pipeline...")
     print(f"[INFO] Face detection interval: every {self.face_detection_interval} frames")
     print(f"[INFO] Video stride: {self.vid_stride} (source: {self.source})")
 
+    self.capture.start()
     try:
-      for result in results:
-        frame = result.orig_img
-        frame_h, frame_w = frame.shape[:2]
+      for captured in self.capture:
+        frame = captured.frame
         timestamp = time.time()
-        self._update_tracks(result, frame_w, frame_h, timestamp)
-        self._update_demographics(frame)
-        self._emit_track_stream(timestamp)
-
-        self.fps_counter += 1
-        if timestamp - self.fps_start_time >= 1.0:
-          self.fps = self.fps_counter / (timestamp - self.fps_start_time)
-          self.fps_counter = 0
-          self.fps_start_time = timestamp
+        track_ids, boxes = None, None
+        if self.needs_detection(frame, timestamp):
+          started = time.perf_counter()
+          track_ids, boxes = self._detect(frame)
+          self._record_stage("detect", started)
+        self.process_frame(frame, track_ids, boxes, timestamp)
 
         if self.display:
+          frame_h, frame_w = frame.shape[:2]
           annotated = self._draw_overlay(frame.copy(), frame_w, frame_h)
-        else:
-          annotated = None
-
-        if timestamp - last_write >= self.sample_interval:
-          metrics = self._build_metrics()
-          self._emit_metrics_stream(metrics, int(timestamp * 1000))
-          self._write_metrics(metrics)
-          last_write = timestamp
-
-        if self.display and annotated is not None:
           cv2.imshow("ObservAI Camera Analytics", annotated)
           key = cv2.waitKey(1) & 0xFF
           if key in (ord("q"), 27):
             break
     finally:
+      self.capture.stop()
+      self.close()
       if self.display:
         cv2.destroyAllWindows()
 
+  def close(self) -> None:
+    """Stop background workers, write pending metrics, flush the detection log and close the metrics history."""
+    if self.demographics_worker is not None:
+      self.demographics_worker.stop()
+    self.metrics_writer.stop()
+    if self.recorder is not None:
+      self.recorder.close()
+    if self.history is not None:
+      self.history.close()
+
+  def open_capture(self) -> LatestFrameCapture | SequentialCapture:
+    self.capture = open_capture(
+      self.source,
+      live=self.live,
+      stride=self.vid_stride,
+      buffer_size=self.capture_buffer,
+      drop_policy=self.drop_policy,
+    )
+    return self.capture
+
+  def needs_detection(self, frame: np.ndarray, now: float) -> bool:
+    """Ask the motion gate whether to run the detector; on a skip, hold tracks in place."""
+    if self.motion is None:
+      return True
+    started = time.perf_counter()
+    detect = self.motion.should_detect(frame, now)
+    self._record_stage("motion", started)
+    if not detect:
+      self.hold_tracks(now)
+    self.detection_skipped = not detect
+    return detect
+
+  def hold_tracks(self, now: float) -> None:
+    # Nothing moved: existing tracks are still where they were, so keep them fresh
+    self.tracks.last_seen[self.tracks.live] = now
+
+  def _resolve_roi(self) -> Optional[NormalizedBox]:
+    box = zones_bounding_box(self.config, self.config.roi.margin)
+    if box is None:
+      print("[WARN] ROI inference requested but no zones are configured. Using the full frame.")
+      return None
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    if area > self.config.roi.max_area:
+      print(f"[INFO] Zones cover {area:.0%} of the frame. ROI inference disabled.")
+      return None
+    print(f"[INFO] ROI inference on {area:.0%} of the frame: {tuple(round(v, 3) for v in box)}")
+    return box
+
+  def roi_crop(self, frame: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Crop the inference region; returns the crop and its pixel offset in the frame."""
+    if self.roi_norm is None:
+      return frame, (0, 0)
+    frame_h, frame_w = frame.shape[:2]
+    x1, y1, x2, y2 = self.roi_norm
+    px1, py1 = int(x1 * frame_w), int(y1 * frame_h)
+    px2, py2 = math.ceil(x2 * frame_w), math.ceil(y2 * frame_h)
+    return frame[py1:py2, px1:px2], (px1, py1)
+
+  def roi_imgsz(self) -> int:
+    """Scale imgsz with the crop so pixel density matches full-frame inference."""
+    if self.roi_norm is None or self.detector_spec.fixed_imgsz:
+      return self.imgsz
+    x1, y1, x2, y2 = self.roi_norm
+    scale = max(x2 - x1, y2 - y1)
+    # Keep it a multiple of the 32 px model stride
+    return max(32, int(math.ceil(self.imgsz * scale / 32.0)) * 32)
+
+  def process_frame(
+    self,
+    frame: np.ndarray,
+    track_ids: Optional[np.ndarray],
+    boxes: Optional[np.ndarray],
+    timestamp: float,
+  ) -> None:
+    """Run the analytics for one frame given tracker ids and pixel xyxy boxes."""
+    frame_h, frame_w = frame.shape[:2]
+    self.last_timestamp = timestamp
+    self.frame_count += 1
+    if self.recorder is not None:
+      boxes_norm = None if boxes is None else boxes / np.array([frame_w, frame_h, frame_w, frame_h])
+      self.recorder.write_frame(timestamp, self.frame_count, track_ids, boxes_norm, skipped=self.detection_skipped)
+    self.detection_skipped = False
+
+    started = time.perf_counter()
+    if track_ids is not None:
+      self._apply_detections(track_ids, boxes, frame_w, frame_h, timestamp)
+    self._record_stage("tracks", started)
+
+    if self.demographics_worker is not None:
+      self._apply_demographics_results()
+    if self.face_app is not None and self.frame_count % self.face_detection_interval == 0:
+      started = time.perf_counter()
+      snapshots = self._track_snapshots(timestamp)
+      # Skip the round entirely when no track is due for analysis
+      if any(track.analyse for track in snapshots):
+        if self.demographics_worker is not None:
+          self.demographics_worker.submit(frame, snapshots, timestamp)
+        else:
+          self._update_demographics(frame, snapshots)
+      # Spread the cost over the frames it covers so the controller sees a per-frame figure
+      self._record_stage("demographics", started, weight=1.0 / self.face_detection_interval)
+    self._emit_track_stream(timestamp)
+
+    self.fps_counter += 1
+    if timestamp - self.fps_start_time >= 1.0:
+      self.fps = self.fps_counter / (timestamp - self.fps_start_time)
+      self.fps_counter = 0
+      self.fps_start_time = timestamp
+      if self.quality is not None:
+        level = self.quality.update(self.fps, sum(self.stage_ms.values()), now=timestamp)
+        if level is not None:
+          self._apply_quality(level)
+
+    if timestamp - self.last_write >= self.sample_interval:
+      metrics = self._build_metrics(timestamp)
+      self._emit_metrics_stream(metrics, int(timestamp * 1000))
+      self._write_metrics(metrics, timestamp)
+      self.last_write = timestamp
+
+  def _record_stage(self, name: str, started: float, weight: float = 1.0) -> None:
+    self.record_stage_ms(name, (time.perf_counter() - started) * 1000.0 * weight)
+
+  def record_stage_ms(self, name: str, elapsed_ms: float) -> None:
+    """Fold one frame's cost of a stage into its moving average (also used by multi.py for batched work)."""
+    previous = self.stage_ms.get(name)
+    self.stage_ms[name] = elapsed_ms if previous is None else 0.8 * previous + 0.2 * elapsed_ms
+
+  def _apply_quality(self, level: QualityLevel) -> None:
+    if not self.detector_spec.fixed_imgsz:
+      self.imgsz = level.imgsz
+    self.vid_stride = level.vid_stride
+    self.face_detection_interval = level.face_interval
+    if self.capture is not None:
+      self.capture.stride = level.vid_stride
+    # Demographics timing was measured at the old cadence
+    self.stage_ms.pop("demographics", None)
+
+  def _detect(self, frame: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    crop, offset = self.roi_crop(frame)
+    # persist=True keeps the ByteTrack state on the predictor between calls
+    results = self.model.track(
+      source=crop,
+      verbose=False,
+      classes=[0],
+      tracker="bytetrack.yaml",
+      persist=True,
+      imgsz=self.roi_imgsz(),
+      device='cpu',
+    )
+    track_ids, boxes = _result_tracks(results[0])
+    return track_ids, offset_boxes(boxes, offset)
+
   def _update_tracks(self, result, frame_w: int, frame_h: int, now: float) -> None:
-    active_ids = set()
-    if result.boxes.id is None:
+    track_ids, boxes = _result_tracks(result)
+    if track_ids is None:
       return
+    self._apply_detections(track_ids, boxes, frame_w, frame_h, now)
 
-    boxes = result.boxes.xyxy.cpu().numpy()
-    track_ids = result.boxes.id.int().cpu().numpy()
-
-    for track_id, box in zip(track_ids, boxes):
-      x1, y1, x2, y2 = box.tolist()
-      x1_norm, y1_norm = x1 / frame_w, y1 / frame_h
-      x2_norm, y2_norm = x2 / frame_w, y2 / frame_h
-      center_norm = ((x1_norm + x2_norm) / 2.0, (y1_norm + y2_norm) / 2.0)
-      active_ids.add(int(track_id))
-
-      person = self.tracks.get(int(track_id))
-      if not person:
-        person = TrackedPerson(
-          track_id=int(track_id),
-          first_seen=now,
-          last_seen=now,
-          bbox_norm=(x1_norm, y1_norm, x2_norm, y2_norm),
-          center_norm=center_norm,
-        )
-        person.state = "entering"
-        self.tracks[int(track_id)] = person
-      else:
-        person.prev_center_norm = person.center_norm
-        person.center_norm = center_norm
-        person.bbox_norm = (x1_norm, y1_norm, x2_norm, y2_norm)
-        person.last_seen = now
-
-      self._update_inside_state(person, now)
-      self._update_zones(person, now)
-      self._update_heatmap(person.center_norm)
-
-    self._drop_stale_tracks(active_ids, now)
-
-  def _update_inside_state(self, person: TrackedPerson, now: float) -> None:
-    if not self.config.entrance_line:
-      person.inside = True
-      dwell = now - person.first_seen
-      person.state = "entering" if dwell < 2.0 else "present"
+  def _apply_detections(
+    self, track_ids: np.ndarray, boxes: np.ndarray, frame_w: int, frame_h: int, now: float
+  ) -> None:
+    boxes_norm = np.asarray(boxes, dtype=np.float64).reshape(-1, 4) / (frame_w, frame_h, frame_w, frame_h)
+    rows, _ = self.tracks.observe(np.asarray(track_ids).astype(np.int64).ravel(), boxes_norm, now)
+    self._update_inside_state(rows, now)
+    if self.zone_ids:
+      self._update_zones(rows, now)
+    self._update_heatmap(foot_points(self.tracks.bbox[rows]), now)
+    self._drop_stale_tracks(now, self.track_ttl)
+
+  def _update_inside_state(self, rows: np.ndarray, now: float) -> None:
+    """Inside flag and state for the given track rows, counting any door crossings."""
+    table = self.tracks
+    dwell = now - table.first_seen[rows]
+    if not self.entrance_ids:
+      table.set_inside_rows(rows, True)
+      table.state[rows] = np.where(dwell < 2.0, ENTERING, PRESENT)
       return
 
-    entrance: EntranceLine = self.config.entrance_line
-    side = line_side(person.center_norm, entrance.start, entrance.end)
-
-    if entrance.inside_on in {"top", "above"}:
-      inside = side < 0
-    elif entrance.inside_on in {"bottom", "below"}:
-      inside = side > 0
-    elif entrance.inside_on == "left":
-      inside = side > 0
-    elif entrance.inside_on == "right":
-      inside = side < 0
-    else:
-      inside = side < 0
-
-    previously_inside = person.inside
-    person.inside = inside
-    dwell = now - person.first_seen
-
-    if person.inside:
-      person.state = "entering" if dwell < 2.0 else "present"
-    else:
-      person.state = "exiting" if person.counted_in else "entering"
-
-    if previously_inside != inside and person.prev_center_norm is not None:
-      if inside and not person.counted_in:
-        self.people_in += 1
-        person.counted_in = True
-      elif not inside and person.counted_in and not person.counted_out:
-        self.people_out += 1
-        person.counted_out = True
-        person.state = "exiting"
-        self._finalize_active_zones(person, now)
-
-  def _update_zones(self, person: TrackedPerson, now: float) -> None:
-    for zone_id, zone in self.zone_definitions.items():
-      inside_zone = point_in_polygon(person.center_norm, zone.polygon)
-      is_active = zone_id in person.active_zones
-
-      if inside_zone and not is_active:
-        person.active_zones[zone_id] = now
-        self.zone_active_members[zone_id][person.track_id] = now
-      elif not inside_zone and is_active:
-        started = person.active_zones.pop(zone_id)
-        duration = now - started
-        self.zone_completed_durations[zone_id].append(duration)
-        self.zone_active_members[zone_id].pop(person.track_id, None)
+    doors, inside = self.entrance_geometry.crossings(table.prev_center[rows], table.center[rows])
+    # A first sighting takes the side of the nearest door; afterwards only a crossing changes it
+    moved = (doors >= 0) | np.isnan(table.prev_center[rows, 0])
+    table.set_inside_rows(rows[moved], inside[moved])
+    table.state[rows] = np.where(
+      table.inside[rows],
+      np.where(dwell < 2.0, ENTERING, PRESENT),
+      np.where(table.counted_in[rows], EXITING, ENTERING),
+    )
+    for index in np.flatnonzero(doors >= 0).tolist():
+      self._count_crossing(table.people[rows[index]], now, int(doors[index]), bool(inside[index]))
+
+  def _count_crossing(self, person: TrackedPerson, now: float, door: int, inside: bool) -> None:
+    if inside and not person.counted_in:
+      person.entry_door = self.entrance_ids[door]
+      self._count_entry(person, now)
+    elif not inside and person.counted_in and not person.counted_out:
+      person.exit_door = self.entrance_ids[door]
+      self._count_exit(person, now)
+      person.state = "exiting"
+      self._finalize_active_zones(person, now)
+
+  def _count_entry(self, person: TrackedPerson, now: float) -> None:
+    self.people_in += 1
+    person.counted_in = True
+    if person.entry_door is not None:
+      self.entrance_counts[person.entry_door]["in"] += 1
+
+  def _count_exit(self, person: TrackedPerson, now: float) -> None:
+    self.people_out += 1
+    person.counted_out = True
+    if person.exit_door is not None:
+      self.entrance_counts[person.exit_door]["out"] += 1
+
+  def _uncount_entry(self, person: TrackedPerson) -> None:
+    """Take back an entry ``_count_entry`` counted, when re-identification finds it was a re-entry."""
+    self.people_in -= 1
+    if person.entry_door is not None:
+      self.entrance_counts[person.entry_door]["in"] -= 1
+
+  def _uncount_exit(self, lost) -> None:
+    """Take back the exit counted when a lost track was dropped; such exits have no door."""
+    self.people_out -= 1
+
+  def _record_zone_duration(self, zone_id: str, person: TrackedPerson, entered_at: float, now: float) -> None:
+    self.zone_durations[zone_id].add(now - entered_at, now)
+
+  def _update_zones(self, rows: np.ndarray, now: float, membership: Optional[np.ndarray] = None) -> None:
+    """Enter/leave zones for the given track rows from their (rows, zones) membership matrix."""
+    table = self.tracks
+    if membership is None:
+      membership = self.zone_geometry.contains(table.center[rows])
+    changed = membership != table.zone_in[rows]
+    if not changed.any():
+      return
+    for index, zone in zip(*(axis.tolist() for axis in np.nonzero(changed))):
+      row = rows[index]
+      if membership[index, zone]:
+        table.enter_zone(row, zone, now)
+      else:
+        table.leave_zone(row, zone)
+        self._record_zone_duration(self.zone_ids[zone], table.people[row], float(table.zone_since[row, zone]), now)
 
   def _finalize_active_zones(self, person: TrackedPerson, now: float) -> None:
-    for zone_id, entered_at in list(person.active_zones.items()):
-      duration = now - entered_at
-      self.zone_completed_durations[zone_id].append(duration)
-      self.zone_active_members[zone_id].pop(person.track_id, None)
-      person.active_zones.pop(zone_id, None)
-
-  def _update_heatmap(self, center_norm: Tuple[float, float]) -> None:
-    row, col = heatmap_bin(
-      center_norm, self.config.heatmap.grid_width, self.config.heatmap.grid_height
-    )
-    self.heatmap[row, col] += 5
-
-  def _drop_stale_tracks(self, active_ids: set[int], now: float, ttl: float = 3.0) -> None:
-    for track_id in list(self.tracks.keys()):
-      person = self.tracks[track_id]
-      if track_id in active_ids:
-        continue
-      if now - person.last_seen > ttl:
-        if person.counted_in and not person.counted_out:
-          self.people_out += 1
-        self._finalize_active_zones(person, now)
-        self.tracks.pop(track_id, None)
-
-  def _update_demographics(self, frame: np.ndarray) -> None:
+    for zone_id, entered_at in person.active_zones.items():
+      self._record_zone_duration(zone_id, person, entered_at, now)
+    person.table.leave_zones(person.row)
+
+  def _update_heatmap(self, points: np.ndarray, now: float) -> None:
+    self.heatmap.add(points, now)
+
+  def _drop_stale_tracks(self, now: float, ttl: float = 3.0) -> None:
+    # Only tracks whose expiry entries are due are looked at, not every live track
+    for person in self.tracks.expired(now, ttl):
+      exit_on_drop = person.counted_in and not person.counted_out
+      if exit_on_drop:
+        self._count_exit(person, now)
+      self._finalize_active_zones(person, now)
+      if self.reid is not None:
+        self.reid.remember(person, now, exit_on_drop)
+      self.tracks.pop(person.track_id)
+
+  def _update_demographics(self, frame: np.ndarray, tracks: Optional[List[TrackSnapshot]] = None) -> None:
     if self.face_app is None:
       return
+    if tracks is None:
+      tracks = self._track_snapshots(self.last_timestamp)
+    self._apply_observations(self._analyse_faces(frame, tracks))
+
+  def _track_snapshots(self, now: float) -> List[TrackSnapshot]:
+    """Snapshot the tracks for face analysis, flagging the ones the scheduler picked."""
+    settings = self.config.demographics
+    crops = settings.mode == "crops"
+    # Crop mode only spends face analysis on people inside the venue
+    people = [person for person in self.tracks.values() if person.inside or not crops]
+    if self.face_scheduler is None:
+      wanted = [person.track_id for person in people]
+    else:
+      wanted = self.face_scheduler.select(people, now, settings.max_tiles if crops else None)
+    # Picked tracks first, in priority order, so mosaic tiles go to them
+    order = {track_id: rank for rank, track_id in enumerate(wanted)}
+    people.sort(key=lambda person: order.get(person.track_id, len(order)))
+    return [
+      TrackSnapshot(person.track_id, person.bbox_norm, person.center_norm, analyse=person.track_id in order)
+      for person in people
+    ]
+
+  def _analyse_faces(self, frame: np.ndarray, tracks: List[TrackSnapshot]) -> List[FaceObservation]:
+    """Detect faces and match them to tracks; safe to call from the demographics worker."""
+    settings = self.config.demographics
+    if settings.mode == "crops":
+      mosaic, tiles = build_mosaic(frame, tracks, settings.upper_fraction, settings.tile_size, settings.max_tiles)
+      if mosaic is None:
+        return []
+      return match_mosaic_faces(detect_faces(self.face_app, mosaic), tiles)
 
     faces = self.face_app.get(frame)
     if not faces:
+      return []
+    frame_h, frame_w = frame.shape[:2]
+    return match_faces(faces, tracks, frame_w, frame_h)
+
+  def _refund_face_budget(self, job: DemographicsJob) -> None:
+    # A dropped job was never analysed, so the tracks it picked keep their attempts
+    if self.face_scheduler is not None:
+      self.face_scheduler.refund(track.track_id for track in job.tracks if track.analyse)
+
+  def _apply_demographics_results(self) -> None:
+    for result in self.demographics_worker.drain():
+      self._apply_observations(result.observations)
+
+  def _apply_observations(self, observations: List[FaceObservation]) -> None:
+    for observation in observations:
+      # The track may have been dropped while the worker was busy
+      person = self.tracks.get(observation.track_id)
+      if person is not None:
+        self.apply_face(person, observation.age, observation.gender, observation.embedding)
+
+  def apply_face(
+    self,
+    person: TrackedPerson,
+    age: Optional[float],
+    gender: Optional[str],
+    embedding: Optional[np.ndarray] = None,
+  ) -> None:
+    """Fold one face observation into a track's smoothed demographics."""
+    if embedding is not None and self.reid is not None:
+      self._update_embedding(person, embedding)
+    if self.recorder is not None:
+      self.recorder.write_face(self.last_timestamp, self.frame_count, person.track_id, age, gender)
+    # Use temporal smoothing for better accuracy
+    if age is not None:
+      person.update_age(age)
+    if gender is not None:
+      person.update_gender(gender)
+
+  def _update_embedding(self, person: TrackedPerson, embedding: np.ndarray) -> None:
+    vector = normalize_embedding(embedding)
+    if vector is None:
       return
-
-    for face in faces:
-      bbox = face.bbox.astype(float)
-      fx1, fy1, fx2, fy2 = bbox.tolist()
-      fcx, fcy = (fx1 + fx2) / 2.0, (fy1 + fy2) / 2.0
-      best_track: Optional[TrackedPerson] = None
-      best_distance = float("inf")
-
-      for person in self.tracks.values():
-        x1, y1, x2, y2 = person.bbox_norm
-        px1, py1, px2, py2 = (
-          x1 * frame.shape[1],
-          y1 * frame.shape[0],
-          x2 * frame.shape[1],
-          y2 * frame.shape[0],
-        )
-        if px1 <= fcx <= px2 and py1 <= fcy <= py2:
-          center_px = (
-            person.center_norm[0] * frame.shape[1],
-            person.center_norm[1] * frame.shape[0],
-          )
-          distance = (fcx - center_px[0]) ** 2 + (fcy - center_px[1]) ** 2
-          if distance < best_distance:
-            best_track = person
-            best_distance = distance
-
-      if best_track and best_distance < 10000:
-        # Use temporal smoothing for better accuracy
-        if face.age is not None:
-          best_track.update_age(float(face.age))
-        if hasattr(face, "sex") and face.sex is not None:
-          # Handle both old (float) and new (string) InsightFace API
-          if isinstance(face.sex, str):
-            detected_gender = "male" if face.sex.upper() == 'M' else "female"
-          else:
-            detected_gender = "male" if float(face.sex) > 0.5 else "female"
-          best_track.update_gender(detected_gender)
-        elif hasattr(face, "gender") and face.gender is not None:
-          detected_gender = "male" if int(face.gender) == 1 else "female"
-          best_track.update_gender(detected_gender)
-
-  def _build_metrics(self) -> CameraMetrics:
-    # Decay heatmap over time
-    self.heatmap *= 0.9
-
+    if person.embedding is not None:
+      person.embedding = normalize_embedding(0.8 * person.embedding + 0.2 * vector)
+      return
+    person.embedding = vector
+    # First face of this track: it may be a lost track under a new id
+    found = self.reid.match(vector, self.last_timestamp)
+    if found is not None:
+      self._inherit_track(person, *found)
+
+  def _inherit_track(self, person: TrackedPerson, lost, similarity: float) -> None:
+    """Carry a lost track's demographics and counting state over to its new id."""
+    person.first_seen = min(person.first_seen, lost.first_seen)
+    person.age_history = deque(list(lost.age_history) + list(person.age_history), maxlen=person.age_history.maxlen)
+    person.gender_history = deque(
+      list(lost.gender_history) + list(person.gender_history), maxlen=person.gender_history.maxlen
+    )
+    if person.age is None:
+      person.age = lost.age
+    if person.gender == "unknown":
+      person.gender = lost.gender
+
+    # A visit that ended by crossing the line is over; only a timed-out one continues
+    if lost.counted_in and (not lost.counted_out or lost.exit_on_drop):
+      if person.counted_in:
+        # The new id crossed in again on its own: that entry was the same person
+        self._uncount_entry(person)
+      person.counted_in = True
+      if lost.exit_on_drop:
+        self._uncount_exit(lost)
+        self.reid.stats.restored_exits += 1
+    print(f"[INFO] Track {person.track_id} re-identified as lost track {lost.track_id} (similarity {similarity:.2f})")
+
+  def _build_metrics(self, now: Optional[float] = None, detail: bool = True) -> CameraMetrics:
+    """
+    Snapshot the metrics from the track table's running tallies.
+
+    Only the per-person list and the heatmap payload scale with the scene;
+    ``detail=False`` leaves them out.
+    """
     metrics = CameraMetrics()
     metrics.people_in = self.people_in
     metrics.people_out = self.people_out
-    metrics.current = sum(1 for person in self.tracks.values() if person.inside)
-
-    age_buckets = default_age_buckets()
-    gender_counts = {"male": 0, "female": 0, "unknown": 0}
-    dwell_times: list[float] = []
-    active_people: list[ActivePersonSnapshot] = []
-    now = time.time()
-
-    for person in self.tracks.values():
-      if not person.inside:
-        continue
-
-      dwell = now - person.first_seen
-      dwell_times.append(dwell)
-
-      if person.gender in gender_counts:
-        gender_counts[person.gender] += 1
-      else:
-        gender_counts["unknown"] += 1
-
-      bucket = bucket_for_age(person.age)
-      if bucket != "unknown":
-        age_buckets[bucket] += 1
-
-      active_people.append(
+    metrics.entrances = [
+      EntranceSnapshot(
+        id=entrance.id,
+        name=entrance.name,
+        people_in=self.entrance_counts[entrance.id]["in"],
+        people_out=self.entrance_counts[entrance.id]["out"],
+      )
+      for entrance in self.entrances
+    ]
+    now = self.last_timestamp if now is None else now
+
+    table = self.tracks
+    metrics.current = table.inside_count
+    metrics.age_buckets = dict(zip(AGE_BUCKETS, table.inside_buckets))
+    genders = dict(zip(GENDERS, table.inside_genders))
+    metrics.gender = {"male": genders["male"], "female": genders["female"], "unknown": genders["unknown"]}
+    mean_first_seen = table.mean_first_seen()
+    metrics.avg_dwell_time = 0.0 if mean_first_seen is None else now - mean_first_seen
+    if detail:
+      live = table.live_rows()
+      rows = live[table.inside[live]]
+      metrics.active_people = [
         ActivePersonSnapshot(
-          id=person.track_id,
-          age=person.age,
-          age_bucket=bucket if bucket != "unknown" else "unknown",
-          gender=person.gender,
-          dwell_seconds=dwell,
+          id=track_id,
+          age=None if math.isnan(age) else age,
+          age_bucket=AGE_BUCKETS[bucket] if bucket >= 0 else "unknown",
+          gender=GENDERS[gender],
+          dwell_seconds=seconds,
         )
-      )
-
-    metrics.age_buckets = age_buckets
-    metrics.gender = gender_counts
-    metrics.active_people = active_people
-    metrics.avg_dwell_time = float(np.mean(dwell_times)) if dwell_times else 0.0
+        for track_id, age, bucket, gender, seconds in zip(
+          table.ids[rows].tolist(),
+          table.age[rows].tolist(),
+          table.age_bucket[rows].tolist(),
+          table.gender[rows].tolist(),
+          (now - table.first_seen[rows]).tolist(),
+        )
+      ]
 
+    occupancy = dict(zip(self.zone_ids, table.zone_counts))
     if self.queue_id:
-      durations = self.zone_completed_durations[self.queue_id]
-      active_count = len(self.zone_active_members[self.queue_id])
-      avg_wait = float(np.mean(durations)) if durations else 0.0
-      longest = float(np.max(durations)) if durations else 0.0
-      metrics.queue = QueueSnapshot(active_count, avg_wait, longest)
+      durations = self.zone_durations[self.queue_id]
+      waits = durations.summary()
+      metrics.queue = QueueSnapshot(
+        current=occupancy[self.queue_id],
+        average_wait_seconds=waits.average_seconds,
+        longest_wait_seconds=waits.longest_seconds,
+        p50_wait_seconds=waits.p50_seconds,
+        p90_wait_seconds=waits.p90_seconds,
+        windows=durations.windows(now),
+      )
 
     table_snapshots: list[TableSnapshot] = []
-    for table in self.config.tables:
-      durations = self.zone_completed_durations[table.id]
-      active = len(self.zone_active_members[table.id])
-      avg = float(np.mean(durations)) if durations else 0.0
-      longest = float(np.max(durations)) if durations else 0.0
+    for zone in self.config.tables:
+      durations = self.zone_durations[zone.id]
+      stays = durations.summary()
       table_snapshots.append(
         TableSnapshot(
-          id=table.id,
-          name=table.name,
-          current_occupants=active,
-          avg_stay_seconds=avg,
-          longest_stay_seconds=longest,
+          id=zone.id,
+          name=zone.name,
+          current_occupants=occupancy[zone.id],
+          avg_stay_seconds=stays.average_seconds,
+          longest_stay_seconds=stays.longest_seconds,
+          p50_stay_seconds=stays.p50_seconds,
+          p90_stay_seconds=stays.p90_seconds,
+          windows=durations.windows(now),
         )
       )
     metrics.tables = table_snapshots
-    metrics.heatmap = self.heatmap.astype(int).tolist()
+    if detail:
+      metrics.heatmap = self.heatmap.payload(now)
     metrics.fps = self.fps
+    metrics.pipeline = self._pipeline_stats()
     return metrics
 
-  def _heatmap_to_points(self, grid: List[List[int]]) -> List[Dict[str, float]]:
-    if not grid:
-      return []
-
-    height = len(grid)
-    width = len(grid[0]) if height else 0
-    if width == 0:
-      return []
-
-    max_value = 0
-    for row in grid:
-      row_max = max(row) if row else 0
-      if row_max > max_value:
-        max_value = row_max
-
-    if max_value <= 0:
-      max_value = 1
-
-    points: List[Dict[str, float]] = []
-    for y, row in enumerate(grid):
-      for x, value in enumerate(row):
-        if value <= 0:
-          continue
-        points.append(
-          {
-            "x": (x + 0.5) / width,
-            "y": (y + 0.5) / height,
-            "intensity": min(1.0, (value / max_value)**0.5),
-          }
-        )
-    return points
+  def _pipeline_stats(self) -> Dict[str, Dict[str, object]]:
+    stats: Dict[str, Dict[str, object]] = {}
+    if self.capture is not None:
+      stats["capture"] = self.capture.stats.to_dict()
+    for name, extra in self.extra_pipeline_stats.items():
+      stats[name] = extra.to_dict()
+    if self.roi_norm is not None:
+      x1, y1, x2, y2 = self.roi_norm
+      stats["roi"] = {
+        "box": [round(v, 3) for v in self.roi_norm],
+        "frameFraction": round((x2 - x1) * (y2 - y1), 3),
+        "imgsz": self.roi_imgsz(),
+      }
+    if self.motion is not None:
+      stats["motion"] = self.motion.to_dict()
+    if self.demographics_worker is not None:
+      stats["demographics"] = self.demographics_worker.stats.to_dict()
+    stats["metricsWriter"] = self.metrics_writer.stats.to_dict()
+    if self.face_scheduler is not None:
+      stats["faceSchedule"] = self.face_scheduler.to_dict()
+    if self.reid is not None:
+      stats["reid"] = self.reid.to_dict()
+    if self.stage_ms:
+      stats["stages"] = {name: round(ms, 2) for name, ms in self.stage_ms.items()}
+    if self.quality is not None:
+      stats["quality"] = self.quality.to_dict()
+    return stats
 
   def _metrics_to_stream(self, metrics: CameraMetrics, timestamp_ms: int) -> Dict[str, object]:
-    heatmap_points = self._heatmap_to_points(metrics.heatmap)
-
     return {
       "timestamp": timestamp_ms,
       "entries": metrics.people_in,
@@ -507,33 +779,37 @@ class CameraAnalyticsEngine:
         "gender": metrics.gender,
         "ages": metrics.age_buckets,
       },
-      "heatmap": {
-        "points": heatmap_points,
-        "gridWidth": len(metrics.heatmap[0]) if metrics.heatmap else 0,
-        "gridHeight": len(metrics.heatmap),
-      },
+      "heatmap": metrics.heatmap,
       "fps": round(metrics.fps, 1),
+      "pipeline": metrics.pipeline,
     }
 
   def _build_track_stream(self, now: float) -> List[Dict[str, object]]:
-    track_payload: List[Dict[str, object]] = []
-    for track_id, person in self.tracks.items():
-      x1, y1, x2, y2 = person.bbox_norm
-      width = max(0.0, x2 - x1)
-      height = max(0.0, y2 - y1)
-      dwell = max(0.0, now - person.first_seen)
-
-      age_bucket = bucket_for_age(person.age)
-      payload = {
+    table = self.tracks
+    rows = table.live_rows()
+    boxes = table.bbox[rows]
+    sizes = np.maximum(boxes[:, 2:] - boxes[:, :2], 0.0)
+    dwell = np.maximum(now - table.first_seen[rows], 0.0)
+    buckets = table.age_bucket[rows]
+    return [
+      {
         "id": f"track_{track_id}",
-        "bbox": [float(x1), float(y1), float(width), float(height)],
-        "gender": person.gender if person.gender in {"male", "female"} else "unknown",
-        "ageBucket": age_bucket if age_bucket != "unknown" else None,
-        "dwellSec": dwell,
-        "state": person.state,
+        "bbox": [x1, y1, width, height],
+        "gender": GENDERS[gender],
+        "ageBucket": AGE_BUCKETS[bucket] if bucket >= 0 else None,
+        "dwellSec": seconds,
+        "state": STATES[state],
       }
-      track_payload.append(payload)
-    return track_payload
+      for track_id, (x1, y1), (width, height), gender, bucket, seconds, state in zip(
+        table.ids[rows].tolist(),
+        boxes[:, :2].tolist(),
+        sizes.tolist(),
+        table.gender[rows].tolist(),
+        buckets.tolist(),
+        dwell.tolist(),
+        table.state[rows].tolist(),
+      )
+    ]
 
   def _emit_metrics_stream(self, metrics: CameraMetrics, timestamp_ms: int) -> None:
     if self.on_metrics is None:
@@ -547,10 +823,9 @@ class CameraAnalyticsEngine:
     payload = self._build_track_stream(now)
     self.on_tracks(payload)
 
-  def _write_metrics(self, metrics: CameraMetrics) -> None:
-    self.output_path.parent.mkdir(parents=True, exist_ok=True)
-    with self.output_path.open("w", encoding="utf-8") as handle:
-      json.dump(metrics.to_dict(), handle, indent=2)
+  def _write_metrics(self, metrics: CameraMetrics, timestamp: Optional[float] = None) -> None:
+    """Queue ``metrics`` for the background writer; the snapshot must not be modified afterwards."""
+    self.metrics_writer.submit(metrics, self.last_timestamp if timestamp is None else timestamp)
 
   def _draw_overlay(self, frame: np.ndarray, frame_w: int, frame_h: int) -> np.ndarray:
     # Create semi-transparent overlay for glass effect
@@ -613,7 +888,7 @@ class CameraAnalyticsEngine:
         labels.append(category_emoji)
 
       # Dwell time
-      dwell = time.time() - person.first_seen
+      dwell = self.last_timestamp - person.first_seen
       if dwell < 60:
         labels.append(f"⏱ {int(dwell)}s")
       else:
@@ -650,12 +925,12 @@ class CameraAnalyticsEngine:
 
     # Only show zones if explicitly requested (for testing/setup)
     if self.show_zones:
-      if self.config.entrance_line:
-        line = self.config.entrance_line
+      for line in self.entrances:
         start = (int(line.start[0] * frame_w), int(line.start[1] * frame_h))
         end = (int(line.end[0] * frame_w), int(line.end[1] * frame_h))
         cv2.line(frame, start, end, (255, 255, 0), 2)
-        cv2.putText(frame, "Entrance", (start[0], start[1] - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+        label = line.name or ("Entrance" if len(self.entrances) == 1 else line.id)
+        cv2.putText(frame, label, (start[0], start[1] - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
 
       for zone in self.zone_definitions.values():
         polygon = [(int(x * frame_w), int(y * frame_h)) for x, y in zone.polygon]
@@ -672,7 +947,7 @@ class CameraAnalyticsEngine:
           1,
         )
 
-    metrics = self._build_metrics()
+    metrics = self._build_metrics(detail=False)
 
     # Create glass-morphism stats panel
     panel_x, panel_y = 10, 10
@@ -0,0 +1,360 @@
+"""Micro-benchmarks for the per-frame analytics hot path, compared against a stored baseline."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .analytics import CameraAnalyticsEngine
+from .config import AnalyticsConfig, EntranceLine, Zone, ZoneRasterConfig
+from .demographics import TrackSnapshot, match_faces
+from .geometry import ZoneRaster, foot_points
+from .heatmap import HeatmapAccumulator
+
+FRAME_W, FRAME_H = 1280, 720
+DEFAULT_TRACKS = (1, 10, 50, 200)
+DEFAULT_ZONES = (0, 10, 50)
+DEFAULT_BASELINE = Path(__file__).resolve().parents[1] / "benchmarks" / "hotpath_baseline.json"
+
+
+class _Array:
+  """Stand-in for the torch tensors on an ultralytics ``Boxes`` object."""
+
+  def __init__(self, values: np.ndarray) -> None:
+    self.values = values
+
+  def cpu(self) -> "_Array":
+    return self
+
+  def int(self) -> "_Array":
+    return _Array(self.values.astype(np.int32))
+
+  def numpy(self) -> np.ndarray:
+    return self.values
+
+
+class _Boxes:
+  def __init__(self, track_ids: np.ndarray, xyxy: np.ndarray) -> None:
+    self.id = _Array(track_ids) if len(track_ids) else None
+    self.xyxy = _Array(xyxy)
+
+
+class SyntheticFace:
+  """InsightFace-shaped face with attributes already filled in."""
+
+  def __init__(self, bbox: np.ndarray) -> None:
+    self.bbox = bbox
+    self.age = 30.0
+    self.sex = "F"
+
+
+class SyntheticResult:
+  """Minimal tracking result accepted by ``CameraAnalyticsEngine._update_tracks``."""
+
+  def __init__(self, track_ids: np.ndarray, xyxy: np.ndarray) -> None:
+    self.boxes = _Boxes(track_ids, xyxy)
+
+
+def synthetic_config(zones: int, seed: int = 0) -> AnalyticsConfig:
+  """Entrance line across the middle, one queue zone and ``zones - 1`` table quads."""
+  rng = np.random.default_rng(seed)
+  polygons: List[Zone] = []
+  for index in range(zones):
+    cx, cy = rng.uniform(0.1, 0.9, size=2)
+    w, h = rng.uniform(0.05, 0.2, size=2)
+    polygon = [(cx - w, cy - h), (cx + w, cy - h), (cx + w * 0.8, cy + h), (cx - w * 0.8, cy + h)]
+    polygons.append(Zone(id=f"zone-{index}", polygon=[(float(x), float(y)) for x, y in polygon]))
+  return AnalyticsConfig(
+    entrance_line=EntranceLine(start=(0.0, 0.5), end=(1.0, 0.5), inside_on="bottom"),
+    queue_zone=polygons[0] if polygons else None,
+    tables=polygons[1:],
+  )
+
+
+def synthetic_frames(tracks: int, frames: int, seed: int = 0) -> List[SyntheticResult]:
+  """Random-walking people that cross the entrance line, with some track churn."""
+  rng = np.random.default_rng(seed)
+  centers = rng.uniform([0.05, 0.05], [0.95, 0.95], size=(tracks, 2))
+  velocity = rng.normal(0.0, 0.01, size=(tracks, 2))
+  sizes = rng.uniform([0.03, 0.12], [0.08, 0.3], size=(tracks, 2))
+  ids = np.arange(1, tracks + 1)
+  next_id = tracks + 1
+  results: List[SyntheticResult] = []
+  for _ in range(frames):
+    velocity += rng.normal(0.0, 0.003, size=velocity.shape)
+    centers = np.clip(centers + velocity, 0.02, 0.98)
+    # About 1% of tracks are lost and replaced by a new id each frame
+    replaced = rng.random(tracks) < 0.01
+    if replaced.any():
+      count = int(replaced.sum())
+      ids[replaced] = np.arange(next_id, next_id + count)
+      next_id += count
+    half = sizes / 2.0
+    xyxy = np.concatenate([centers - half, centers + half], axis=1) * [FRAME_W, FRAME_H, FRAME_W, FRAME_H]
+    results.append(SyntheticResult(ids.copy(), xyxy.astype(np.float32)))
+  return results
+
+
+def synthetic_face(bbox_norm: Tuple[float, float, float, float]) -> SyntheticFace:
+  """A face near the top of a person box, in pixels."""
+  x1, y1, x2, y2 = bbox_norm
+  cx, cy = (x1 + x2) / 2.0 * FRAME_W, (y1 + 0.15 * (y2 - y1)) * FRAME_H
+  half = 0.15 * (x2 - x1) * FRAME_W
+  return SyntheticFace(np.array([cx - half, cy - half, cx + half, cy + half], dtype=np.float32))
+
+
+@dataclass
+class BenchResult:
+  name: str
+  per_call_us: float
+  p95_us: float
+  alloc_bytes: int
+
+  def to_dict(self) -> Dict[str, float]:
+    return {"us": round(self.per_call_us, 3), "p95Us": round(self.p95_us, 3), "allocBytes": self.alloc_bytes}
+
+
+class Scenario:
+  """One engine with ``tracks`` people and ``zones`` zones, warmed up on synthetic frames."""
+
+  def __init__(self, tracks: int, zones: int, frames: int = 300) -> None:
+    self.tracks = tracks
+    self.zones = zones
+    self.name = f"t{tracks}-z{zones}"
+    self._tmp = tempfile.TemporaryDirectory()
+    self.engine = CameraAnalyticsEngine(
+      config=synthetic_config(zones),
+      source="synthetic",
+      output_path=Path(self._tmp.name) / "metrics.json",
+      model_path=None,
+      live=False,
+      demographics=False,
+    )
+    # The engine keeps the polygon path; the raster is timed beside it at the default resolution
+    raster = ZoneRasterConfig()
+    self.raster = ZoneRaster(self.engine.zone_geometry, raster.width, raster.height)
+    # A fine splatted heatmap, timed beside the engine's default grid
+    self.fine_heatmap = HeatmapAccumulator(160, 90, half_life=6.5, sigma=1.5)
+    self.frames = synthetic_frames(tracks, frames)
+    self.cursor = 0
+    self.now = 1_000_000.0
+    # Run a few seconds of frames so tracks, zones and counters hold realistic state
+    for _ in range(min(frames, 60)):
+      self.step()
+
+  def step(self) -> None:
+    result = self.frames[self.cursor]
+    self.cursor = (self.cursor + 1) % len(self.frames)
+    self.now += 1.0 / 15.0
+    self.engine.last_timestamp = self.now
+    self.engine._update_tracks(result, FRAME_W, FRAME_H, self.now)
+
+  def operations(self) -> Dict[str, Tuple[Callable[[], None], int]]:
+    """Map operation name to (callable, engine calls it represents)."""
+    engine = self.engine
+    people = list(engine.tracks.values())
+    rows = engine.tracks.live_rows()
+    snapshots = [TrackSnapshot(person.track_id, person.bbox_norm, person.center_norm) for person in people]
+    faces = [synthetic_face(person.bbox_norm) for person in people]
+    centers = engine.tracks.center[rows]
+    previous = engine.tracks.prev_center[rows]
+    membership = engine.zone_geometry.contains(centers)
+    feet = foot_points(engine.tracks.bbox[rows])
+    self.fine_heatmap.add(feet, self.now)
+
+    # update_tracks advances the scene, so it runs after the operations sharing this snapshot
+    return {
+      "entrance_crossings": (lambda: engine.entrance_geometry.crossings(previous, centers), 1),
+      # Batched over all tracks but reported per track, like the per-person loops they replaced
+      "update_inside_state": (lambda: engine._update_inside_state(rows, self.now), len(people)),
+      "zone_membership": (lambda: engine.zone_geometry.contains(centers), 1),
+      "zone_membership_raster": (lambda: self.raster.contains(centers), 1),
+      "update_zones": (lambda: engine._update_zones(rows, self.now, membership), len(people)),
+      "update_heatmap": (lambda: engine._update_heatmap(feet, self.now), len(people)),
+      "update_heatmap_fine": (lambda: self.fine_heatmap.add(feet, self.now), len(people)),
+      # No track is past the TTL right after a step, so this times the scan without mutating the scene
+      "drop_stale_tracks": (lambda: engine._drop_stale_tracks(self.now, engine.track_ttl), 1),
+      "build_metrics": (lambda: engine._build_metrics(self.now), 1),
+      # What the overlay draws every frame: the tallies without the per-person list or heatmap
+      "build_metrics_counters": (lambda: engine._build_metrics(self.now, detail=False), 1),
+      "build_track_stream": (lambda: engine._build_track_stream(self.now), 1),
+      "heatmap_payload": (lambda: engine.heatmap.payload(self.now), 1),
+      "heatmap_payload_fine": (lambda: self.fine_heatmap.payload(self.now), 1),
+      # One face per track, so t50 is the 50 faces x 50 tracks case
+      "match_faces": (lambda: match_faces(faces, snapshots, FRAME_W, FRAME_H), 1),
+      "update_tracks": (self.step, 1),
+    }
+
+  def close(self) -> None:
+    self._tmp.cleanup()
+
+
+def measure(func: Callable[[], None], calls: int, rounds: int, min_time: float) -> Tuple[float, float, int]:
+  """Return (median us per call, p95 us per call, peak bytes allocated per call)."""
+  # Pick a loop count that makes each round last at least min_time
+  number = 1
+  while True:
+    started = time.perf_counter()
+    for _ in range(number):
+      func()
+    if time.perf_counter() - started >= min_time or number >= 1 << 20:
+      break
+    number *= 2
+
+  samples: List[float] = []
+  for _ in range(rounds):
+    started = time.perf_counter()
+    for _ in range(number):
+      func()
+    samples.append((time.perf_counter() - started) / (number * max(calls, 1)) * 1e6)
+  samples.sort()
+  p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+
+  # Allocations are traced in a separate pass since tracemalloc distorts timings
+  tracemalloc.start()
+  try:
+    peak = 0
+    for _ in range(5):
+      before, _ = tracemalloc.get_traced_memory()
+      tracemalloc.reset_peak()
+      func()
+      _, call_peak = tracemalloc.get_traced_memory()
+      peak = max(peak, call_peak - before)
+  finally:
+    tracemalloc.stop()
+  return statistics.median(samples), p95, peak // max(calls, 1)
+
+
+def run_suite(
+  tracks: Sequence[int] = DEFAULT_TRACKS,
+  zones: Sequence[int] = DEFAULT_ZONES,
+  rounds: int = 7,
+  min_time: float = 0.02,
+  only: Optional[Sequence[str]] = None,
+) -> Dict[str, BenchResult]:
+  results: Dict[str, BenchResult] = {}
+  for track_count in tracks:
+    for zone_count in zones:
+      scenario = Scenario(track_count, zone_count)
+      try:
+        for op_name, (func, calls) in scenario.operations().items():
+          if only and op_name not in only:
+            continue
+          name = f"{scenario.name}/{op_name}"
+          median_us, p95_us, alloc = measure(func, calls, rounds, min_time)
+          results[name] = BenchResult(name, median_us, p95_us, alloc)
+      finally:
+        scenario.close()
+  return results
+
+
+def compare(
+  results: Dict[str, BenchResult],
+  baseline: Dict[str, Dict[str, float]],
+  tolerance: float,
+  alloc_tolerance: float,
+) -> List[str]:
+  """Return a description of every result slower or hungrier than the baseline allows."""
+  regressions: List[str] = []
+  for name, result in results.items():
+    reference = baseline.get(name)
+    if reference is None:
+      continue
+    if result.per_call_us > reference["us"] * (1.0 + tolerance):
+      regressions.append(f"{name}: {result.per_call_us:.2f}us vs {reference['us']:.2f}us baseline")
+    # Small absolute slack so a few extra bytes on tiny calls do not fail the run
+    if result.alloc_bytes > reference["allocBytes"] * (1.0 + alloc_tolerance) + 256:
+      regressions.append(f"{name}: {result.alloc_bytes}B allocated vs {int(reference['allocBytes'])}B baseline")
+  return regressions
+
+
+def _format(results: Dict[str, BenchResult], baseline: Dict[str, Dict[str, float]]) -> str:
+  lines = [f"{'benchmark':<40} {'us/call':>10} {'p95':>10} {'alloc B':>10} {'vs base':>9}"]
+  for name, result in results.items():
+    reference = baseline.get(name)
+    delta = f"{result.per_call_us / reference['us'] - 1.0:+.0%}" if reference and reference["us"] else "-"
+    lines.append(
+      f"{name:<40} {result.per_call_us:>10.2f} {result.p95_us:>10.2f} {result.alloc_bytes:>10} {delta:>9}"
+    )
+  return "\n".join(lines)
+
+
+def _int_list(raw: str) -> List[int]:
+  return [int(value) for value in raw.split(",") if value]
+
+
+def parse_args() -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description="Benchmark the per-frame analytics hot path without a model")
+  parser.add_argument("--tracks", type=_int_list, default=list(DEFAULT_TRACKS), help="Concurrent tracks, comma separated")
+  parser.add_argument("--zones", type=_int_list, default=list(DEFAULT_ZONES), help="Configured zones, comma separated")
+  parser.add_argument("--only", action="append", default=None, help="Run only this operation (repeatable)")
+  parser.add_argument("--rounds", type=int, default=7, help="Timed rounds per benchmark (default: 7)")
+  parser.add_argument(
+    "--baseline",
+    type=Path,
+    default=DEFAULT_BASELINE,
+    help=f"Baseline JSON to compare against (default: {DEFAULT_BASELINE})",
+  )
+  parser.add_argument("--update-baseline", action="store_true", help="Write these results as the new baseline")
+  parser.add_argument(
+    "--tolerance",
+    type=float,
+    default=0.25,
+    help="Allowed slowdown relative to the baseline before failing (default: 0.25)",
+  )
+  parser.add_argument(
+    "--alloc-tolerance",
+    type=float,
+    default=0.10,
+    help="Allowed growth in per-call allocations before failing (default: 0.10)",
+  )
+  parser.add_argument("--json", type=Path, default=None, help="Also write the results to this JSON file")
+  return parser.parse_args()
+
+
+def main() -> None:
+  args = parse_args()
+  baseline: Dict[str, Dict[str, float]] = {}
+  if args.baseline.exists() and not args.update_baseline:
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+
+  results = run_suite(args.tracks, args.zones, rounds=args.rounds, only=args.only)
+  print(_format(results, baseline))
+
+  payload = {
+    "python": sys.version.split()[0],
+    "numpy": np.__version__,
+    "results": {name: result.to_dict() for name, result in results.items()},
+  }
+  if args.json is not None:
+    args.json.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+  if args.update_baseline:
+    args.baseline.parent.mkdir(parents=True, exist_ok=True)
+    args.baseline.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+    print(f"[INFO] Baseline written to {args.baseline}")
+    return
+
+  if not baseline:
+    print(f"[WARN] No baseline at {args.baseline}. Run with --update-baseline to record one.")
+    return
+  regressions = compare(results, baseline, args.tolerance, args.alloc_tolerance)
+  if regressions:
+    print(f"[WARN] {len(regressions)} hot-path regression(s):")
+    for line in regressions:
+      print(f"  {line}")
+    sys.exit(1)
+  print("[INFO] No regressions against the baseline")
+
+
+if __name__ == "__main__":
+  main()
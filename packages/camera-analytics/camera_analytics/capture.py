@@ -0,0 +1,271 @@
+"""Frame capture stages that decouple source decoding from analytics."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Iterator, Optional
+
+import cv2
+import numpy as np
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST)
+
+LIVE_PREFIXES = ("rtsp://", "rtmp://", "http://", "https://")
+
+
+def is_live_source(source: str | int) -> bool:
+  """Camera indices and network streams are live; local files are not."""
+  if isinstance(source, int):
+    return True
+  source_str = str(source)
+  return source_str.startswith(LIVE_PREFIXES) or source_str.endswith(".m3u8")
+
+
+@dataclass
+class CapturedFrame:
+  frame: np.ndarray
+  index: int
+  timestamp: float
+  media_ms: Optional[float] = None
+
+
+@dataclass
+class CaptureStats:
+  frames_read: int = 0
+  frames_delivered: int = 0
+  frames_dropped: int = 0
+  frames_skipped: int = 0
+  reconnects: int = 0
+  latency_ms: float = 0.0
+
+  def to_dict(self) -> dict:
+    return {
+      "framesRead": self.frames_read,
+      "framesDelivered": self.frames_delivered,
+      "framesDropped": self.frames_dropped,
+      "framesSkipped": self.frames_skipped,
+      "reconnects": self.reconnects,
+      "latencyMs": round(self.latency_ms, 1),
+    }
+
+
+class LatestFrameCapture:
+  """
+  Read a live source on a background thread into a bounded buffer.
+
+  With the default ``drop_oldest`` policy the newest frame always wins: once the
+  buffer is full the oldest queued frame is discarded. ``drop_newest`` keeps the
+  queued frames and discards incoming ones instead. Either way the consumer never
+  sees more than ``buffer_size`` frames of backlog, so latency stays bounded when
+  inference is slower than the source.
+
+  ``stride`` can be changed while running; skipped frames are only grabbed, not
+  decoded.
+  """
+
+  def __init__(
+    self,
+    source: str | int,
+    stride: int = 1,
+    buffer_size: int = 1,
+    drop_policy: str = DROP_OLDEST,
+    reconnect_delay: float = 1.0,
+    max_reconnects: int = 10,
+  ) -> None:
+    if buffer_size < 1:
+      raise ValueError(f"buffer_size must be >= 1, got {buffer_size}")
+    if drop_policy not in DROP_POLICIES:
+      raise ValueError(f"Unknown drop policy {drop_policy!r}, expected one of {DROP_POLICIES}")
+    self.source = source
+    self.stride = max(1, int(stride))
+    self.buffer_size = buffer_size
+    self.drop_policy = drop_policy
+    self.reconnect_delay = reconnect_delay
+    self.max_reconnects = max_reconnects
+    self.stats = CaptureStats()
+
+    self._buffer: Deque[CapturedFrame] = deque()
+    self._cond = threading.Condition()
+    self._stopped = threading.Event()
+    self._finished = False
+    self._thread: Optional[threading.Thread] = None
+
+  @property
+  def finished(self) -> bool:
+    """True once the reader has stopped and every buffered frame was consumed."""
+    with self._cond:
+      return self._finished and not self._buffer
+
+  def start(self) -> "LatestFrameCapture":
+    if self._thread is None:
+      self._thread = threading.Thread(target=self._reader, name="frame-capture", daemon=True)
+      self._thread.start()
+    return self
+
+  def stop(self) -> None:
+    self._stopped.set()
+    with self._cond:
+      self._cond.notify_all()
+    if self._thread is not None:
+      self._thread.join(timeout=2.0)
+
+  def read(self, timeout: Optional[float] = None) -> Optional[CapturedFrame]:
+    """Return the next buffered frame, or ``None`` once the source has ended."""
+    with self._cond:
+      if not self._cond.wait_for(lambda: self._buffer or self._finished, timeout=timeout):
+        return None
+      if not self._buffer:
+        return None
+      captured = self._buffer.popleft()
+    self.stats.frames_delivered += 1
+    self.stats.latency_ms = (time.time() - captured.timestamp) * 1000.0
+    return captured
+
+  def __iter__(self) -> Iterator[CapturedFrame]:
+    while True:
+      captured = self.read()
+      if captured is None:
+        return
+      yield captured
+
+  def _open(self) -> cv2.VideoCapture:
+    cap = cv2.VideoCapture(self.source)
+    # Keep the decoder's own queue short so our buffer is the only backlog
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+  def _reader(self) -> None:
+    cap = self._open()
+    failures = 0
+    index = 0
+    try:
+      while not self._stopped.is_set():
+        if index % self.stride:
+          ok = cap.grab()
+          frame = None
+          if ok:
+            self.stats.frames_read += 1
+            self.stats.frames_skipped += 1
+            index += 1
+            continue
+        else:
+          ok, frame = cap.read()
+        if not ok or frame is None:
+          if failures >= self.max_reconnects:
+            print(f"[WARN] Capture source {self.source} ended after {failures} reconnect attempts")
+            break
+          failures += 1
+          self.stats.reconnects += 1
+          cap.release()
+          time.sleep(self.reconnect_delay)
+          cap = self._open()
+          continue
+
+        failures = 0
+        self.stats.frames_read += 1
+        captured = CapturedFrame(frame=frame, index=index, timestamp=time.time())
+        index += 1
+        self._push(captured)
+    finally:
+      cap.release()
+      with self._cond:
+        self._finished = True
+        self._cond.notify_all()
+
+  def _push(self, captured: CapturedFrame) -> None:
+    with self._cond:
+      if len(self._buffer) >= self.buffer_size:
+        self.stats.frames_dropped += 1
+        if self.drop_policy == DROP_NEWEST:
+          return
+        self._buffer.popleft()
+      self._buffer.append(captured)
+      self._cond.notify()
+
+
+class SequentialCapture:
+  """
+  Read a recorded file on the caller's thread without dropping frames.
+
+  ``stride`` skips frames with ``grab()`` so they are never decoded, and
+  ``start_ms`` seeks before the first read.
+  """
+
+  def __init__(self, source: str | int, stride: int = 1, start_ms: float = 0.0) -> None:
+    self.source = source
+    self.stride = max(1, int(stride))
+    self.start_ms = start_ms
+    self.stats = CaptureStats()
+    self._cap: Optional[cv2.VideoCapture] = None
+    self._index = 0
+    self.finished = False
+
+  def start(self) -> "SequentialCapture":
+    if self._cap is None:
+      self._cap = cv2.VideoCapture(self.source)
+      if not self._cap.isOpened():
+        raise RuntimeError(f"Unable to open video source {self.source}")
+      if self.start_ms > 0:
+        self._cap.set(cv2.CAP_PROP_POS_MSEC, self.start_ms)
+    return self
+
+  def stop(self) -> None:
+    if self._cap is not None:
+      self._cap.release()
+      self._cap = None
+
+  @property
+  def fps(self) -> float:
+    if self._cap is None:
+      return 0.0
+    return float(self._cap.get(cv2.CAP_PROP_FPS) or 0.0)
+
+  def read(self, timeout: Optional[float] = None) -> Optional[CapturedFrame]:
+    if self._cap is None or self.finished:
+      return None
+    skip = self.stride - 1 if self._index > 0 else 0
+    for _ in range(skip):
+      if not self._cap.grab():
+        self.finished = True
+        return None
+      self._index += 1
+      self.stats.frames_read += 1
+      self.stats.frames_skipped += 1
+    ok, frame = self._cap.read()
+    if not ok or frame is None:
+      self.finished = True
+      return None
+    # After read() the position is the presentation time of the frame just decoded
+    media_ms = float(self._cap.get(cv2.CAP_PROP_POS_MSEC))
+    captured = CapturedFrame(frame=frame, index=self._index, timestamp=time.time(), media_ms=media_ms)
+    self._index += 1
+    self.stats.frames_read += 1
+    self.stats.frames_delivered += 1
+    return captured
+
+  def __iter__(self) -> Iterator[CapturedFrame]:
+    while True:
+      captured = self.read()
+      if captured is None:
+        return
+      yield captured
+
+
+def open_capture(
+  source: str | int,
+  live: Optional[bool] = None,
+  stride: int = 1,
+  buffer_size: int = 1,
+  drop_policy: str = DROP_OLDEST,
+) -> LatestFrameCapture | SequentialCapture:
+  """Pick the threaded latest-frame reader for live sources, sequential for files."""
+  if live is None:
+    live = is_live_source(source)
+  if live:
+    return LatestFrameCapture(source, stride=stride, buffer_size=buffer_size, drop_policy=drop_policy)
+  return SequentialCapture(source, stride=stride)
@@ -14,6 +14,8 @@ class EntranceLine:
   start: NormalizedPoint
   end: NormalizedPoint
   inside_on: str = "top"
+  id: str = "entrance"
+  name: Optional[str] = None
 
 
 @dataclass
@@ -27,14 +29,145 @@ class Zone:
 class HeatmapConfig:
   grid_width: int = 6
   grid_height: int = 4
+  # Seconds for a cell to cool to half its value; 0 keeps every hit forever.
+  # 6.5 s matches the old 0.9 decay per once-a-second metrics sample.
+  half_life_seconds: float = 6.5
+  # Gaussian spread of each foot point, in grid cells; 0 bins it into one cell
+  sigma_cells: float = 0.0
+
+
+@dataclass
+class MotionConfig:
+  enabled: bool = False
+  # Width of the downscaled grayscale frame used for differencing
+  width: int = 160
+  grid_width: int = 8
+  grid_height: int = 6
+  pixel_threshold: int = 25
+  # Fraction of a tile's pixels that must change for it to count as active
+  tile_threshold: float = 0.02
+  # Force a full detection at least this often (keep below the track TTL)
+  refresh_seconds: float = 2.0
+
+
+@dataclass
+class RoiConfig:
+  enabled: bool = False
+  # Normalised padding added around the union of all configured zones
+  margin: float = 0.1
+  # Fall back to the full frame when the region would cover more than this
+  max_area: float = 0.9
+
+
+@dataclass
+class DemographicsConfig:
+  # "frame" runs face detection on the whole frame; "crops" on tiles of tracked people
+  mode: str = "frame"
+  # Fraction of each person box, from the top, cropped to find the face
+  upper_fraction: float = 0.45
+  tile_size: int = 160
+  # Crops per mosaic; the mosaic side is tile_size * ceil(sqrt(max_tiles))
+  max_tiles: int = 16
+  # Per-track budget: stop analysing converged tracks, favour new/unknown/closer ones
+  schedule: bool = True
+  converge_samples: int = 8
+  # Share of gender votes the majority needs, and the age IQR (years) allowed, to converge
+  converge_vote_share: float = 0.8
+  converge_age_spread: float = 6.0
+  # Re-analyse a track once its box area grows by this factor (closer to the camera)
+  regrow_ratio: float = 1.3
+  max_attempts: int = 30
+
+
+@dataclass
+class ZoneRasterConfig:
+  enabled: bool = False
+  # Grid over the normalised frame; finer grids are more exact near zone edges
+  width: int = 640
+  height: int = 360
+
+
+@dataclass
+class TrackingConfig:
+  # Seconds a track may go unseen before it is dropped (and counted out)
+  ttl_seconds: float = 3.0
+
+
+@dataclass
+class HistoryConfig:
+  enabled: bool = False
+  # SQLite file; by default metrics_history.db beside the metrics JSON
+  path: Optional[str] = None
+  # Key of this camera in the store; by default the camera id under multi.py, else derived from the source
+  camera: Optional[str] = None
+  # Days kept of raw samples and of minute / hour / day rollups
+  raw_days: float = 2.0
+  minute_days: float = 14.0
+  hour_days: float = 180.0
+  day_days: float = 730.0
+
+
+@dataclass
+class ReidConfig:
+  enabled: bool = False
+  # How long a lost track can be matched by a new one
+  ttl_seconds: float = 30.0
+  capacity: int = 256
+  # Minimum cosine similarity between face embeddings to treat two tracks as one person
+  similarity: float = 0.45
+
+
+@dataclass
+class QualityLevel:
+  imgsz: int
+  vid_stride: int = 1
+  face_interval: int = 10
+
+
+def default_quality_levels() -> List[QualityLevel]:
+  # Ordered from best quality to cheapest; index 1 matches the fixed defaults
+  return [
+    QualityLevel(imgsz=640, vid_stride=1, face_interval=5),
+    QualityLevel(imgsz=512, vid_stride=1, face_interval=10),
+    QualityLevel(imgsz=416, vid_stride=1, face_interval=15),
+    QualityLevel(imgsz=320, vid_stride=2, face_interval=20),
+    QualityLevel(imgsz=256, vid_stride=3, face_interval=30),
+  ]
+
+
+@dataclass
+class AdaptiveConfig:
+  enabled: bool = False
+  target_fps: float = 10.0
+  levels: List[QualityLevel] = field(default_factory=default_quality_levels)
+  start_level: int = 1
+  # Step down below target * low_ratio, up above target * high_ratio
+  low_ratio: float = 0.85
+  high_ratio: float = 1.3
+  # A condition must hold this long, and changes are at least cooldown apart
+  hold_seconds: float = 5.0
+  cooldown_seconds: float = 10.0
 
 
 @dataclass
 class AnalyticsConfig:
   entrance_line: Optional[EntranceLine] = None
+  # Further doors, each counted separately; entrance_line (if set) is the first door
+  entrances: List[EntranceLine] = field(default_factory=list)
   queue_zone: Optional[Zone] = None
   tables: List[Zone] = field(default_factory=list)
   heatmap: HeatmapConfig = field(default_factory=HeatmapConfig)
+  adaptive: AdaptiveConfig = field(default_factory=AdaptiveConfig)
+  motion: MotionConfig = field(default_factory=MotionConfig)
+  roi: RoiConfig = field(default_factory=RoiConfig)
+  demographics: DemographicsConfig = field(default_factory=DemographicsConfig)
+  reid: ReidConfig = field(default_factory=ReidConfig)
+  tracking: TrackingConfig = field(default_factory=TrackingConfig)
+  zone_raster: ZoneRasterConfig = field(default_factory=ZoneRasterConfig)
+  history: HistoryConfig = field(default_factory=HistoryConfig)
+
+  def all_entrances(self) -> List[EntranceLine]:
+    return ([self.entrance_line] if self.entrance_line else []) + list(self.entrances)
 
 
 def _load_normalized_point(raw: Sequence[float]) -> NormalizedPoint:
@@ -44,6 +177,18 @@ def _load_normalized_point(raw: Sequence[float]) -> NormalizedPoint:
   return x, y
 
 
+def _load_entrance(entrance_id: str, raw: dict) -> EntranceLine:
+  if "start" not in raw or "end" not in raw:
+    raise ValueError(f"Entrance {entrance_id} needs start and end points")
+  return EntranceLine(
+    start=_load_normalized_point(raw["start"]),
+    end=_load_normalized_point(raw["end"]),
+    inside_on=str(raw.get("inside_on", "top")).lower(),
+    id=str(raw.get("id") or entrance_id),
+    name=raw.get("name"),
+  )
+
+
 def _load_zone(zone_id: str, raw_zone: dict) -> Zone:
   polygon_raw = raw_zone.get("polygon")
   if not polygon_raw:
@@ -56,16 +201,140 @@ def _load_zone(zone_id: str, raw_zone: dict) -> Zone:
   )
 
 
+def _load_adaptive(raw: dict) -> AdaptiveConfig:
+  defaults = AdaptiveConfig()
+  levels = defaults.levels
+  if raw.get("levels"):
+    levels = [
+      QualityLevel(
+        imgsz=int(level["imgsz"]),
+        vid_stride=int(level.get("vid_stride", 1)),
+        face_interval=int(level.get("face_interval", 10)),
+      )
+      for level in raw["levels"]
+    ]
+  start_level = int(raw.get("start_level", min(defaults.start_level, len(levels) - 1)))
+  if not 0 <= start_level < len(levels):
+    raise ValueError(f"adaptive.start_level {start_level} is outside the {len(levels)} configured levels")
+  return AdaptiveConfig(
+    enabled=bool(raw.get("enabled", True)),
+    target_fps=float(raw.get("target_fps", defaults.target_fps)),
+    levels=levels,
+    start_level=start_level,
+    low_ratio=float(raw.get("low_ratio", defaults.low_ratio)),
+    high_ratio=float(raw.get("high_ratio", defaults.high_ratio)),
+    hold_seconds=float(raw.get("hold_seconds", defaults.hold_seconds)),
+    cooldown_seconds=float(raw.get("cooldown_seconds", defaults.cooldown_seconds)),
+  )
+
+
+def _load_motion(raw: dict) -> MotionConfig:
+  defaults = MotionConfig()
+  motion = MotionConfig(
+    enabled=bool(raw.get("enabled", True)),
+    width=int(raw.get("width", defaults.width)),
+    grid_width=int(raw.get("grid_width", defaults.grid_width)),
+    grid_height=int(raw.get("grid_height", defaults.grid_height)),
+    pixel_threshold=int(raw.get("pixel_threshold", defaults.pixel_threshold)),
+    tile_threshold=float(raw.get("tile_threshold", defaults.tile_threshold)),
+    refresh_seconds=float(raw.get("refresh_seconds", defaults.refresh_seconds)),
+  )
+  if motion.width < motion.grid_width * 4:
+    raise ValueError(f"motion.width {motion.width} is too small for a {motion.grid_width}-column grid")
+  return motion
+
+
+def _load_roi(raw: dict) -> RoiConfig:
+  defaults = RoiConfig()
+  return RoiConfig(
+    enabled=bool(raw.get("enabled", True)),
+    margin=float(raw.get("margin", defaults.margin)),
+    max_area=float(raw.get("max_area", defaults.max_area)),
+  )
+
+
+def _load_demographics(raw: dict) -> DemographicsConfig:
+  defaults = DemographicsConfig()
+  demographics = DemographicsConfig(
+    mode=str(raw.get("mode", defaults.mode)).lower(),
+    upper_fraction=float(raw.get("upper_fraction", defaults.upper_fraction)),
+    tile_size=int(raw.get("tile_size", defaults.tile_size)),
+    max_tiles=int(raw.get("max_tiles", defaults.max_tiles)),
+    schedule=bool(raw.get("schedule", defaults.schedule)),
+    converge_samples=int(raw.get("converge_samples", defaults.converge_samples)),
+    converge_vote_share=float(raw.get("converge_vote_share", defaults.converge_vote_share)),
+    converge_age_spread=float(raw.get("converge_age_spread", defaults.converge_age_spread)),
+    regrow_ratio=float(raw.get("regrow_ratio", defaults.regrow_ratio)),
+    max_attempts=int(raw.get("max_attempts", defaults.max_attempts)),
+  )
+  if demographics.mode not in {"frame", "crops"}:
+    raise ValueError(f"demographics.mode must be 'frame' or 'crops', got {demographics.mode!r}")
+  if demographics.tile_size % 32:
+    raise ValueError(f"demographics.tile_size must be a multiple of 32, got {demographics.tile_size}")
+  if not 0.0 < demographics.upper_fraction <= 1.0:
+    raise ValueError(f"demographics.upper_fraction must be in (0, 1], got {demographics.upper_fraction}")
+  return demographics
+
+
+def _load_zone_raster(raw: dict) -> ZoneRasterConfig:
+  defaults = ZoneRasterConfig()
+  raster = ZoneRasterConfig(
+    enabled=bool(raw.get("enabled", True)),
+    width=int(raw.get("width", defaults.width)),
+    height=int(raw.get("height", defaults.height)),
+  )
+  if raster.width < 1 or raster.height < 1:
+    raise ValueError(f"zone_raster size must be positive, got {raster.width}x{raster.height}")
+  return raster
+
+
+def _load_tracking(raw: dict) -> TrackingConfig:
+  tracking = TrackingConfig(ttl_seconds=float(raw.get("ttl_seconds", TrackingConfig().ttl_seconds)))
+  if tracking.ttl_seconds < 0:
+    raise ValueError(f"tracking.ttl_seconds must not be negative, got {tracking.ttl_seconds}")
+  return tracking
+
+
+def _load_history(raw: dict) -> HistoryConfig:
+  defaults = HistoryConfig()
+  history = HistoryConfig(
+    enabled=bool(raw.get("enabled", True)),
+    path=raw.get("path") or None,
+    camera=raw.get("camera") or None,
+    raw_days=float(raw.get("raw_days", defaults.raw_days)),
+    minute_days=float(raw.get("minute_days", defaults.minute_days)),
+    hour_days=float(raw.get("hour_days", defaults.hour_days)),
+    day_days=float(raw.get("day_days", defaults.day_days)),
+  )
+  for name in ("raw_days", "minute_days", "hour_days", "day_days"):
+    if getattr(history, name) <= 0:
+      raise ValueError(f"history.{name} must be positive, got {getattr(history, name)}")
+  return history
+
+
+def _load_reid(raw: dict) -> ReidConfig:
+  defaults = ReidConfig()
+  return ReidConfig(
+    enabled=bool(raw.get("enabled", True)),
+    ttl_seconds=float(raw.get("ttl_seconds", defaults.ttl_seconds)),
+    capacity=int(raw.get("capacity", defaults.capacity)),
+    similarity=float(raw.get("similarity", defaults.similarity)),
+  )
+
+
 def load_config(path: Path) -> AnalyticsConfig:
   data = yaml.safe_load(path.read_text())
   entrance_line = None
   if "entrance_line" in data:
-    raw = data["entrance_line"]
-    entrance_line = EntranceLine(
-      start=_load_normalized_point(raw["start"]),
-      end=_load_normalized_point(raw["end"]),
-      inside_on=str(raw.get("inside_on", "top")).lower(),
-    )
+    entrance_line = _load_entrance("entrance", data["entrance_line"])
+
+  entrances = [
+    _load_entrance(f"entrance-{idx}", raw_entrance)
+    for idx, raw_entrance in enumerate(data.get("entrances") or [], start=1)
+  ]
+  entrance_ids = [entrance.id for entrance in ([entrance_line] if entrance_line else []) + entrances]
+  if len(set(entrance_ids)) != len(entrance_ids):
+    raise ValueError(f"Entrance ids must be unique, got {entrance_ids}")
 
   queue_zone = None
   if "queue_zone" in data and data["queue_zone"]:
@@ -80,11 +349,31 @@ def load_config(path: Path) -> AnalyticsConfig:
   heatmap = HeatmapConfig(
     grid_width=int(heatmap_raw.get("grid_width", 6)),
     grid_height=int(heatmap_raw.get("grid_height", 4)),
+    half_life_seconds=float(heatmap_raw.get("half_life_seconds", 6.5)),
+    sigma_cells=float(heatmap_raw.get("sigma_cells", 0.0)),
   )
 
+  adaptive = _load_adaptive(data["adaptive"]) if data.get("adaptive") else AdaptiveConfig()
+  motion = _load_motion(data["motion"]) if data.get("motion") else MotionConfig()
+  roi = _load_roi(data["roi"]) if data.get("roi") else RoiConfig()
+  demographics = _load_demographics(data["demographics"]) if data.get("demographics") else DemographicsConfig()
+  reid = _load_reid(data["reid"]) if data.get("reid") else ReidConfig()
+  tracking = _load_tracking(data["tracking"]) if data.get("tracking") else TrackingConfig()
+  zone_raster = _load_zone_raster(data["zone_raster"]) if data.get("zone_raster") else ZoneRasterConfig()
+  history = _load_history(data["history"]) if data.get("history") else HistoryConfig()
+
   return AnalyticsConfig(
     entrance_line=entrance_line,
+    entrances=entrances,
     queue_zone=queue_zone,
     tables=tables,
     heatmap=heatmap,
+    adaptive=adaptive,
+    motion=motion,
+    roi=roi,
+    demographics=demographics,
+    reid=reid,
+    tracking=tracking,
+    zone_raster=zone_raster,
+    history=history,
   )
@@ -0,0 +1,456 @@
+"""Face analysis helpers: matching faces to tracks, person-crop mosaics and a background worker."""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .config import DemographicsConfig
+
+try:
+  import lap
+except Exception:  # pragma: no cover - fall back to greedy assignment without lapx
+  lap = None
+
+NormalizedBox = Tuple[float, float, float, float]
+
+
+@dataclass
+class TrackSnapshot:
+  """What face matching needs from a ``TrackedPerson`` at the time the frame was taken."""
+
+  track_id: int
+  bbox_norm: NormalizedBox
+  center_norm: Tuple[float, float]
+  # Tracks that are not due for analysis still take part in matching, so their
+  # faces are not handed to a neighbouring track
+  analyse: bool = True
+
+
+@dataclass
+class FaceObservation:
+  track_id: int
+  age: Optional[float]
+  gender: Optional[str]
+  # Recognition embedding, when the face model computes one
+  embedding: Optional[np.ndarray] = None
+
+
+@dataclass
+class DemographicsJob:
+  frame: np.ndarray
+  tracks: List[TrackSnapshot]
+  timestamp: float
+  submitted: float
+
+
+@dataclass
+class DemographicsResult:
+  timestamp: float
+  observations: List[FaceObservation]
+
+
+@dataclass
+class DemographicsStats:
+  submitted: int = 0
+  completed: int = 0
+  dropped: int = 0
+  failed: int = 0
+  queue_depth: int = 0
+  latency_ms: float = 0.0
+  analysis_ms: float = 0.0
+
+  def record(self, latency: float, analysis: float) -> None:
+    self.completed += 1
+    latency_ms, analysis_ms = latency * 1000.0, analysis * 1000.0
+    if self.completed == 1:
+      self.latency_ms, self.analysis_ms = latency_ms, analysis_ms
+    else:
+      self.latency_ms = 0.9 * self.latency_ms + 0.1 * latency_ms
+      self.analysis_ms = 0.9 * self.analysis_ms + 0.1 * analysis_ms
+
+  def to_dict(self) -> dict:
+    return {
+      "submitted": self.submitted,
+      "completed": self.completed,
+      "dropped": self.dropped,
+      "failed": self.failed,
+      "queueDepth": self.queue_depth,
+      "latencyMs": round(self.latency_ms, 1),
+      "analysisMs": round(self.analysis_ms, 1),
+    }
+
+
+def face_attributes(face) -> Tuple[Optional[float], Optional[str]]:
+  """Read (age, gender) from an InsightFace face, across old and new attribute APIs."""
+  age = float(face.age) if getattr(face, "age", None) is not None else None
+  gender: Optional[str] = None
+  if getattr(face, "sex", None) is not None:
+    # Handle both old (float) and new (string) InsightFace API
+    if isinstance(face.sex, str):
+      gender = "male" if face.sex.upper() == 'M' else "female"
+    else:
+      gender = "male" if float(face.sex) > 0.5 else "female"
+  elif getattr(face, "gender", None) is not None:
+    gender = "male" if int(face.gender) == 1 else "female"
+  return age, gender
+
+
+def assign_pairs(cost: np.ndarray, valid: np.ndarray) -> List[Tuple[int, int]]:
+  """Minimum-cost one-to-one assignment restricted to ``valid`` (rows x cols) pairs."""
+  if not valid.any():
+    return []
+  if lap is not None:
+    limit = float(cost[valid].max()) + 1.0
+    _, rows_to_cols, _ = lap.lapjv(np.where(valid, cost, limit * 2.0), extend_cost=True, cost_limit=limit)
+    return [(row, int(col)) for row, col in enumerate(rows_to_cols) if col >= 0 and valid[row, col]]
+  # Greedy fallback: repeatedly take every pair that is each other's cheapest option
+  cost = np.where(valid, cost, np.inf)
+  rows_index = np.arange(cost.shape[0])
+  pairs: List[Tuple[int, int]] = []
+  while True:
+    best_col = cost.argmin(axis=1)
+    best_row = cost.argmin(axis=0)
+    open_rows = np.isfinite(cost[rows_index, best_col])
+    if not open_rows.any():
+      return pairs
+    rows = np.flatnonzero(open_rows & (best_row[best_col] == rows_index))
+    if rows.size == 0:
+      # Ties can leave no mutual pair; take the single cheapest one instead
+      rows = np.array([int(np.argmin(cost[rows_index, best_col]))])
+    cols = best_col[rows]
+    pairs.extend(zip(rows.tolist(), cols.tolist()))
+    cost[rows, :] = np.inf
+    cost[:, cols] = np.inf
+
+
+def match_faces(
+  faces: Sequence,
+  tracks: Sequence[TrackSnapshot],
+  frame_w: int,
+  frame_h: int,
+  max_distance: float = 100.0,
+) -> List[FaceObservation]:
+  """
+  Assign faces to tracks one-to-one in a single array pass.
+
+  A face may go to a track whose box contains its centre and whose centre is
+  within ``max_distance`` pixels; among those, the assignment minimising the
+  total squared distance wins, so two faces never update the same track.
+  """
+  if not faces or not tracks:
+    return []
+  face_boxes = np.array([face.bbox[:4] for face in faces], dtype=np.float64)
+  face_centers = (face_boxes[:, :2] + face_boxes[:, 2:]) / 2.0
+  scale = np.array([frame_w, frame_h], dtype=np.float64)
+  track_boxes = np.array([track.bbox_norm for track in tracks], dtype=np.float64) * np.tile(scale, 2)
+  track_centers = np.array([track.center_norm for track in tracks], dtype=np.float64) * scale
+
+  fx, fy = face_centers[:, 0:1], face_centers[:, 1:2]
+  contains = (
+    (track_boxes[None, :, 0] <= fx) & (fx <= track_boxes[None, :, 2])
+    & (track_boxes[None, :, 1] <= fy) & (fy <= track_boxes[None, :, 3])
+  )
+  distance = (fx - track_centers[None, :, 0]) ** 2 + (fy - track_centers[None, :, 1]) ** 2
+  valid = contains & (distance < max_distance ** 2)
+
+  observations: List[FaceObservation] = []
+  for face_index, track_index in assign_pairs(distance, valid):
+    track = tracks[track_index]
+    if track.analyse:
+      face = faces[face_index]
+      age, gender = face_attributes(face)
+      observations.append(FaceObservation(track.track_id, age, gender, getattr(face, "embedding", None)))
+  return observations
+
+
+@dataclass
+class MosaicTile:
+  """Where one person crop was placed in the mosaic (pixel coordinates)."""
+
+  track_id: int
+  x: int
+  y: int
+  width: int
+  height: int
+
+
+def build_mosaic(
+  frame: np.ndarray,
+  tracks: Sequence[TrackSnapshot],
+  upper_fraction: float,
+  tile_size: int,
+  max_tiles: int,
+) -> Tuple[Optional[np.ndarray], List[MosaicTile]]:
+  """
+  Tile the upper part of each person box into one image for a single detector pass.
+
+  Each crop is scaled to fit a ``tile_size`` square, so small faces far from the
+  camera are enlarged rather than lost at the detector's input resolution.
+  """
+  frame_h, frame_w = frame.shape[:2]
+  crops: List[Tuple[int, np.ndarray]] = []
+  for track in [track for track in tracks if track.analyse][:max_tiles]:
+    x1, y1, x2, y2 = track.bbox_norm
+    px1, px2 = max(0, int(x1 * frame_w)), min(frame_w, math.ceil(x2 * frame_w))
+    py1 = max(0, int(y1 * frame_h))
+    py2 = min(frame_h, math.ceil((y1 + (y2 - y1) * upper_fraction) * frame_h))
+    if px2 - px1 < 8 or py2 - py1 < 8:
+      continue
+    crops.append((track.track_id, frame[py1:py2, px1:px2]))
+  if not crops:
+    return None, []
+
+  cols = math.ceil(math.sqrt(len(crops)))
+  rows = math.ceil(len(crops) / cols)
+  mosaic = np.zeros((rows * tile_size, cols * tile_size, 3), dtype=frame.dtype)
+  tiles: List[MosaicTile] = []
+  for index, (track_id, crop) in enumerate(crops):
+    row, col = divmod(index, cols)
+    crop_h, crop_w = crop.shape[:2]
+    scale = min(tile_size / crop_w, tile_size / crop_h)
+    width, height = max(1, int(crop_w * scale)), max(1, int(crop_h * scale))
+    x, y = col * tile_size, row * tile_size
+    mosaic[y:y + height, x:x + width] = cv2.resize(crop, (width, height), interpolation=cv2.INTER_LINEAR)
+    tiles.append(MosaicTile(track_id, x, y, width, height))
+  return mosaic, tiles
+
+
+def detect_faces(face_app, image: np.ndarray) -> List:
+  """``FaceAnalysis.get`` with the detector input sized to ``image`` instead of ``det_size``."""
+  from insightface.app.common import Face
+
+  image_h, image_w = image.shape[:2]
+  bboxes, kpss = face_app.det_model.detect(image, input_size=(image_w, image_h), max_num=0, metric="default")
+  faces = []
+  for index in range(bboxes.shape[0]):
+    face = Face(bbox=bboxes[index, 0:4], kps=None if kpss is None else kpss[index], det_score=bboxes[index, 4])
+    for taskname, model in face_app.models.items():
+      if taskname == "detection":
+        continue
+      model.get(image, face)
+    faces.append(face)
+  return faces
+
+
+def match_mosaic_faces(faces: Sequence, tiles: Sequence[MosaicTile]) -> List[FaceObservation]:
+  """Each tile holds one person, so its most confident face belongs to that track."""
+  best: Dict[int, Tuple[float, object]] = {}
+  for face in faces:
+    fx1, fy1, fx2, fy2 = face.bbox.astype(float).tolist()
+    fcx, fcy = (fx1 + fx2) / 2.0, (fy1 + fy2) / 2.0
+    for tile in tiles:
+      if tile.x <= fcx < tile.x + tile.width and tile.y <= fcy < tile.y + tile.height:
+        score = float(getattr(face, "det_score", 0.0) or 0.0)
+        if tile.track_id not in best or score > best[tile.track_id][0]:
+          best[tile.track_id] = (score, face)
+        break
+  observations: List[FaceObservation] = []
+  for track_id, (_, face) in best.items():
+    age, gender = face_attributes(face)
+    observations.append(FaceObservation(track_id, age, gender, getattr(face, "embedding", None)))
+  return observations
+
+
+@dataclass
+class TrackBudget:
+  attempts: int = 0
+  last_attempt: float = 0.0
+  # Box area when the track was last analysed
+  last_area: float = 0.0
+  # last_attempt and last_area before the latest charge, restored by a refund
+  previous: Tuple[float, float] = (0.0, 0.0)
+
+
+class DemographicsScheduler:
+  """
+  Decide which tracks are worth a face analysis this round.
+
+  New tracks and tracks without a gender come first; tracks whose box has grown
+  by ``regrow_ratio`` since their last analysis (closer to the camera, so a
+  better face) are re-queued. Tracks whose age and gender estimates have
+  converged, or that used up ``max_attempts``, are left alone, so cost follows
+  arrivals rather than occupancy.
+  """
+
+  def __init__(self, config: DemographicsConfig) -> None:
+    self.config = config
+    self.budgets: Dict[int, TrackBudget] = {}
+    self.selected = 0
+    self.refunded = 0
+    self.idle_rounds = 0
+    self.converged = 0
+    self.exhausted = 0
+
+  def is_converged(self, person) -> bool:
+    samples = self.config.converge_samples
+    ages, votes = person.age_history, person.gender_history
+    if len(ages) < samples or len(votes) < samples:
+      return False
+    majority = max(votes.count("male"), votes.count("female")) / len(votes)
+    if majority < self.config.converge_vote_share:
+      return False
+    q25, q75 = np.percentile(np.asarray(ages, dtype=float), [25, 75])
+    return q75 - q25 <= self.config.converge_age_spread
+
+  def select(self, people: Sequence, now: float, limit: Optional[int] = None) -> List[int]:
+    """Return the track ids to analyse, highest priority first, and charge their budgets."""
+    present = {person.track_id for person in people}
+    for track_id in [track_id for track_id in self.budgets if track_id not in present]:
+      del self.budgets[track_id]
+
+    scored: List[Tuple[float, int, float]] = []
+    converged = exhausted = 0
+    for person in people:
+      budget = self.budgets.setdefault(person.track_id, TrackBudget())
+      x1, y1, x2, y2 = person.bbox_norm
+      area = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+      growth = area / budget.last_area if budget.last_area > 0 else 1.0
+      regrown = budget.attempts > 0 and growth >= self.config.regrow_ratio
+      if not regrown:
+        if self.is_converged(person):
+          converged += 1
+          continue
+        if budget.attempts >= self.config.max_attempts:
+          exhausted += 1
+          continue
+
+      score = -float(budget.attempts)
+      if budget.attempts == 0:
+        score += 100.0
+      if person.gender == "unknown":
+        score += 50.0
+      if regrown:
+        score += 25.0 * min(growth, 4.0)
+      # Among equals, prefer the track that waited longest
+      score += min(now - budget.last_attempt, 10.0) if budget.attempts else 0.0
+      scored.append((score, person.track_id, area))
+
+    self.converged, self.exhausted = converged, exhausted
+    scored.sort(reverse=True)
+    if limit is not None:
+      scored = scored[:limit]
+    for _, track_id, area in scored:
+      budget = self.budgets[track_id]
+      budget.previous = (budget.last_attempt, budget.last_area)
+      budget.attempts += 1
+      budget.last_attempt = now
+      budget.last_area = area
+    self.selected += len(scored)
+    if not scored:
+      self.idle_rounds += 1
+    return [track_id for _, track_id, _ in scored]
+
+  def refund(self, track_ids: Iterable[int]) -> None:
+    """Give back the attempts ``select`` charged for tracks whose analysis never ran."""
+    for track_id in track_ids:
+      budget = self.budgets.get(track_id)
+      if budget is None or budget.attempts == 0:
+        continue
+      budget.attempts -= 1
+      budget.last_attempt, budget.last_area = budget.previous
+      self.refunded += 1
+
+  def to_dict(self) -> dict:
+    return {
+      "tracked": len(self.budgets),
+      "converged": self.converged,
+      "exhausted": self.exhausted,
+      "selected": self.selected,
+      "refunded": self.refunded,
+      "idleRounds": self.idle_rounds,
+    }
+
+
+class DemographicsWorker:
+  """
+  Run face analysis on a background thread so the tracking loop never waits on it.
+
+  ``submit`` queues a frame with a snapshot of the tracks it contains; when more
+  than ``max_pending`` jobs are waiting the oldest is dropped, since a newer
+  frame shows the same people, and handed to ``on_drop``. Finished observations are collected with
+  ``drain`` on the caller's thread and applied by track id. onnxruntime releases
+  the GIL during inference, so a thread is enough to overlap it with tracking.
+  """
+
+  def __init__(
+    self,
+    analyse: Callable[[np.ndarray, List[TrackSnapshot]], List[FaceObservation]],
+    max_pending: int = 1,
+    on_drop: Optional[Callable[[DemographicsJob], None]] = None,
+  ) -> None:
+    if max_pending < 1:
+      raise ValueError(f"max_pending must be >= 1, got {max_pending}")
+    self.analyse = analyse
+    self.max_pending = max_pending
+    self.on_drop = on_drop
+    self.stats = DemographicsStats()
+
+    self._jobs: Deque[DemographicsJob] = deque()
+    self._results: Deque[DemographicsResult] = deque()
+    self._cond = threading.Condition()
+    self._stopped = threading.Event()
+    self._thread: Optional[threading.Thread] = None
+
+  def start(self) -> "DemographicsWorker":
+    if self._thread is None:
+      self._thread = threading.Thread(target=self._run, name="demographics", daemon=True)
+      self._thread.start()
+    return self
+
+  def stop(self) -> None:
+    self._stopped.set()
+    with self._cond:
+      self._cond.notify_all()
+    if self._thread is not None:
+      self._thread.join(timeout=5.0)
+      self._thread = None
+
+  def submit(self, frame: np.ndarray, tracks: List[TrackSnapshot], timestamp: float) -> None:
+    self.start()
+    job = DemographicsJob(frame=frame, tracks=tracks, timestamp=timestamp, submitted=time.perf_counter())
+    dropped: Optional[DemographicsJob] = None
+    with self._cond:
+      if len(self._jobs) >= self.max_pending:
+        dropped = self._jobs.popleft()
+        self.stats.dropped += 1
+      self._jobs.append(job)
+      self.stats.submitted += 1
+      self.stats.queue_depth = len(self._jobs)
+      self._cond.notify()
+    if dropped is not None and self.on_drop is not None:
+      self.on_drop(dropped)
+
+  def drain(self) -> List[DemographicsResult]:
+    """Return the results finished since the last call, oldest first."""
+    results: List[DemographicsResult] = []
+    while self._results:
+      results.append(self._results.popleft())
+    return results
+
+  def _run(self) -> None:
+    while True:
+      with self._cond:
+        self._cond.wait_for(lambda: self._jobs or self._stopped.is_set())
+        if self._stopped.is_set():
+          return
+        job = self._jobs.popleft()
+        self.stats.queue_depth = len(self._jobs)
+
+      started = time.perf_counter()
+      try:
+        observations = self.analyse(job.frame, job.tracks)
+      except Exception as err:  # pragma: no cover - runtime-only
+        self.stats.failed += 1
+        print(f"[WARN] Demographics analysis failed: {err}")
+        continue
+      finished = time.perf_counter()
+      self.stats.record(finished - job.submitted, finished - started)
+      self._results.append(DemographicsResult(timestamp=job.timestamp, observations=observations))
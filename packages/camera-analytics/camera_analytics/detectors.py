@@ -0,0 +1,169 @@
+"""Detector loading: PyTorch or exported CPU runtimes, with an export cache and warm-up."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from ultralytics import YOLO
+
+BACKENDS = ("pytorch", "torchscript", "onnx", "openvino")
+PRECISIONS = ("fp32", "fp16", "int8")
+
+# ultralytics export format name and the artifact suffix it produces
+_EXPORT_FORMATS = {
+  "torchscript": ("torchscript", ".torchscript"),
+  "onnx": ("onnx", ".onnx"),
+  "openvino": ("openvino", "_openvino_model"),
+}
+
+
+@dataclass
+class DetectorSpec:
+  backend: str = "pytorch"
+  precision: str = "fp32"
+  imgsz: int = 512
+  cache_dir: Optional[Path] = None
+  warmup: bool = True
+  # Representative dataset yaml for OpenVINO INT8 calibration (ultralytics default if unset)
+  calibration_data: Optional[str] = None
+
+  def __post_init__(self) -> None:
+    if self.backend not in BACKENDS:
+      raise ValueError(f"Unknown detector backend {self.backend!r}, expected one of {BACKENDS}")
+    if self.precision not in PRECISIONS:
+      raise ValueError(f"Unknown precision {self.precision!r}, expected one of {PRECISIONS}")
+    if self.backend == "pytorch" and self.precision != "fp32":
+      raise ValueError("The pytorch backend runs fp32 on CPU; export to openvino for fp16 or onnx/openvino for int8")
+    if self.backend in ("onnx", "torchscript") and self.precision == "fp16":
+      # ultralytics only exports these as fp16 on a GPU; on CPU it quietly writes fp32
+      print(f"[WARN] {self.backend} fp16 export needs a GPU; using fp32 instead")
+      self.precision = "fp32"
+    if self.backend == "torchscript" and self.precision == "int8":
+      raise ValueError("INT8 is supported for the onnx and openvino backends only")
+
+  @property
+  def fixed_imgsz(self) -> bool:
+    """Exported graphs are traced at one input size, so imgsz cannot change at runtime."""
+    return self.backend != "pytorch"
+
+
+def default_cache_dir() -> Path:
+  env = os.environ.get("OBSERVAI_MODEL_CACHE")
+  if env:
+    return Path(env)
+  return Path.home() / ".cache" / "observai" / "models"
+
+
+def _configure(model: YOLO) -> YOLO:
+  # Optimize YOLO runtime configuration
+  try:
+    model.overrides['verbose'] = False
+    model.overrides['conf'] = 0.5
+    model.overrides['iou'] = 0.45
+    model.overrides['max_det'] = 50
+    model.overrides['half'] = False
+    model.overrides['device'] = 'cpu'
+  except Exception:  # pragma: no cover - safety guard
+    pass
+  return model
+
+
+def load_model(model_path: str) -> YOLO:
+  return _configure(YOLO(model_path))
+
+
+def _checkpoint_key(model_path: str) -> str:
+  """
+  Name plus a fingerprint of the resolved path, size and mtime of a local checkpoint.
+
+  Two checkpoints that share a file name (``a/best.pt``, ``b/best.pt``) get
+  separate exports, and replacing one in place invalidates its export. Names
+  that are not local files (ultralytics downloads them) are keyed by name.
+  """
+  path = Path(model_path)
+  try:
+    stat = path.stat()
+  except OSError:
+    return path.stem
+  fingerprint = f"{path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+  return f"{path.stem}-{hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:10]}"
+
+
+def artifact_path(model_path: str, spec: DetectorSpec) -> Path:
+  """Cache location for an exported model, keyed by checkpoint, imgsz and precision."""
+  _, suffix = _EXPORT_FORMATS[spec.backend]
+  cache_dir = spec.cache_dir or default_cache_dir()
+  key = f"{_checkpoint_key(model_path)}-{spec.imgsz}-{spec.precision}"
+  return cache_dir / spec.backend / f"{key}{suffix}"
+
+
+def ensure_exported(model_path: str, spec: DetectorSpec) -> Path:
+  """Return the cached artifact for ``spec``, exporting it on first use."""
+  target = artifact_path(model_path, spec)
+  if target.exists():
+    return target
+
+  target.parent.mkdir(parents=True, exist_ok=True)
+  print(f"[INFO] Exporting {model_path} to {spec.backend} ({spec.precision}, imgsz={spec.imgsz})...")
+  started = time.time()
+  export_format, _ = _EXPORT_FORMATS[spec.backend]
+  export_kwargs = {
+    "format": export_format,
+    "imgsz": spec.imgsz,
+    "half": spec.precision == "fp16",
+    "device": "cpu",
+    "verbose": False,
+  }
+  if spec.backend == "openvino" and spec.precision == "int8":
+    export_kwargs["int8"] = True
+    if spec.calibration_data:
+      export_kwargs["data"] = spec.calibration_data
+
+  exported = Path(YOLO(model_path).export(**export_kwargs))
+
+  if spec.backend == "onnx" and spec.precision == "int8":
+    # ultralytics has no ONNX INT8 path; quantise the fp32 graph's weights instead
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized = exported.with_name(f"{exported.stem}-int8.onnx")
+    quantize_dynamic(str(exported), str(quantized), weight_type=QuantType.QInt8)
+    exported.unlink()
+    exported = quantized
+
+  # Exporting may have downloaded the checkpoint, which changes its key
+  target = artifact_path(model_path, spec)
+  target.parent.mkdir(parents=True, exist_ok=True)
+  # Export writes next to the weights; move it into the cache atomically
+  staging = target.with_name(f".{target.name}.{os.getpid()}")
+  shutil.move(str(exported), str(staging))
+  os.replace(staging, target)
+  print(f"[INFO] Cached {target} ({time.time() - started:.1f}s)")
+  return target
+
+
+def warm_up(model: YOLO, imgsz: int, runs: int = 2) -> float:
+  """Run dummy inferences so graph setup is not paid on the first real frame."""
+  dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+  started = time.perf_counter()
+  for _ in range(runs):
+    model.predict(dummy, imgsz=imgsz, verbose=False, device='cpu')
+  return (time.perf_counter() - started) * 1000.0 / runs
+
+
+def load_detector(model_path: str, spec: Optional[DetectorSpec] = None) -> YOLO:
+  spec = spec or DetectorSpec()
+  if spec.backend == "pytorch":
+    model = load_model(model_path)
+  else:
+    model = _configure(YOLO(str(ensure_exported(model_path, spec)), task="detect"))
+  if spec.warmup:
+    warmup_ms = warm_up(model, spec.imgsz)
+    print(f"[INFO] Detector warm-up ({spec.backend}/{spec.precision}): {warmup_ms:.1f} ms per frame")
+  return model
@@ -0,0 +1,145 @@
+"""Compact binary log of per-frame tracker output and face attributes."""
+
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"OBSDLOG1"
+VERSION = 1
+HEADER = struct.Struct("<8sII")
+# Pad the header so records start on a 16-byte boundary
+HEADER_SIZE = 16
+
+# Record kinds
+FRAME = 0  # detector ran on this frame (track rows follow)
+SKIPPED = 1  # detector was skipped by the motion gate
+TRACK = 2
+FACE = 3
+
+GENDER_CODES = {"unknown": -1, "female": 0, "male": 1}
+GENDER_NAMES = {code: name for name, code in GENDER_CODES.items()}
+
+RECORD_DTYPE = np.dtype(
+  [
+    ("kind", "<u1"),
+    ("gender", "<i1"),
+    ("frame", "<u4"),
+    ("ts", "<f8"),
+    ("track_id", "<i4"),
+    ("x1", "<f4"),
+    ("y1", "<f4"),
+    ("x2", "<f4"),
+    ("y2", "<f4"),
+    ("age", "<f4"),
+  ]
+)
+
+
+class DetectionLogWriter:
+  """
+  Append fixed-size records (see ``RECORD_DTYPE``) to a log file.
+
+  Every processed frame gets a ``FRAME`` or ``SKIPPED`` marker, followed by one
+  ``TRACK`` row per tracked box (normalised xyxy) and one ``FACE`` row per face
+  observation applied to a track. Records are buffered and written in blocks.
+  """
+
+  def __init__(self, path: Path, flush_every: int = 4096) -> None:
+    self.path = path
+    self.flush_every = flush_every
+    self.records = 0
+    self._buffer = np.zeros(flush_every, dtype=RECORD_DTYPE)
+    self._pending = 0
+    path.parent.mkdir(parents=True, exist_ok=True)
+    self._handle: Optional[BinaryIO] = path.open("wb")
+    self._handle.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize).ljust(HEADER_SIZE, b"\0"))
+
+  def write_frame(
+    self,
+    ts: float,
+    frame: int,
+    track_ids: Optional[np.ndarray],
+    boxes_norm: Optional[np.ndarray],
+    skipped: bool = False,
+  ) -> None:
+    self._append(SKIPPED if skipped else FRAME, ts, frame)
+    if track_ids is None:
+      return
+    for track_id, box in zip(track_ids, boxes_norm):
+      self._append(TRACK, ts, frame, track_id=int(track_id), box=box)
+
+  def write_face(self, ts: float, frame: int, track_id: int, age: Optional[float], gender: Optional[str]) -> None:
+    self._append(
+      FACE,
+      ts,
+      frame,
+      track_id=track_id,
+      age=float("nan") if age is None else float(age),
+      gender=GENDER_CODES.get(gender or "unknown", -1),
+    )
+
+  def _append(
+    self,
+    kind: int,
+    ts: float,
+    frame: int,
+    track_id: int = -1,
+    box: Tuple[float, float, float, float] = (0.0, 0.0, 0.0, 0.0),
+    age: float = float("nan"),
+    gender: int = -1,
+  ) -> None:
+    row = self._buffer[self._pending]
+    row["kind"] = kind
+    row["gender"] = gender
+    row["frame"] = frame
+    row["ts"] = ts
+    row["track_id"] = track_id
+    row["x1"], row["y1"], row["x2"], row["y2"] = box
+    row["age"] = age
+    self._pending += 1
+    self.records += 1
+    if self._pending == self.flush_every:
+      self.flush()
+
+  def flush(self) -> None:
+    if self._handle is None or self._pending == 0:
+      return
+    self._handle.write(self._buffer[: self._pending].tobytes())
+    self._handle.flush()
+    self._pending = 0
+
+  def close(self) -> None:
+    if self._handle is None:
+      return
+    self.flush()
+    self._handle.close()
+    self._handle = None
+
+
+def open_log(path: Path) -> np.memmap:
+  """Memory-map a log as a structured array of ``RECORD_DTYPE`` rows."""
+  with path.open("rb") as handle:
+    magic, version, itemsize = HEADER.unpack(handle.read(HEADER.size))
+  if magic != MAGIC:
+    raise ValueError(f"{path} is not a detection log")
+  if version != VERSION or itemsize != RECORD_DTYPE.itemsize:
+    raise ValueError(f"{path} has unsupported log version {version} (record size {itemsize})")
+  # A recorder that was killed can leave part of a record at the end; map only the whole ones
+  count, tail = divmod(path.stat().st_size - HEADER_SIZE, RECORD_DTYPE.itemsize)
+  if tail:
+    print(f"[WARN] {path} ends in a partial record; ignoring its last {tail} bytes")
+  if count == 0:
+    return np.zeros(0, dtype=RECORD_DTYPE)
+  return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def iter_frames(records: np.ndarray) -> Iterator[np.ndarray]:
+  """Yield the records of each frame in order, starting at its marker row."""
+  markers = np.flatnonzero(records["kind"] <= SKIPPED)
+  bounds: List[int] = markers.tolist() + [len(records)]
+  for start, end in zip(bounds[:-1], bounds[1:]):
+    yield records[start:end]
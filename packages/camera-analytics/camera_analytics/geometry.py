@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Iterable, Tuple
+from typing import Optional, Sequence, Tuple
 
 import numpy as np
-from shapely.geometry import Point, Polygon
 
-from .config import NormalizedPoint
+from .config import AnalyticsConfig, EntranceLine, NormalizedPoint
+
+NormalizedBox = Tuple[float, float, float, float]
 
 
 def denormalize(point: NormalizedPoint, width: int, height: int) -> Tuple[int, int]:
@@ -15,21 +16,246 @@ def denormalize(point: NormalizedPoint, width: int, height: int) -> Tuple[int, i
   return int(x * width), int(y * height)
 
 
-def point_in_polygon(point: Tuple[float, float], polygon: Iterable[Tuple[float, float]]) -> bool:
-  poly = Polygon(polygon)
-  return poly.contains(Point(point)) or poly.touches(Point(point))
+class CompiledZones:
+  """
+  Zone polygons compiled once into padded edge arrays for vectorised membership tests.
+
+  ``contains`` tests every point against every zone in one call using the
+  crossing-number rule, and counts points on an edge or vertex as inside (as
+  shapely's ``contains`` or ``touches`` would).
+  """
+
+  def __init__(self, polygons: Sequence[Sequence[NormalizedPoint]], tolerance: float = 1e-9) -> None:
+    self.count = len(polygons)
+    self.tolerance = tolerance
+    max_vertices = max((len(polygon) for polygon in polygons), default=0)
+    # Shorter polygons repeat their last vertex, which adds zero-length edges only
+    vertices = np.zeros((self.count, max_vertices, 2), dtype=np.float64)
+    for index, polygon in enumerate(polygons):
+      points = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+      vertices[index, : len(points)] = points
+      vertices[index, len(points):] = points[-1]
+    self.start = vertices
+    self.end = np.roll(vertices, -1, axis=1)
+    for index, polygon in enumerate(polygons):
+      # Close each polygon from its last real vertex back to the first; padding stays degenerate
+      self.end[index, len(polygon) - 1] = vertices[index, 0]
+      self.end[index, len(polygon):] = vertices[index, -1]
+    self.delta = self.end - self.start
+    self.length_sq = (self.delta ** 2).sum(axis=2)
+    safe_dy = np.where(self.delta[..., 1] == 0.0, 1.0, self.delta[..., 1])
+    self.inv_slope = self.delta[..., 0] / safe_dy
+
+  def contains(self, points: np.ndarray) -> np.ndarray:
+    """(N, 2) normalised points -> (N, zones) boolean membership matrix."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if self.count == 0 or len(points) == 0:
+      return np.zeros((len(points), self.count), dtype=bool)
+    px = points[:, 0, None, None]
+    py = points[:, 1, None, None]
+    x0, y0 = self.start[None, ..., 0], self.start[None, ..., 1]
+
+    # Crossing number: edges straddling the point's y, crossed to the right of it
+    straddles = (y0 > py) != (self.end[None, ..., 1] > py)
+    crossing_x = x0 + (py - y0) * self.inv_slope[None]
+    inside = (straddles & (px < crossing_x)).sum(axis=2) % 2 == 1
+
+    # Boundary: distance from the point to the nearest edge
+    t = ((px - x0) * self.delta[None, ..., 0] + (py - y0) * self.delta[None, ..., 1]) / np.where(
+      self.length_sq == 0.0, 1.0, self.length_sq
+    )[None]
+    t = np.clip(t, 0.0, 1.0)
+    dx = x0 + t * self.delta[None, ..., 0] - px
+    dy = y0 + t * self.delta[None, ..., 1] - py
+    on_edge = ((dx * dx + dy * dy) <= self.tolerance ** 2).any(axis=2)
+    return inside | on_edge
+
+  def select(self, zones: slice) -> "CompiledZones":
+    """View of a slice of the zones that shares these edge arrays."""
+    subset = object.__new__(CompiledZones)
+    subset.tolerance = self.tolerance
+    for name in ("start", "end", "delta", "length_sq", "inv_slope"):
+      setattr(subset, name, getattr(self, name)[zones])
+    subset.count = len(subset.start)
+    return subset
+
+
+class ZoneRaster:
+  """
+  Zone membership precomputed on a ``width`` x ``height`` grid over the frame.
+
+  Each cell stores one bit per zone (in 64-bit words, so zones may overlap and
+  there may be more than 64 of them), taken from the polygon test at the cell
+  centre. A lookup is then an array index; only points within about half a
+  cell of a zone edge can disagree with ``CompiledZones``.
+  """
+
+  def __init__(self, zones: CompiledZones, width: int, height: int) -> None:
+    if width < 1 or height < 1:
+      raise ValueError(f"Zone raster needs a positive size, got {width}x{height}")
+    self.zones = zones
+    self.count = zones.count
+    self.width = width
+    self.height = height
+    self.words = max(1, -(-zones.count // 64))
+    self.bits = np.zeros((height, width, self.words), dtype=np.uint64)
+    for index in range(self.count):
+      self._rasterise(index)
+
+  def _rasterise(self, index: int) -> None:
+    # Only cells whose centre lies within the zone's bounding box can be inside it
+    corners = self.zones.start[index]
+    col0, row0 = np.floor(corners.min(axis=0) * (self.width, self.height) - 0.5).astype(int)
+    col1, row1 = np.ceil(corners.max(axis=0) * (self.width, self.height) - 0.5).astype(int)
+    col0, col1 = max(col0, 0), min(col1 + 1, self.width)
+    row0, row1 = max(row0, 0), min(row1 + 1, self.height)
+    if col0 >= col1 or row0 >= row1:
+      return
+    grid_x, grid_y = np.meshgrid(
+      (np.arange(col0, col1) + 0.5) / self.width,
+      (np.arange(row0, row1) + 0.5) / self.height,
+    )
+    centers = np.stack([grid_x.ravel(), grid_y.ravel()], axis=1)
+    inside = self.zones.select(slice(index, index + 1)).contains(centers)[:, 0].reshape(grid_x.shape)
+    word, bit = divmod(index, 64)
+    self.bits[row0:row1, col0:col1, word] |= inside.astype(np.uint64) << np.uint64(bit)
+
+  def contains(self, points: np.ndarray) -> np.ndarray:
+    """(N, 2) normalised points -> (N, zones) boolean membership matrix."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if self.count == 0 or len(points) == 0:
+      return np.zeros((len(points), self.count), dtype=bool)
+    cols = np.clip((points[:, 0] * self.width).astype(np.intp), 0, self.width - 1)
+    rows = np.clip((points[:, 1] * self.height).astype(np.intp), 0, self.height - 1)
+    words = np.ascontiguousarray(self.bits[rows, cols]).astype("<u8", copy=False)
+    unpacked = np.unpackbits(words.view(np.uint8), axis=1, bitorder="little")
+    return unpacked[:, : self.count].astype(bool)
+
+  def agreement(self, samples: int = 20000, seed: int = 0) -> float:
+    """Fraction of random point/zone tests where the raster matches the polygons."""
+    if self.count == 0:
+      return 1.0
+    points = np.random.default_rng(seed).uniform(0.0, 1.0, size=(samples, 2))
+    return float((self.contains(points) == self.zones.contains(points)).mean())
+
+
+def inside_sign(inside_on: str) -> float:
+  """Sign of the start-to-end cross product on the inside of an entrance, given its ``inside_on`` setting."""
+  return 1.0 if inside_on in {"bottom", "below", "left"} else -1.0
+
+
+class EntranceSegments:
+  """
+  Entrance doors as finite segments, each with its own inside direction.
+
+  ``crossings`` intersects every track's last step (previous centre to current
+  centre) with every door in one call. A step crosses a door when it changes
+  side of the door's line and the door's ends lie on either side of the step,
+  so walking past the end of a door is not a crossing.
+  """
+
+  def __init__(self, entrances: Sequence[EntranceLine]) -> None:
+    self.count = len(entrances)
+    self.start = np.array([entrance.start for entrance in entrances], dtype=np.float64).reshape(-1, 2)
+    self.end = np.array([entrance.end for entrance in entrances], dtype=np.float64).reshape(-1, 2)
+    self.delta = self.end - self.start
+    self.length_sq = np.maximum((self.delta ** 2).sum(axis=1), 1e-12)
+    sign = np.array([inside_sign(entrance.inside_on) for entrance in entrances], dtype=np.float64)
+    # The signed cross product (end - start) x (p - start) is p . normal - offset, so the side test is one matrix product
+    self.normal = sign[:, None] * np.stack([-self.delta[:, 1], self.delta[:, 0]], axis=1)
+    self.offset = (self.normal * self.start).sum(axis=1)
+
+  def inside(self, points: np.ndarray) -> np.ndarray:
+    """(N, 2) points -> (N, doors) whether each point is on the inside of each door's line."""
+    return np.asarray(points, dtype=np.float64).reshape(-1, 2) @ self.normal.T > self.offset
+
+  def crossings(self, previous: np.ndarray, current: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return (door, inside) per step: the index of the first door crossed (-1 for
+    none) and the side of it the step ended on. Steps without a previous point
+    (NaN) cross nothing, and ``inside`` is their side of the nearest door.
+    """
+    previous = np.asarray(previous, dtype=np.float64).reshape(-1, 2)
+    current = np.asarray(current, dtype=np.float64).reshape(-1, 2)
+    door = np.full(len(current), -1, dtype=np.intp)
+    inside = np.zeros(len(current), dtype=bool)
+    first_seen = np.isnan(previous[:, 0])
+    if first_seen.any():
+      inside[first_seen] = self.nearest_inside(current[first_seen])
+
+    sides = self.inside(np.concatenate([previous, current]))
+    now_inside = sides[len(current):]
+    changed = (sides[: len(current)] != now_inside) & ~first_seen[:, None]
+    rows = np.flatnonzero(changed.any(axis=1))
+    if len(rows) == 0:
+      return door, inside
+
+    # Of the steps that changed side of a door's line, keep those that pass between its ends
+    step = (current[rows] - previous[rows])[:, None, :]
+    rel_start = self.start[None] - previous[rows, None, :]
+    rel_end = self.end[None] - previous[rows, None, :]
+    side_start = step[..., 0] * rel_start[..., 1] - step[..., 1] * rel_start[..., 0]
+    side_end = step[..., 0] * rel_end[..., 1] - step[..., 1] * rel_end[..., 0]
+    crossed = changed[rows] & (side_start * side_end <= 0)
+    hit = crossed.any(axis=1)
+    first = crossed.argmax(axis=1)[hit]
+    door[rows[hit]] = first
+    inside[rows[hit]] = now_inside[rows[hit], first]
+    return door, inside
+
+  def nearest_inside(self, points: np.ndarray) -> np.ndarray:
+    """(N, 2) points -> (N,) whether each point is on the inside of its nearest door."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    rel = points[:, None, :] - self.start[None]
+    t = np.clip((rel * self.delta[None]).sum(axis=2) / self.length_sq[None], 0.0, 1.0)
+    offset = rel - t[..., None] * self.delta[None]
+    nearest = (offset ** 2).sum(axis=2).argmin(axis=1)
+    return self.inside(points)[np.arange(len(points)), nearest]
+
+
+def heatmap_bins(centers: np.ndarray, grid_w: int, grid_h: int) -> Tuple[np.ndarray, np.ndarray]:
+  """(N, 2) normalised centres -> (rows, cols) heatmap cell index arrays."""
+  centers = np.clip(np.asarray(centers, dtype=np.float64).reshape(-1, 2), 0.0, 1.0 - 1e-9)
+  return (centers[:, 1] * grid_h).astype(np.intp), (centers[:, 0] * grid_w).astype(np.intp)
+
+
+def foot_points(boxes: np.ndarray) -> np.ndarray:
+  """(N, 4) x1, y1, x2, y2 boxes -> (N, 2) bottom-centre points, where people stand."""
+  boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+  return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2.0, boxes[:, 3]], axis=1)
 
 
-def line_side(point: Tuple[float, float], start: Tuple[float, float], end: Tuple[float, float]) -> float:
-  x0, y0 = start
-  x1, y1 = end
-  x, y = point
-  return (x1 - x0) * (y - y0) - (y1 - y0) * (x - x0)
+def zones_bounding_box(config: AnalyticsConfig, margin: float = 0.0) -> Optional[NormalizedBox]:
+  """Normalised (x1, y1, x2, y2) box around the entrances and every zone, padded by margin."""
+  points = []
+  for entrance in config.all_entrances():
+    points.extend([entrance.start, entrance.end])
+  if config.queue_zone:
+    points.extend(config.queue_zone.polygon)
+  for table in config.tables:
+    points.extend(table.polygon)
+  if not points:
+    return None
+  xs = [p[0] for p in points]
+  ys = [p[1] for p in points]
+  return (
+    max(0.0, min(xs) - margin),
+    max(0.0, min(ys) - margin),
+    min(1.0, max(xs) + margin),
+    min(1.0, max(ys) + margin),
+  )
 
 
-def heatmap_bin(center: Tuple[float, float], grid_w: int, grid_h: int) -> Tuple[int, int]:
-  x = np.clip(center[0], 0.0, 1.0 - 1e-9)
-  y = np.clip(center[1], 0.0, 1.0 - 1e-9)
-  col = int(x * grid_w)
-  row = int(y * grid_h)
-  return row, col
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+  """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes, as an (N, M) matrix."""
+  boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+  boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+  x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+  y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+  x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+  y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+  inter = np.clip(x2 - x1, 0.0, None) * np.clip(y2 - y1, 0.0, None)
+  area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+  area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+  union = area_a[:, None] + area_b[None, :] - inter
+  return np.where(union > 0, inter / np.maximum(union, 1e-12), 0.0)
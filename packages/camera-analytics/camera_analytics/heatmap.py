@@ -0,0 +1,111 @@
+"""Time-decayed occupancy heatmap with Gaussian splatting and a sparse, quantised payload."""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from .geometry import heatmap_bins
+
+# Quantised payload levels run 1..LEVELS; cells that round to 0 are left out
+LEVELS = 255
+# Rebase the lazily scaled grid once hits are stored this many half-lives ahead
+_MAX_EXPONENT = 40.0
+
+
+class HeatmapAccumulator:
+  """
+  Occupancy heatmap whose values halve every ``half_life`` seconds of elapsed time.
+
+  Decay is applied lazily. A hit at time t is stored multiplied by
+  2 ** ((t - origin) / half_life), and values are scaled back only when the
+  grid is read, so the decay rate does not depend on how often that happens.
+  A ``half_life`` of 0 disables decay. Each point adds a total weight of 1,
+  spread as a Gaussian of ``sigma`` cells (cut off at 3 sigma) or, for
+  ``sigma`` 0, added to the single cell under the point.
+  """
+
+  def __init__(self, grid_w: int, grid_h: int, half_life: float = 0.0, sigma: float = 0.0) -> None:
+    self.grid_w = grid_w
+    self.grid_h = grid_h
+    self.half_life = half_life
+    self.sigma = sigma
+    self.values = np.zeros(grid_w * grid_h, dtype=np.float64)
+    self.origin: Optional[float] = None
+    if sigma > 0:
+      self.offsets = np.arange(-math.ceil(3 * sigma), math.ceil(3 * sigma) + 1)
+
+  def _exponent(self, now: float) -> float:
+    if self.half_life <= 0:
+      return 0.0
+    if self.origin is None:
+      self.origin = now
+    return (now - self.origin) / self.half_life
+
+  def _gain(self, now: float) -> float:
+    exponent = self._exponent(now)
+    if exponent > _MAX_EXPONENT:
+      self.values *= 2.0 ** -exponent
+      self.origin = now
+      return 1.0
+    return 2.0 ** exponent
+
+  def add(self, points: np.ndarray, now: float) -> None:
+    """Add one frame's normalised (N, 2) points."""
+    if not len(points):
+      return
+    gain = self._gain(now)
+    if self.sigma <= 0:
+      rows, cols = heatmap_bins(points, self.grid_w, self.grid_h)
+      self.values += np.bincount(rows * self.grid_w + cols, minlength=self.values.size) * gain
+      return
+
+    points = np.clip(np.asarray(points, dtype=np.float64).reshape(-1, 2), 0.0, 1.0 - 1e-9)
+    # Separable kernel: per point, K weights along each axis around the nearest cell centre
+    u = points[:, 0] * self.grid_w - 0.5
+    v = points[:, 1] * self.grid_h - 0.5
+    cols = np.rint(u).astype(np.intp)[:, None] + self.offsets
+    rows = np.rint(v).astype(np.intp)[:, None] + self.offsets
+    gx = np.exp(-0.5 * ((cols - u[:, None]) / self.sigma) ** 2)
+    gy = np.exp(-0.5 * ((rows - v[:, None]) / self.sigma) ** 2)
+    # Normalise over the whole kernel so mass falling outside the frame is lost, not piled on the edge
+    scale = gain / (gx.sum(axis=1) * gy.sum(axis=1))
+    gx[(cols < 0) | (cols >= self.grid_w)] = 0.0
+    gy[(rows < 0) | (rows >= self.grid_h)] = 0.0
+    weights = gy[:, :, None] * gx[:, None, :] * scale[:, None, None]
+    cells = np.clip(rows, 0, self.grid_h - 1)[:, :, None] * self.grid_w + np.clip(cols, 0, self.grid_w - 1)[:, None, :]
+    self.values += np.bincount(cells.ravel(), weights.ravel(), minlength=self.values.size)
+
+  def grid(self, now: float) -> np.ndarray:
+    """Decayed values at ``now`` as a (grid_h, grid_w) array."""
+    return (self.values * 2.0 ** -self._exponent(now)).reshape(self.grid_h, self.grid_w)
+
+  def payload(self, now: float) -> Dict[str, object]:
+    """
+    Sparse, quantised snapshot: row-major ``cells`` indices and their ``levels``.
+
+    A level is value / ``max`` scaled to 1..255, so a 160x90 grid costs
+    only the cells that are actually warm.
+    """
+    values = self.grid(now).ravel()
+    peak = float(values.max())
+    payload: Dict[str, object] = {"gridWidth": self.grid_w, "gridHeight": self.grid_h, "max": round(peak, 3)}
+    if peak <= 0:
+      payload.update(cells=[], levels=[])
+      return payload
+    # Divide first: a long-idle grid decays into denormals, where LEVELS / peak overflows
+    levels = np.rint(values / peak * LEVELS).astype(np.int64)
+    cells = np.flatnonzero(levels)
+    payload.update(cells=cells.tolist(), levels=levels[cells].tolist())
+    return payload
+
+
+def dense_heatmap(payload: Union[Dict[str, object], List[List[int]]]) -> List[List[int]]:
+  """Expand a ``payload`` back into rows of levels (a dense grid passes through unchanged)."""
+  if not isinstance(payload, dict):
+    return payload
+  grid = np.zeros(int(payload.get("gridWidth", 0)) * int(payload.get("gridHeight", 0)), dtype=np.int64)
+  grid[np.asarray(payload.get("cells", []), dtype=np.intp)] = payload.get("levels", [])
+  return grid.reshape(int(payload.get("gridHeight", 0)), -1).tolist() if grid.size else []
@@ -0,0 +1,305 @@
+"""Embedded metrics history: raw samples plus minute/hour/day rollups in a SQLite (WAL) file."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from .config import HistoryConfig
+from .metrics import CameraMetrics
+
+# Rollup resolutions in seconds; buckets start at multiples of these (UTC)
+RESOLUTIONS: Dict[str, int] = {"minute": 60, "hour": 3600, "day": 86400}
+# Retention deletes run at most this often
+COMPACT_EVERY = 3600.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+  id INTEGER PRIMARY KEY,
+  camera TEXT NOT NULL,
+  name TEXT NOT NULL,
+  UNIQUE (camera, name)
+);
+CREATE TABLE IF NOT EXISTS samples (
+  ts REAL NOT NULL,
+  series INTEGER NOT NULL,
+  value REAL NOT NULL,
+  PRIMARY KEY (ts, series)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+  resolution INTEGER NOT NULL,
+  bucket REAL NOT NULL,
+  series INTEGER NOT NULL,
+  count INTEGER NOT NULL,
+  total REAL NOT NULL,
+  min REAL NOT NULL,
+  max REAL NOT NULL,
+  last REAL NOT NULL,
+  PRIMARY KEY (resolution, bucket, series)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_ROLLUP = """
+INSERT INTO rollups (resolution, bucket, series, count, total, min, max, last)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (resolution, bucket, series) DO UPDATE SET
+  count = count + excluded.count,
+  total = total + excluded.total,
+  min = MIN(min, excluded.min),
+  max = MAX(max, excluded.max),
+  last = excluded.last
+"""
+
+_CAMERA_SERIES = "SELECT id FROM series WHERE camera = ?"
+
+
+def metrics_series(metrics: CameraMetrics) -> Dict[str, float]:
+  """Flatten the numeric parts of a snapshot into ``series name -> value`` (names follow ``to_dict``)."""
+  series: Dict[str, float] = {
+    "peopleIn": metrics.people_in,
+    "peopleOut": metrics.people_out,
+    "current": metrics.current,
+    "avgDwellTime": metrics.avg_dwell_time,
+    "fps": metrics.fps,
+    "queue.current": metrics.queue.current,
+    "queue.averageWaitSeconds": metrics.queue.average_wait_seconds,
+    "queue.p90WaitSeconds": metrics.queue.p90_wait_seconds,
+  }
+  for name, count in metrics.gender.items():
+    series[f"gender.{name}"] = count
+  for name, count in metrics.age_buckets.items():
+    series[f"ageBuckets.{name}"] = count
+  for entrance in metrics.entrances:
+    series[f"entrances.{entrance.id}.peopleIn"] = entrance.people_in
+    series[f"entrances.{entrance.id}.peopleOut"] = entrance.people_out
+  for table in metrics.tables:
+    series[f"tables.{table.id}.currentOccupants"] = table.current_occupants
+    series[f"tables.{table.id}.avgStaySeconds"] = table.avg_stay_seconds
+    series[f"tables.{table.id}.p90StaySeconds"] = table.p90_stay_seconds
+  return series
+
+
+class MetricsHistory:
+  """
+  Append-only time series of one camera's metrics snapshots.
+
+  Raw samples are stored only when a series changes value, so a series reads
+  back as a step function and steady counters cost almost nothing. The
+  minute, hour and day rollups (count, sum, min, max, last) are accumulated
+  in memory for the current minute and merged into the file when the minute
+  ends, or on ``flush``. Rows past their resolution's retention are deleted
+  at most once per ``COMPACT_EVERY`` seconds and the freed pages returned to
+  the filesystem, which bounds the file size.
+
+  Both tables are keyed time first, so a commit touches a few trailing pages
+  rather than one page per series. Several cameras may share one file, and
+  WAL mode lets readers query while engines write. With ``read_only`` the
+  file is opened for queries only: no schema changes, pragmas or writes.
+  """
+
+  def __init__(
+    self,
+    path: Path,
+    camera: str,
+    config: Optional[HistoryConfig] = None,
+    read_only: bool = False,
+  ) -> None:
+    self.path = path
+    self.camera = camera
+    config = config or HistoryConfig()
+    self.raw_retention = config.raw_days * 86400.0
+    self.retention: Dict[int, float] = {
+      RESOLUTIONS["minute"]: config.minute_days * 86400.0,
+      RESOLUTIONS["hour"]: config.hour_days * 86400.0,
+      RESOLUTIONS["day"]: config.day_days * 86400.0,
+    }
+    self.records = 0
+    self.samples_written = 0
+    self.last_compaction: Optional[float] = None
+    self.series_ids: Dict[str, int] = {}
+    # Last stored value per series id, for change-only raw samples
+    self.previous: Dict[int, float] = {}
+    # Current minute's rollup per series id: [count, total, min, max, last]
+    self.minute: Optional[float] = None
+    self.pending: Dict[int, List[float]] = {}
+
+    if read_only:
+      self.connection = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True, timeout=10.0)
+      return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # The engine may be built on one thread and run on another; it is only ever used by one at a time
+    self.connection = sqlite3.connect(str(path), timeout=10.0, check_same_thread=False)
+    # auto_vacuum only takes effect before the first table is created
+    self.connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    self.connection.execute("PRAGMA journal_mode = WAL")
+    # In WAL mode NORMAL cannot corrupt the file; a power cut loses at most the last commits
+    self.connection.execute("PRAGMA synchronous = NORMAL")
+    self.connection.executescript(_SCHEMA)
+
+  def _series_id(self, name: str) -> int:
+    series_id = self.series_ids.get(name)
+    if series_id is None:
+      with self.connection:
+        self.connection.execute("INSERT OR IGNORE INTO series (camera, name) VALUES (?, ?)", (self.camera, name))
+      row = self.connection.execute("SELECT id FROM series WHERE camera = ? AND name = ?", (self.camera, name)).fetchone()
+      series_id = self.series_ids[name] = int(row[0])
+    return series_id
+
+  def record(self, metrics: CameraMetrics, ts: float) -> None:
+    values = [(self._series_id(name), value) for name, value in metrics_series(metrics).items()]
+    minute = ts - ts % RESOLUTIONS["minute"]
+    if minute != self.minute:
+      self.flush()
+      self.minute = minute
+
+    changed = [(ts, series_id, value) for series_id, value in values if self.previous.get(series_id) != value]
+    if changed:
+      with self.connection:
+        self.connection.executemany("INSERT OR REPLACE INTO samples (ts, series, value) VALUES (?, ?, ?)", changed)
+      self.samples_written += len(changed)
+    for series_id, value in values:
+      self.previous[series_id] = value
+      rollup = self.pending.get(series_id)
+      if rollup is None:
+        self.pending[series_id] = [1, value, value, value, value]
+      else:
+        rollup[0] += 1
+        rollup[1] += value
+        rollup[2] = min(rollup[2], value)
+        rollup[3] = max(rollup[3], value)
+        rollup[4] = value
+    self.records += 1
+
+    if self.last_compaction is None or ts - self.last_compaction >= COMPACT_EVERY:
+      self.compact(ts)
+
+  def flush(self) -> None:
+    """Merge the current minute's partial rollups into the file."""
+    if not self.pending:
+      return
+    rows = []
+    for seconds in RESOLUTIONS.values():
+      bucket = self.minute - self.minute % seconds
+      rows.extend((seconds, bucket, series_id, *rollup) for series_id, rollup in self.pending.items())
+    with self.connection:
+      self.connection.executemany(_UPSERT_ROLLUP, rows)
+    self.pending.clear()
+
+  def compact(self, now: float) -> None:
+    """Delete this camera's samples and rollups older than their retention."""
+    with self.connection:
+      self.connection.execute(
+        f"DELETE FROM samples WHERE ts < ? AND series IN ({_CAMERA_SERIES})", (now - self.raw_retention, self.camera)
+      )
+      for seconds, retention in self.retention.items():
+        self.connection.execute(
+          f"DELETE FROM rollups WHERE resolution = ? AND bucket < ? AND series IN ({_CAMERA_SERIES})",
+          (seconds, now - retention, self.camera),
+        )
+    # Each result row is one freed page, so the pragma only runs to completion when fetched
+    self.connection.execute("PRAGMA incremental_vacuum").fetchall()
+    self.last_compaction = now
+    # The deleted range may have held a steady series' only change point; re-store every value next time
+    self.previous.clear()
+
+  def query(
+    self,
+    series: str,
+    resolution: str = "minute",
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+  ) -> List[Dict[str, float]]:
+    """
+    One series between ``since`` and ``until`` (epoch seconds), oldest first.
+
+    ``resolution`` "raw" returns ``ts``/``value`` change points; "minute",
+    "hour" and "day" return buckets with ``count``, ``avg``, ``min``, ``max``
+    and ``last``.
+    """
+    if resolution != "raw" and resolution not in RESOLUTIONS:
+      raise ValueError(f"resolution must be 'raw' or one of {sorted(RESOLUTIONS)}, got {resolution!r}")
+    self.flush()
+    row = self.connection.execute("SELECT id FROM series WHERE camera = ? AND name = ?", (self.camera, series)).fetchone()
+    if row is None:
+      return []
+    since = float("-inf") if since is None else since
+    until = float("inf") if until is None else until
+    if resolution == "raw":
+      rows = self.connection.execute(
+        "SELECT ts, value FROM samples WHERE ts >= ? AND ts < ? AND series = ? ORDER BY ts", (since, until, row[0])
+      )
+      return [{"ts": ts, "value": value} for ts, value in rows]
+    rows = self.connection.execute(
+      "SELECT bucket, count, total, min, max, last FROM rollups "
+      "WHERE resolution = ? AND bucket >= ? AND bucket < ? AND series = ? ORDER BY bucket",
+      (RESOLUTIONS[resolution], since, until, row[0]),
+    )
+    return [
+      {"ts": bucket, "count": count, "avg": total / count, "min": low, "max": high, "last": last}
+      for bucket, count, total, low, high, last in rows
+    ]
+
+  def close(self) -> None:
+    self.flush()
+    self.connection.close()
+
+
+def source_camera_key(source: "str | int") -> str:
+  """Default camera key for a source: ``camera-<index>``, a stream's host and path, or a file's stem."""
+  source = str(source)
+  if source.isdigit():
+    return f"camera-{source}"
+  parsed = urlparse(source)
+  # Credentials, ports and query strings are left out of stream keys
+  name = f"{parsed.hostname}{parsed.path}" if parsed.scheme and parsed.hostname else Path(source).stem
+  return re.sub(r"[^A-Za-z0-9._-]+", "-", name).strip("-") or "camera"
+
+
+def open_history(config: HistoryConfig, output_path: Path, camera: str) -> MetricsHistory:
+  """
+  The store ``config`` describes for an engine writing metrics to ``output_path``.
+
+  ``config.camera`` overrides the ``camera`` key the engine suggests.
+  """
+  path = Path(config.path) if config.path else output_path.parent / "metrics_history.db"
+  return MetricsHistory(path, config.camera or camera, config)
+
+
+def parse_args() -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description="Print one series from a metrics history file as JSON")
+  parser.add_argument("--db", type=Path, required=True, help="History file (see the history section of the config)")
+  parser.add_argument(
+    "--camera",
+    type=str,
+    required=True,
+    help="Camera key: history.camera, the multi.py camera id, or the source (e.g. camera-0, video stem)",
+  )
+  parser.add_argument("--series", type=str, default="current", help="Series name, e.g. peopleIn or tables.t1.avgStaySeconds")
+  parser.add_argument(
+    "--resolution",
+    choices=["raw", *RESOLUTIONS],
+    default="hour",
+    help="Raw samples or a rollup resolution (default: hour)",
+  )
+  parser.add_argument("--hours", type=float, default=24.0, help="How far back to read (default: 24)")
+  return parser.parse_args()
+
+
+def main() -> None:
+  args = parse_args()
+  history = MetricsHistory(args.db, args.camera, read_only=True)
+  try:
+    rows = history.query(args.series, args.resolution, since=time.time() - args.hours * 3600.0)
+  finally:
+    history.close()
+  print(json.dumps(rows))
+
+
+if __name__ == "__main__":
+  main()
@@ -4,9 +4,24 @@ from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Dict, List, Optional
 
+import numpy as np
+
+from .aggregates import DurationSummary
+
+
+AGE_BUCKETS = ("child", "young", "adult", "mature", "senior")
+# Lower bounds of every bucket after the first
+AGE_BUCKET_EDGES = np.array([18.0, 36.0, 51.0, 71.0])
+
 
 def default_age_buckets() -> Dict[str, int]:
-  return {"child": 0, "young": 0, "adult": 0, "mature": 0, "senior": 0}
+  return {bucket: 0 for bucket in AGE_BUCKETS}
+
+
+def age_bucket_codes(ages: np.ndarray) -> np.ndarray:
+  """Vectorised ``bucket_for_age``: index into ``AGE_BUCKETS``, or -1 for a NaN (unknown) age."""
+  ages = np.asarray(ages, dtype=np.float64)
+  return np.where(np.isnan(ages), -1, np.searchsorted(AGE_BUCKET_EDGES, ages, side="right"))
 
 
 def bucket_for_age(age: Optional[float]) -> str:
@@ -39,6 +54,10 @@ class TableSnapshot:
   current_occupants: int
   avg_stay_seconds: float
   longest_stay_seconds: float
+  p50_stay_seconds: float = 0.0
+  p90_stay_seconds: float = 0.0
+  # Completed stays over the last 5/15/60 minutes, keyed by window label
+  windows: Dict[str, DurationSummary] = field(default_factory=dict)
 
 
 @dataclass
@@ -46,6 +65,18 @@ class QueueSnapshot:
   current: int
   average_wait_seconds: float
   longest_wait_seconds: float
+  p50_wait_seconds: float = 0.0
+  p90_wait_seconds: float = 0.0
+  # Completed waits over the last 5/15/60 minutes, keyed by window label
+  windows: Dict[str, DurationSummary] = field(default_factory=dict)
+
+
+@dataclass
+class EntranceSnapshot:
+  id: str
+  name: Optional[str]
+  people_in: int
+  people_out: int
 
 
 @dataclass
@@ -61,22 +92,36 @@ class ActivePersonSnapshot:
 class CameraMetrics:
   people_in: int = 0
   people_out: int = 0
+  # Crossings per door; exits counted because a track timed out belong to no door
+  entrances: List[EntranceSnapshot] = field(default_factory=list)
   current: int = 0
   age_buckets: Dict[str, int] = field(default_factory=default_age_buckets)
   gender: Dict[str, int] = field(default_factory=lambda: {"male": 0, "female": 0, "unknown": 0})
   queue: QueueSnapshot = field(default_factory=lambda: QueueSnapshot(0, 0.0, 0.0))
   tables: List[TableSnapshot] = field(default_factory=list)
-  heatmap: List[List[int]] = field(default_factory=list)
+  # Sparse quantised heatmap, see ``HeatmapAccumulator.payload``
+  heatmap: Dict[str, object] = field(default_factory=dict)
   active_people: List[ActivePersonSnapshot] = field(default_factory=list)
   ts: str = field(default_factory=lambda: datetime.utcnow().isoformat())
   fps: float = 0.0
   avg_dwell_time: float = 0.0
+  # Pipeline health counters (capture drops, controller state, ...) keyed by stage
+  pipeline: Dict[str, Dict[str, object]] = field(default_factory=dict)
 
   def to_dict(self) -> Dict[str, object]:
     return {
       "ts": self.ts,
       "peopleIn": self.people_in,
       "peopleOut": self.people_out,
+      "entrances": [
+        {
+          "id": entrance.id,
+          "name": entrance.name,
+          "peopleIn": entrance.people_in,
+          "peopleOut": entrance.people_out,
+        }
+        for entrance in self.entrances
+      ],
       "current": self.current,
       "ageBuckets": self.age_buckets,
       "gender": self.gender,
@@ -84,6 +129,9 @@ class CameraMetrics:
         "current": self.queue.current,
         "averageWaitSeconds": round(self.queue.average_wait_seconds, 1),
         "longestWaitSeconds": round(self.queue.longest_wait_seconds, 1),
+        "p50WaitSeconds": round(self.queue.p50_wait_seconds, 1),
+        "p90WaitSeconds": round(self.queue.p90_wait_seconds, 1),
+        "windows": {label: window.to_dict() for label, window in self.queue.windows.items()},
       },
       "tables": [
         {
@@ -92,6 +140,9 @@ class CameraMetrics:
           "currentOccupants": table.current_occupants,
           "avgStaySeconds": round(table.avg_stay_seconds, 1),
           "longestStaySeconds": round(table.longest_stay_seconds, 1),
+          "p50StaySeconds": round(table.p50_stay_seconds, 1),
+          "p90StaySeconds": round(table.p90_stay_seconds, 1),
+          "windows": {label: window.to_dict() for label, window in table.windows.items()},
         }
         for table in self.tables
       ],
@@ -108,4 +159,5 @@ class CameraMetrics:
       ],
       "fps": round(self.fps, 1),
       "avgDwellTime": round(self.avg_dwell_time, 1),
+      "pipeline": self.pipeline,
     }
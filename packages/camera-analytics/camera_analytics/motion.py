@@ -0,0 +1,84 @@
+"""Cheap per-tile motion analysis used to skip detector runs on static scenes."""
+
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from .config import MotionConfig
+
+
+class MotionGate:
+  """
+  Decide per frame whether the detector needs to run.
+
+  Frames are shrunk to ``config.width`` pixels wide, converted to grayscale and
+  compared against the reference frame taken at the last detector run. The
+  difference is split into a ``grid_width`` x ``grid_height`` grid. If no tile has
+  more than ``tile_threshold`` of its pixels changed by ``pixel_threshold`` or
+  more, the frame is skipped. Comparing against the last detection rather than
+  the previous frame means slow drift still adds up and eventually triggers.
+  A full detection is forced every ``refresh_seconds`` regardless.
+  """
+
+  def __init__(self, config: MotionConfig) -> None:
+    self.config = config
+    self.frames = 0
+    self.skipped = 0
+    self.forced_refreshes = 0
+    self.active_tiles = 0
+    self._reference: Optional[np.ndarray] = None
+    self._last_detection = float("-inf")
+
+  def should_detect(self, frame: np.ndarray, now: float) -> bool:
+    self.frames += 1
+    small = self._prepare(frame)
+
+    if self._reference is None or self._reference.shape != small.shape:
+      return self._detect(small, now)
+
+    self.active_tiles = self._count_active_tiles(small)
+    if self.active_tiles > 0:
+      return self._detect(small, now)
+    if now - self._last_detection >= self.config.refresh_seconds:
+      self.forced_refreshes += 1
+      return self._detect(small, now)
+
+    self.skipped += 1
+    return False
+
+  def _detect(self, small: np.ndarray, now: float) -> bool:
+    self._reference = small
+    self._last_detection = now
+    return True
+
+  def _prepare(self, frame: np.ndarray) -> np.ndarray:
+    height, width = frame.shape[:2]
+    target_w = min(self.config.width, width)
+    target_h = max(1, int(round(height * target_w / width)))
+    # Round down to a multiple of the grid so tiles reshape cleanly
+    target_w -= target_w % self.config.grid_width
+    target_h -= target_h % self.config.grid_height
+    small = cv2.resize(frame, (target_w, target_h), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+      small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return cv2.GaussianBlur(small, (3, 3), 0)
+
+  def _count_active_tiles(self, small: np.ndarray) -> int:
+    changed = cv2.absdiff(small, self._reference) >= self.config.pixel_threshold
+    rows, cols = self.config.grid_height, self.config.grid_width
+    height, width = changed.shape
+    tiles = changed.reshape(rows, height // rows, cols, width // cols)
+    fractions = tiles.mean(axis=(1, 3))
+    return int(np.count_nonzero(fractions > self.config.tile_threshold))
+
+  def to_dict(self) -> Dict[str, object]:
+    return {
+      "frames": self.frames,
+      "skipped": self.skipped,
+      "skipRatio": round(self.skipped / self.frames, 3) if self.frames else 0.0,
+      "forcedRefreshes": self.forced_refreshes,
+      "activeTiles": self.active_tiles,
+    }
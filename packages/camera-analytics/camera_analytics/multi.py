@@ -0,0 +1,269 @@
+"""Run several cameras against one shared detector with batched inference."""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace, yaml_load
+from ultralytics.utils.checks import check_yaml
+
+from .analytics import CameraAnalyticsEngine, offset_boxes
+from .capture import CapturedFrame
+from .config import AnalyticsConfig, load_config
+from .detectors import BACKENDS, PRECISIONS, DetectorSpec, load_detector
+
+
+@dataclass
+class CameraSpec:
+  id: str
+  source: str | int
+  config: AnalyticsConfig
+
+
+@dataclass
+class BatchStats:
+  batches: int = 0
+  frames: int = 0
+  last_batch_size: int = 0
+  inference_ms: float = 0.0
+
+  def record(self, size: int, elapsed: float) -> None:
+    self.batches += 1
+    self.frames += size
+    self.last_batch_size = size
+    # Exponential moving average keeps the number readable at high frame rates
+    elapsed_ms = elapsed * 1000.0
+    self.inference_ms = elapsed_ms if self.batches == 1 else 0.9 * self.inference_ms + 0.1 * elapsed_ms
+
+  def to_dict(self) -> Dict[str, object]:
+    return {
+      "batches": self.batches,
+      "avgBatchSize": round(self.frames / self.batches, 2) if self.batches else 0.0,
+      "lastBatchSize": self.last_batch_size,
+      "inferenceMs": round(self.inference_ms, 1),
+    }
+
+
+def make_tracker(tracker_cfg: str = "bytetrack.yaml", frame_rate: int = 30) -> BYTETracker:
+  """Build an isolated ByteTrack instance (ultralytics keeps one per predictor otherwise)."""
+  cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker_cfg)))
+  return BYTETracker(args=cfg, frame_rate=frame_rate)
+
+
+class MultiCameraRunner:
+  """
+  Drive several ``CameraAnalyticsEngine`` instances from a single YOLO model.
+
+  Each round collects the newest frame from every camera, runs one batched
+  forward pass, then feeds each camera's detections through its own ByteTrack
+  instance before handing them to that camera's engine. Tracker state, zones,
+  heatmaps and metrics stay per camera; only the detector is shared.
+  """
+
+  def __init__(
+    self,
+    cameras: Sequence[CameraSpec],
+    output_dir: Path,
+    model_path: str = "yolov8n.pt",
+    sample_interval: float = 1.0,
+    detector: Optional[DetectorSpec] = None,
+    collect_timeout: float = 0.05,
+    on_metrics: Optional[Callable[[str, Dict[str, object]], None]] = None,
+    on_tracks: Optional[Callable[[str, List[Dict[str, object]]], None]] = None,
+  ) -> None:
+    if not cameras:
+      raise ValueError("MultiCameraRunner needs at least one camera")
+    self.detector_spec = detector or DetectorSpec()
+    self.imgsz = self.detector_spec.imgsz
+    self.collect_timeout = collect_timeout
+    self.model = load_detector(model_path, self.detector_spec)
+    self.stats = BatchStats()
+
+    self.engines: Dict[str, CameraAnalyticsEngine] = {}
+    self.trackers: Dict[str, BYTETracker] = {}
+    for camera in cameras:
+      if camera.id in self.engines:
+        raise ValueError(f"Duplicate camera id {camera.id}")
+      engine = CameraAnalyticsEngine(
+        config=camera.config,
+        source=camera.source,
+        output_path=output_dir / f"{camera.id}.json",
+        sample_interval=sample_interval,
+        on_metrics=_bind(on_metrics, camera.id),
+        on_tracks=_bind(on_tracks, camera.id),
+        model=self.model,
+        detector=self.detector_spec,
+        camera_id=camera.id,
+      )
+      engine.extra_pipeline_stats["batch"] = self.stats
+      self.engines[camera.id] = engine
+      self.trackers[camera.id] = make_tracker()
+
+  def run(self) -> None:
+    for camera_id, engine in self.engines.items():
+      engine.open_capture().start()
+      print(f"[INFO] Camera {camera_id}: {engine.source}")
+    print(f"[INFO] Batched inference across {len(self.engines)} cameras (imgsz={self.imgsz}, one pass per camera imgsz)")
+
+    active = list(self.engines)
+    try:
+      while active:
+        batch = self._collect(active)
+        active = [camera_id for camera_id in active if not self.engines[camera_id].capture.finished]
+        if batch:
+          self._process_batch(batch)
+    finally:
+      for engine in self.engines.values():
+        if engine.capture is not None:
+          engine.capture.stop()
+        engine.close()
+
+  def _collect(self, camera_ids: Sequence[str]) -> List[Tuple[str, CapturedFrame]]:
+    batch: List[Tuple[str, CapturedFrame]] = []
+    for camera_id in camera_ids:
+      captured = self.engines[camera_id].capture.read(timeout=self.collect_timeout)
+      if captured is not None:
+        batch.append((camera_id, captured))
+    return batch
+
+  def _process_batch(self, batch: List[Tuple[str, CapturedFrame]]) -> None:
+    now = time.time()
+    pending: List[Tuple[str, CapturedFrame]] = []
+    for camera_id, captured in batch:
+      engine = self.engines[camera_id]
+      if engine.needs_detection(captured.frame, now):
+        pending.append((camera_id, captured))
+      else:
+        engine.process_frame(captured.frame, None, None, now)
+    if not pending:
+      return
+
+    # Each engine's imgsz follows its quality level and ROI crop, so run one forward pass per size
+    groups: Dict[int, List[Tuple[str, CapturedFrame]]] = {}
+    for camera_id, captured in pending:
+      groups.setdefault(self.engines[camera_id].roi_imgsz(), []).append((camera_id, captured))
+    for imgsz, group in groups.items():
+      self._detect_group(group, imgsz)
+
+  def _detect_group(self, group: List[Tuple[str, CapturedFrame]], imgsz: int) -> None:
+    # Crops in a group share a scaled imgsz but not a shape; predict() letterboxes each one
+    crops = [self.engines[camera_id].roi_crop(captured.frame) for camera_id, captured in group]
+    frames = [crop for crop, _ in crops]
+    started = time.perf_counter()
+    results = self.model.predict(
+      frames,
+      verbose=False,
+      classes=[0],
+      imgsz=imgsz,
+      device='cpu',
+    )
+    elapsed = time.perf_counter() - started
+    self.stats.record(len(frames), elapsed)
+    # Each camera's controller sees its share of the batch, plus its own tracking as in _detect
+    share_ms = elapsed * 1000.0 / len(frames)
+
+    now = time.time()
+    for (camera_id, captured), (crop, offset), result in zip(group, crops, results):
+      engine = self.engines[camera_id]
+      track_started = time.perf_counter()
+      track_ids, boxes = self._track(camera_id, result, crop)
+      boxes = offset_boxes(boxes, offset)
+      engine.record_stage_ms("detect", share_ms + (time.perf_counter() - track_started) * 1000.0)
+      engine.process_frame(captured.frame, track_ids, boxes, now)
+
+  def _track(
+    self, camera_id: str, result, frame: np.ndarray
+  ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    detections = result.boxes.cpu().numpy()
+    tracks = self.trackers[camera_id].update(detections, frame)
+    if len(tracks) == 0:
+      return None, None
+    # BYTETracker rows are [x1, y1, x2, y2, track_id, score, cls, idx]
+    return tracks[:, 4].astype(int), tracks[:, :4]
+
+
+def _bind(callback: Optional[Callable], camera_id: str) -> Optional[Callable]:
+  if callback is None:
+    return None
+  return lambda payload: callback(camera_id, payload)
+
+
+def parse_camera(spec: str) -> Tuple[str, str | int]:
+  """Parse ``id=source``; numeric sources are camera indices."""
+  if "=" not in spec:
+    raise argparse.ArgumentTypeError(f"Expected id=source, got {spec!r}")
+  camera_id, source = spec.split("=", 1)
+  try:
+    return camera_id, int(source)
+  except ValueError:
+    return camera_id, source
+
+
+def parse_args() -> argparse.Namespace:
+  default_config = Path(__file__).resolve().parents[1] / "config" / "default_zones.yaml"
+  default_output = Path(__file__).resolve().parents[2] / "data" / "camera"
+
+  parser = argparse.ArgumentParser(description="Run ObservAI analytics for several cameras with one shared model")
+  parser.add_argument(
+    "--camera",
+    type=parse_camera,
+    action="append",
+    required=True,
+    help="Camera as id=source (repeat for each camera, e.g. --camera door=0 --camera bar=rtsp://...)",
+  )
+  parser.add_argument(
+    "--config",
+    type=Path,
+    default=default_config,
+    help=f"Zones configuration shared by all cameras (default: {default_config})",
+  )
+  parser.add_argument(
+    "--camera-config",
+    action="append",
+    default=[],
+    help="Per-camera zones configuration as id=path, overrides --config for that camera",
+  )
+  parser.add_argument(
+    "--output-dir",
+    type=Path,
+    default=default_output,
+    help=f"Directory for per-camera metrics JSON files (default: {default_output})",
+  )
+  parser.add_argument("--model", type=str, default="yolov8n.pt", help="YOLO model checkpoint (default: yolov8n.pt)")
+  parser.add_argument("--imgsz", type=int, default=512, help="Inference image size (default: 512)")
+  parser.add_argument("--backend", choices=BACKENDS, default="pytorch", help="Detector runtime (default: pytorch)")
+  parser.add_argument("--precision", choices=PRECISIONS, default="fp32", help="Exported model precision (default: fp32)")
+  parser.add_argument(
+    "--interval",
+    type=float,
+    default=1.0,
+    help="Number of seconds between metrics dumps (default: 1.0)",
+  )
+  return parser.parse_args()
+
+
+def main() -> None:
+  args = parse_args()
+  overrides = dict(spec.split("=", 1) for spec in args.camera_config)
+  cameras = [
+    CameraSpec(id=camera_id, source=source, config=load_config(Path(overrides.get(camera_id, args.config))))
+    for camera_id, source in args.camera
+  ]
+  runner = MultiCameraRunner(
+    cameras=cameras,
+    output_dir=args.output_dir,
+    model_path=args.model,
+    sample_interval=args.interval,
+    detector=DetectorSpec(backend=args.backend, precision=args.precision, imgsz=args.imgsz),
+  )
+  runner.run()
+
+
+if __name__ == "__main__":
+  main()
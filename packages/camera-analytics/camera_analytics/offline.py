@@ -0,0 +1,362 @@
+"""Faster-than-realtime analytics over recorded video, split into parallel chunks."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Set, Tuple
+
+import cv2
+import numpy as np
+
+from .capture import SequentialCapture
+from .config import load_config
+from .geometry import box_iou
+from .runtime import configure_process
+
+# Chunk workers import this module to unpickle their tasks, so anything that
+# pulls in ultralytics/torch is imported inside functions, after the thread
+# limits are in place (see _process_chunk).
+if TYPE_CHECKING:
+  from .detectors import DetectorSpec
+
+# Minimum IoU for a track at the end of one chunk to be the same person at the start of the next
+BOUNDARY_IOU = 0.3
+
+
+@dataclass
+class BoundaryTrack:
+  track_id: int
+  bbox_norm: Tuple[float, float, float, float]
+  counted_in: bool
+  counted_out: bool
+  active_zones: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class ChunkTask:
+  index: int
+  source: str
+  config_path: str
+  start: float
+  end: float
+  overlap: float
+  model_path: str
+  # DetectorSpec fields; a plain dict so unpickling a task does not import detectors
+  detector: Dict[str, object]
+  stride: int
+  threads: int
+
+
+@dataclass
+class ChunkResult:
+  index: int
+  start: float
+  end: float
+  frames: int = 0
+  people_in: int = 0
+  people_out: int = 0
+  zone_durations: Dict[str, List[float]] = field(default_factory=dict)
+  heatmap: Optional[np.ndarray] = None
+  # Reconciliation data for the chunk boundaries
+  start_tracks: List[BoundaryTrack] = field(default_factory=list)
+  end_tracks: List[BoundaryTrack] = field(default_factory=list)
+  provisional: List[int] = field(default_factory=list)
+  provisional_exits: List[int] = field(default_factory=list)
+  boundary_zone_visits: List[Tuple[int, str, float, float]] = field(default_factory=list)
+
+
+def _process_chunk(task: ChunkTask) -> ChunkResult:
+  # The pool initializer has already applied the limits; this covers direct calls
+  configure_process(task.threads)
+  from .analytics import offset_boxes
+  from .detectors import DetectorSpec, load_detector
+  from .multi import make_tracker
+  from .offline_engine import OfflineAnalyticsEngine
+
+  config = load_config(Path(task.config_path))
+  detector = DetectorSpec(**task.detector)
+  model = load_detector(task.model_path, detector)
+  engine = OfflineAnalyticsEngine(config, task.source, count_from=task.start, detector=detector)
+
+  warm_start = max(0.0, task.start - task.overlap)
+  capture = SequentialCapture(task.source, stride=task.stride, start_ms=warm_start * 1000.0).start()
+  fps = capture.fps or 30.0
+  tracker = make_tracker(frame_rate=max(1, int(round(fps / task.stride))))
+
+  result = ChunkResult(index=task.index, start=task.start, end=task.end)
+  try:
+    for captured in capture:
+      now = captured.media_ms / 1000.0
+      if now < warm_start:
+        # Seeking lands on the preceding keyframe; skip the frames before the window
+        continue
+      if now >= task.end:
+        break
+      frame = captured.frame
+      frame_h, frame_w = frame.shape[:2]
+      crop, offset = engine.roi_crop(frame)
+      prediction = model.predict(crop, verbose=False, classes=[0], imgsz=engine.roi_imgsz(), device='cpu')[0]
+      tracks = tracker.update(prediction.boxes.cpu().numpy(), crop)
+      if len(tracks):
+        engine.observe(tracks[:, 4].astype(int), offset_boxes(tracks[:, :4], offset), frame_w, frame_h, now)
+      else:
+        engine.observe(None, None, frame_w, frame_h, now)
+      result.frames += 1
+  finally:
+    capture.stop()
+
+  result.people_in = engine.people_in
+  result.people_out = engine.people_out
+  result.zone_durations = {zone_id: list(values) for zone_id, values in engine.visit_durations.items()}
+  result.heatmap = engine.heat_counts
+  result.start_tracks = engine.start_tracks
+  result.end_tracks = engine.snapshot()
+  result.provisional = sorted(engine.provisional)
+  result.provisional_exits = engine.provisional_exits
+  result.boundary_zone_visits = engine.boundary_zone_visits
+  return result
+
+
+def match_boundary(previous: Sequence[BoundaryTrack], current: Sequence[BoundaryTrack]) -> Dict[int, BoundaryTrack]:
+  """Greedy one-to-one IoU matching; maps current track ids to the previous chunk's tracks."""
+  if not previous or not current:
+    return {}
+  iou = box_iou(
+    np.array([track.bbox_norm for track in previous]),
+    np.array([track.bbox_norm for track in current]),
+  )
+  matches: Dict[int, BoundaryTrack] = {}
+  used_prev: Set[int] = set()
+  for flat in np.argsort(iou, axis=None)[::-1]:
+    prev_idx, cur_idx = np.unravel_index(flat, iou.shape)
+    if iou[prev_idx, cur_idx] < BOUNDARY_IOU:
+      break
+    cur_id = current[cur_idx].track_id
+    if prev_idx in used_prev or cur_id in matches:
+      continue
+    used_prev.add(int(prev_idx))
+    matches[cur_id] = previous[prev_idx]
+  return matches
+
+
+def stitch_chunks(results: Sequence[ChunkResult]) -> Dict[str, object]:
+  """Merge per-chunk results, reconciling tracks that straddle chunk boundaries."""
+  ordered = sorted(results, key=lambda result: result.index)
+  people_in = sum(result.people_in for result in ordered)
+  people_out = sum(result.people_out for result in ordered)
+  durations: Dict[str, List[float]] = defaultdict(list)
+  heatmap = None
+  reconciled = 0
+
+  previous_end: List[BoundaryTrack] = []
+  for result in ordered:
+    for zone_id, values in result.zone_durations.items():
+      durations[zone_id].extend(values)
+    if result.heatmap is not None:
+      heatmap = result.heatmap.copy() if heatmap is None else heatmap + result.heatmap
+
+    matches = match_boundary(previous_end, result.start_tracks)
+    reconciled += len(matches)
+
+    # A carried-over track's exit counts only if the previous chunk had counted it in
+    for track_id in result.provisional_exits:
+      prev = matches.get(track_id)
+      if prev is not None and prev.counted_in and not prev.counted_out:
+        people_out += 1
+
+    for track_id, zone_id, entered_at, exited_at in result.boundary_zone_visits:
+      prev = matches.get(track_id)
+      if prev is not None and zone_id in prev.active_zones:
+        entered_at = min(entered_at, prev.active_zones[zone_id])
+      durations[zone_id].append(exited_at - entered_at)
+
+    # Resolve this chunk's end state through the same matches for the next boundary
+    provisional = set(result.provisional)
+    resolved: List[BoundaryTrack] = []
+    for track in result.end_tracks:
+      prev = matches.get(track.track_id)
+      active_zones = dict(track.active_zones)
+      if prev is not None:
+        for zone_id, entered_at in active_zones.items():
+          if entered_at < result.start and zone_id in prev.active_zones:
+            active_zones[zone_id] = prev.active_zones[zone_id]
+      counted_in = track.counted_in
+      if track.track_id in provisional:
+        counted_in = prev is not None and prev.counted_in and not prev.counted_out
+      resolved.append(replace(track, counted_in=counted_in, active_zones=active_zones))
+    previous_end = resolved
+
+  return {
+    "peopleIn": people_in,
+    "peopleOut": people_out,
+    "zones": {
+      zone_id: {
+        "visits": len(values),
+        "avgSeconds": round(float(np.mean(values)), 1) if values else 0.0,
+        "longestSeconds": round(float(np.max(values)), 1) if values else 0.0,
+        "p50Seconds": round(float(np.percentile(values, 50)), 1) if values else 0.0,
+        "p90Seconds": round(float(np.percentile(values, 90)), 1) if values else 0.0,
+      }
+      for zone_id, values in durations.items()
+    },
+    "heatmap": heatmap.astype(int).tolist() if heatmap is not None else [],
+    "frames": sum(result.frames for result in ordered),
+    "chunks": len(ordered),
+    "reconciledTracks": reconciled,
+  }
+
+
+def video_duration(source: str) -> float:
+  cap = cv2.VideoCapture(source)
+  try:
+    if not cap.isOpened():
+      raise RuntimeError(f"Unable to open video source {source}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    frames = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0.0
+  finally:
+    cap.release()
+  if fps <= 0 or frames <= 0:
+    raise RuntimeError(f"Could not determine the duration of {source}")
+  return frames / fps
+
+
+def plan_chunks(duration: float, chunk_seconds: float) -> List[Tuple[float, float]]:
+  count = max(1, math.ceil(duration / chunk_seconds))
+  return [(idx * chunk_seconds, min(duration, (idx + 1) * chunk_seconds)) for idx in range(count)]
+
+
+def analyse_video(
+  source: str,
+  config_path: Path,
+  model_path: str = "yolov8n.pt",
+  detector: Optional["DetectorSpec"] = None,
+  workers: Optional[int] = None,
+  chunk_seconds: float = 300.0,
+  overlap: float = 10.0,
+  stride: int = 1,
+) -> Dict[str, object]:
+  from .detectors import DetectorSpec, ensure_exported
+
+  detector = detector or DetectorSpec()
+  duration = video_duration(source)
+  spans = plan_chunks(duration, chunk_seconds)
+  workers = max(1, min(workers or (os.cpu_count() or 1), len(spans)))
+  threads = max(1, (os.cpu_count() or 1) // workers)
+  if detector.backend != "pytorch":
+    ensure_exported(model_path, detector)
+
+  tasks = [
+    ChunkTask(
+      index=idx,
+      source=source,
+      config_path=str(config_path),
+      start=start,
+      end=end,
+      overlap=overlap if idx > 0 else 0.0,
+      model_path=model_path,
+      detector=asdict(detector),
+      stride=stride,
+      threads=threads,
+    )
+    for idx, (start, end) in enumerate(spans)
+  ]
+  print(f"[INFO] {duration:.0f}s of video in {len(tasks)} chunks across {workers} workers ({threads} threads each)")
+
+  started = time.time()
+  # The initializer runs in each worker before it unpickles a task, so the thread
+  # limits are set before numpy, torch or onnxruntime are loaded there
+  with ProcessPoolExecutor(
+    max_workers=workers,
+    mp_context=mp.get_context("spawn"),
+    initializer=configure_process,
+    initargs=(threads,),
+  ) as pool:
+    results = list(pool.map(_process_chunk, tasks))
+  elapsed = time.time() - started
+
+  summary = stitch_chunks(results)
+  summary.update(
+    {
+      "source": source,
+      "mediaSeconds": round(duration, 1),
+      "wallSeconds": round(elapsed, 1),
+      "speedup": round(duration / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+  )
+  return summary
+
+
+def parse_args() -> argparse.Namespace:
+  from .detectors import BACKENDS, PRECISIONS
+
+  default_config = Path(__file__).resolve().parents[1] / "config" / "default_zones.yaml"
+  default_output = Path(__file__).resolve().parents[2] / "data" / "camera" / "offline_summary.json"
+
+  parser = argparse.ArgumentParser(description="Analyse a recorded video faster than real time")
+  parser.add_argument("--source", type=str, required=True, help="Recorded video file")
+  parser.add_argument(
+    "--config",
+    type=Path,
+    default=default_config,
+    help=f"Path to zones configuration (default: {default_config})",
+  )
+  parser.add_argument(
+    "--output",
+    type=Path,
+    default=default_output,
+    help=f"Summary JSON file (default: {default_output})",
+  )
+  parser.add_argument("--model", type=str, default="yolov8n.pt", help="YOLO model checkpoint (default: yolov8n.pt)")
+  parser.add_argument("--backend", choices=BACKENDS, default="pytorch", help="Detector runtime (default: pytorch)")
+  parser.add_argument("--precision", choices=PRECISIONS, default="fp32", help="Exported model precision (default: fp32)")
+  parser.add_argument("--imgsz", type=int, default=512, help="Inference image size (default: 512)")
+  parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+  parser.add_argument(
+    "--chunk-seconds",
+    type=float,
+    default=300.0,
+    help="Length of each parallel chunk in media seconds (default: 300)",
+  )
+  parser.add_argument(
+    "--overlap",
+    type=float,
+    default=10.0,
+    help="Warm-up seconds replayed before each chunk to carry tracks across the boundary (default: 10)",
+  )
+  parser.add_argument("--stride", type=int, default=1, help="Process every Nth frame (default: 1)")
+  return parser.parse_args()
+
+
+def main() -> None:
+  from .detectors import DetectorSpec
+
+  args = parse_args()
+  summary = analyse_video(
+    source=args.source,
+    config_path=args.config,
+    model_path=args.model,
+    detector=DetectorSpec(backend=args.backend, precision=args.precision, imgsz=args.imgsz),
+    workers=args.workers,
+    chunk_seconds=args.chunk_seconds,
+    overlap=args.overlap,
+    stride=args.stride,
+  )
+  args.output.parent.mkdir(parents=True, exist_ok=True)
+  args.output.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+  print(
+    f"[INFO] {summary['mediaSeconds']}s analysed in {summary['wallSeconds']}s "
+    f"({summary['speedup']}x real time) -> {args.output}"
+  )
+
+
+if __name__ == "__main__":
+  main()
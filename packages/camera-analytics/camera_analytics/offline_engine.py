@@ -0,0 +1,141 @@
+"""Chunk engine for offline.py: media-timed, counting only from the chunk start."""
+
+from __future__ import annotations
+
+import os
+from collections import defaultdict
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .analytics import CameraAnalyticsEngine, TrackedPerson
+from .config import AnalyticsConfig
+from .detectors import DetectorSpec
+from .geometry import heatmap_bins
+from .offline import BoundaryTrack
+
+
+class OfflineAnalyticsEngine(CameraAnalyticsEngine):
+  """
+  Engine driven by media timestamps that only counts events from ``count_from`` on.
+
+  Frames before ``count_from`` are the overlap window shared with the previous
+  chunk. They warm up ByteTrack and the per-track state, but they add nothing to
+  the counts, zone durations or heatmap. Tracks already inside when counting
+  starts are *provisional*: whether their exit counts depends on how the
+  previous chunk saw them, which ``stitch_chunks`` settles afterwards.
+  """
+
+  def __init__(
+    self,
+    config: AnalyticsConfig,
+    source: str,
+    count_from: float,
+    detector: Optional[DetectorSpec] = None,
+  ) -> None:
+    super().__init__(
+      # Chunks return their results to stitch_chunks and keep no metrics history. Nor do
+      # they re-identify: stitching matches provisional tracks by id, which a new id breaks
+      config=replace(
+        config,
+        history=replace(config.history, enabled=False),
+        reid=replace(config.reid, enabled=False),
+      ),
+      source=source,
+      output_path=Path(os.devnull),
+      model_path=None,
+      detector=detector,
+      live=False,
+      demographics=False,
+    )
+    self.count_from = count_from
+    self.counting = False
+    self.heat_counts = np.zeros((self.config.heatmap.grid_height, self.config.heatmap.grid_width), dtype=np.float64)
+    # Raw visit durations for this chunk; stitching merges them exactly across chunks
+    self.visit_durations: Dict[str, List[float]] = defaultdict(list)
+    self.start_tracks: List[BoundaryTrack] = []
+    self.provisional: Set[int] = set()
+    self.provisional_exits: List[int] = []
+    self.boundary_zone_visits: List[Tuple[int, str, float, float]] = []
+
+  def observe(
+    self,
+    track_ids: Optional[np.ndarray],
+    boxes: Optional[np.ndarray],
+    frame_w: int,
+    frame_h: int,
+    now: float,
+  ) -> None:
+    if not self.counting and now >= self.count_from:
+      self.counting = True
+      self.start_tracks = self.snapshot()
+      for person in self.tracks.values():
+        if person.inside:
+          self.provisional.add(person.track_id)
+          # Let a later exit fire; stitch_chunks decides whether it really counts
+          person.counted_in = True
+    if track_ids is not None:
+      self._apply_detections(track_ids, boxes, frame_w, frame_h, now)
+
+  def snapshot(self) -> List[BoundaryTrack]:
+    return [
+      BoundaryTrack(
+        track_id=person.track_id,
+        bbox_norm=person.bbox_norm,
+        counted_in=person.counted_in,
+        counted_out=person.counted_out,
+        active_zones=dict(person.active_zones),
+      )
+      for person in self.tracks.values()
+    ]
+
+  def _count_entry(self, person: TrackedPerson, now: float) -> None:
+    if not self.counting:
+      person.counted_in = True
+      return
+    super()._count_entry(person, now)
+
+  def _count_exit(self, person: TrackedPerson, now: float) -> None:
+    if not self.counting:
+      person.counted_out = True
+      return
+    if person.track_id in self.provisional:
+      person.counted_out = True
+      self.provisional_exits.append(person.track_id)
+      return
+    super()._count_exit(person, now)
+
+  # Chunks run without re-identification; these mirror the counting rules above regardless
+
+  def _uncount_entry(self, person: TrackedPerson) -> None:
+    # Provisional tracks were marked counted in without adding to the tally
+    if not self.counting or person.track_id in self.provisional:
+      return
+    super()._uncount_entry(person)
+
+  def _uncount_exit(self, lost) -> None:
+    if not self.counting or lost.lost_at < self.count_from:
+      return
+    if lost.track_id in self.provisional:
+      self.provisional_exits.remove(lost.track_id)
+      return
+    super()._uncount_exit(lost)
+
+  def _record_zone_duration(self, zone_id: str, person: TrackedPerson, entered_at: float, now: float) -> None:
+    if not self.counting:
+      return
+    if entered_at < self.count_from:
+      # The visit began before this chunk could see it; the entry time is fixed up when stitching
+      self.boundary_zone_visits.append((person.track_id, zone_id, entered_at, now))
+      return
+    self.visit_durations[zone_id].append(now - entered_at)
+    super()._record_zone_duration(zone_id, person, entered_at, now)
+
+  def _update_heatmap(self, points: np.ndarray, now: float) -> None:
+    # Offline results are occupancy totals, so accumulate raw hits without decay
+    if not self.counting:
+      return
+    rows, cols = heatmap_bins(points, self.config.heatmap.grid_width, self.config.heatmap.grid_height)
+    np.add.at(self.heat_counts, (rows, cols), 1)
@@ -12,6 +12,8 @@ import numpy as np
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 
+from .heatmap import dense_heatmap
+
 
 @dataclass
 class OverlayState:
@@ -267,7 +269,7 @@ class GlassOverlay:
         if not self.state.heatmap_visible:
             return
             
-        heatmap_data = metrics.get('heatmap', [])
+        heatmap_data = dense_heatmap(metrics.get('heatmap', []))
         if not heatmap_data:
             return
         
@@ -0,0 +1,118 @@
+"""Face-embedding cache that lets a re-assigned track id inherit its lost track's state."""
+
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+from .config import ReidConfig
+
+
+def normalize_embedding(embedding: np.ndarray) -> Optional[np.ndarray]:
+  vector = np.asarray(embedding, dtype=np.float32).ravel()
+  norm = float(np.linalg.norm(vector))
+  if norm == 0.0:
+    return None
+  return vector / norm
+
+
+@dataclass
+class LostTrack:
+  track_id: int
+  embedding: np.ndarray
+  lost_at: float
+  first_seen: float
+  counted_in: bool
+  counted_out: bool
+  # The exit was only counted because the track timed out, not because it crossed the line
+  exit_on_drop: bool
+  age: Optional[float]
+  gender: str
+  age_history: Deque[float] = field(default_factory=deque)
+  gender_history: Deque[str] = field(default_factory=deque)
+
+
+@dataclass
+class ReidStats:
+  lookups: int = 0
+  hits: int = 0
+  expired: int = 0
+  evicted: int = 0
+  restored_exits: int = 0
+
+  def to_dict(self, size: int) -> Dict[str, object]:
+    return {
+      "size": size,
+      "lookups": self.lookups,
+      "hits": self.hits,
+      "hitRate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+      "expired": self.expired,
+      "evicted": self.evicted,
+      "restoredExits": self.restored_exits,
+    }
+
+
+class ReidCache:
+  """
+  Remember recently dropped tracks by face embedding.
+
+  Entries expire ``ttl_seconds`` after the track was lost and the least recently
+  stored one is evicted beyond ``capacity``. ``match`` compares a new track's
+  first embedding against every live entry by cosine similarity and removes
+  the best one at or above ``similarity``.
+  """
+
+  def __init__(self, config: ReidConfig) -> None:
+    self.config = config
+    self.entries: "OrderedDict[int, LostTrack]" = OrderedDict()
+    self.stats = ReidStats()
+
+  def remember(self, person, now: float, exit_on_drop: bool) -> None:
+    if person.embedding is None:
+      return
+    self._expire(now)
+    self.entries.pop(person.track_id, None)
+    self.entries[person.track_id] = LostTrack(
+      track_id=person.track_id,
+      embedding=person.embedding,
+      lost_at=now,
+      first_seen=person.first_seen,
+      counted_in=person.counted_in,
+      counted_out=person.counted_out,
+      exit_on_drop=exit_on_drop,
+      age=person.age,
+      gender=person.gender,
+      age_history=deque(person.age_history, maxlen=person.age_history.maxlen),
+      gender_history=deque(person.gender_history, maxlen=person.gender_history.maxlen),
+    )
+    while len(self.entries) > self.config.capacity:
+      self.entries.popitem(last=False)
+      self.stats.evicted += 1
+
+  def match(self, embedding: np.ndarray, now: float) -> Optional[Tuple[LostTrack, float]]:
+    self._expire(now)
+    self.stats.lookups += 1
+    if not self.entries:
+      return None
+    ids = list(self.entries)
+    similarity = np.stack([self.entries[track_id].embedding for track_id in ids]) @ embedding
+    best = int(np.argmax(similarity))
+    if similarity[best] < self.config.similarity:
+      return None
+    self.stats.hits += 1
+    return self.entries.pop(ids[best]), float(similarity[best])
+
+  def _expire(self, now: float) -> None:
+    # Entries are stored in the order tracks were lost, so expired ones are at the front
+    while self.entries:
+      oldest = next(iter(self.entries.values()))
+      if now - oldest.lost_at <= self.config.ttl_seconds:
+        break
+      self.entries.popitem(last=False)
+      self.stats.expired += 1
+
+  def to_dict(self) -> Dict[str, object]:
+    return self.stats.to_dict(len(self.entries))
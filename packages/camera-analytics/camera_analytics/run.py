@@ -5,6 +5,8 @@ import subprocess
 from pathlib import Path
 
 from .analytics import CameraAnalyticsEngine
+from .capture import DROP_POLICIES, DROP_OLDEST
+from .detectors import BACKENDS, PRECISIONS, DetectorSpec
 from .config import load_config
 
 
@@ -88,6 +90,30 @@ def parse_args() -> argparse.Namespace:
     default="yolov8n.pt",
     help="YOLO model checkpoint (default: yolov8n.pt)",
   )
+  parser.add_argument(
+    "--backend",
+    choices=BACKENDS,
+    default="pytorch",
+    help="Detector runtime; non-pytorch backends export the checkpoint once and cache it (default: pytorch)",
+  )
+  parser.add_argument(
+    "--precision",
+    choices=PRECISIONS,
+    default="fp32",
+    help="Precision of the exported model, int8 for onnx/openvino only (default: fp32)",
+  )
+  parser.add_argument(
+    "--imgsz",
+    type=int,
+    default=512,
+    help="Inference image size; fixed for exported backends (default: 512)",
+  )
+  parser.add_argument(
+    "--model-cache",
+    type=Path,
+    default=None,
+    help="Directory for exported models (default: $OBSERVAI_MODEL_CACHE or ~/.cache/observai/models)",
+  )
   parser.add_argument(
     "--interval",
     type=float,
@@ -99,6 +125,24 @@ def parse_args() -> argparse.Namespace:
     action="store_true",
     help="Show annotated video window (press q to quit)",
   )
+  parser.add_argument(
+    "--capture-buffer",
+    type=int,
+    default=1,
+    help="Frames buffered between the capture thread and the analytics loop for live sources (default: 1)",
+  )
+  parser.add_argument(
+    "--drop-policy",
+    choices=DROP_POLICIES,
+    default=DROP_OLDEST,
+    help=f"Which frame to drop when the live capture buffer is full (default: {DROP_OLDEST})",
+  )
+  parser.add_argument(
+    "--record",
+    type=Path,
+    default=None,
+    help="Record tracker output and face attributes to a detection log for replay (see camera_analytics.replay)",
+  )
   return parser.parse_args()
 
 
@@ -142,8 +186,17 @@ def main() -> None:
     source=source,
     output_path=args.output,
     model_path=args.model,
+    detector=DetectorSpec(
+      backend=args.backend,
+      precision=args.precision,
+      imgsz=args.imgsz,
+      cache_dir=args.model_cache,
+    ),
     sample_interval=args.interval,
     display=args.display,
+    capture_buffer=args.capture_buffer,
+    drop_policy=args.drop_policy,
+    record_path=args.record,
   )
 
   print(f"\n🚀 Starting analytics engine...\n")
@@ -9,6 +9,7 @@ from typing import Dict, List, Optional
 
 from .analytics import CameraAnalyticsEngine
 from .config import load_config
+from .detectors import BACKENDS, PRECISIONS, DetectorSpec
 from .run import get_live_stream_url
 from .websocket_server import AnalyticsWebSocketServer
 
@@ -21,6 +22,7 @@ class CameraAnalyticsWithWebSocket:
         config_path: Path,
         source: str | int,
         model_path: str = "yolov8n.pt",
+        detector: Optional[DetectorSpec] = None,
         display: bool = False,
         ws_host: str = "0.0.0.0",
         ws_port: int = 5000,
@@ -29,6 +31,7 @@ class CameraAnalyticsWithWebSocket:
         self.config = load_config(config_path)
         self.source = source
         self.model_path = model_path
+        self.detector = detector
         self.display = display
         self.output_path = (
             output_path
@@ -69,6 +72,7 @@ class CameraAnalyticsWithWebSocket:
             source=source,
             output_path=self.output_path,
             model_path=self.model_path,
+            detector=self.detector,
             sample_interval=1.0,
             display=self.display,
             on_metrics=emit_metrics,
@@ -116,6 +120,27 @@ def parse_args() -> argparse.Namespace:
         default="yolov8n.pt",
         help="YOLO model checkpoint (default: yolov8n.pt)",
     )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="pytorch",
+        help="Detector runtime; non-pytorch backends export and cache the model (default: pytorch)",
+    )
+    parser.add_argument(
+        "--precision",
+        choices=PRECISIONS,
+        default="fp32",
+        help="Precision of the exported model, int8 for onnx/openvino only (default: fp32)",
+    )
+    parser.add_argument(
+        "--imgsz", type=int, default=512, help="Inference image size (default: 512)"
+    )
+    parser.add_argument(
+        "--model-cache",
+        type=Path,
+        default=None,
+        help="Directory for exported models (default: ~/.cache/observai/models)",
+    )
     parser.add_argument(
         "--display",
         action="store_true",
@@ -134,6 +159,12 @@ def main() -> None:
         config_path=args.config,
         source=args.source,
         model_path=args.model,
+        detector=DetectorSpec(
+            backend=args.backend,
+            precision=args.precision,
+            imgsz=args.imgsz,
+            cache_dir=args.model_cache,
+        ),
         display=args.display,
         ws_host=args.ws_host,
         ws_port=args.ws_port,
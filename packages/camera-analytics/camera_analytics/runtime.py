@@ -0,0 +1,83 @@
+"""Process-level runtime tuning: inference thread counts and CPU affinity."""
+
+from __future__ import annotations
+
+import os
+from typing import Optional, Sequence
+
+THREADS_ENV = "OBSERVAI_INFERENCE_THREADS"
+
+_THREAD_ENV_VARS = (
+  "OMP_NUM_THREADS",
+  "MKL_NUM_THREADS",
+  "OPENBLAS_NUM_THREADS",
+  "NUMEXPR_NUM_THREADS",
+)
+
+
+def configure_process(threads: int, cpus: Optional[Sequence[int]] = None) -> None:
+  """
+  Limit this process to ``threads`` inference threads, optionally pinned to ``cpus``.
+
+  Must run before torch / onnxruntime are imported so the BLAS and OpenMP pools
+  pick up the environment; torch is adjusted directly as well in case it is
+  already loaded.
+  """
+  threads = max(1, int(threads))
+  for var in _THREAD_ENV_VARS:
+    os.environ[var] = str(threads)
+  os.environ[THREADS_ENV] = str(threads)
+
+  if cpus and hasattr(os, "sched_setaffinity"):
+    try:
+      os.sched_setaffinity(0, set(cpus))
+    except OSError as err:  # pragma: no cover - depends on host permissions
+      print(f"[WARN] Could not pin process to CPUs {list(cpus)}: {err}")
+
+  try:
+    import torch
+  except Exception:  # pragma: no cover - torch ships with ultralytics
+    return
+  torch.set_num_threads(threads)
+  try:
+    torch.set_num_interop_threads(1)
+  except RuntimeError:
+    # Only allowed before the first parallel op; keep the existing pool
+    pass
+
+
+def ort_session_options():
+  """SessionOptions honouring the configured thread budget, or ``None`` if unset."""
+  threads = os.environ.get(THREADS_ENV)
+  if not threads:
+    return None
+  try:
+    import onnxruntime as ort
+  except Exception:  # pragma: no cover - optional dependency
+    return None
+  options = ort.SessionOptions()
+  options.intra_op_num_threads = int(threads)
+  options.inter_op_num_threads = 1
+  return options
+
+
+def cpu_shards(workers: int, cpus: Optional[Sequence[int]] = None) -> list[list[int]]:
+  """Split the available CPUs into ``workers`` contiguous, non-overlapping sets."""
+  if cpus is None:
+    if hasattr(os, "sched_getaffinity"):
+      cpus = sorted(os.sched_getaffinity(0))
+    else:
+      cpus = list(range(os.cpu_count() or 1))
+  cpus = list(cpus)
+  workers = max(1, workers)
+  if workers > len(cpus):
+    # More workers than cores: let them share round-robin rather than overlap fully
+    return [[cpus[idx % len(cpus)]] for idx in range(workers)]
+  size, extra = divmod(len(cpus), workers)
+  shards: list[list[int]] = []
+  start = 0
+  for idx in range(workers):
+    end = start + size + (1 if idx < extra else 0)
+    shards.append(cpus[start:end])
+    start = end
+  return shards
@@ -0,0 +1,321 @@
+"""Spread cameras across pinned worker processes and restart them if they crash."""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import time
+from dataclasses import asdict, dataclass, field
+from multiprocessing.connection import Connection, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .runtime import configure_process, cpu_shards
+
+# detectors imports ultralytics (and torch). This module is imported by every
+# spawned worker before _worker_main runs, so it only imports it lazily.
+if TYPE_CHECKING:
+  from .detectors import DetectorSpec
+
+# Camera as (id, source, zones config path); kept picklable for spawned workers
+CameraEntry = Tuple[str, "str | int", str]
+
+
+@dataclass
+class WorkerSpec:
+  id: int
+  cameras: List[CameraEntry]
+  cpus: List[int]
+  threads: int
+
+
+@dataclass
+class WorkerState:
+  spec: WorkerSpec
+  process: Optional[mp.process.BaseProcess] = None
+  reader: Optional[Connection] = None
+  restarts: int = 0
+  restart_at: Optional[float] = None
+  # Exited with code 0 (e.g. its file sources ended); not restarted
+  finished: bool = False
+  messages: int = 0
+  last_message: float = field(default_factory=time.time)
+
+
+def _worker_main(spec: WorkerSpec, conn: Connection, options: Dict[str, object]) -> None:
+  # Thread limits and affinity must be in place before torch/onnxruntime load
+  configure_process(spec.threads, spec.cpus)
+
+  from .config import load_config
+  from .detectors import DetectorSpec
+  from .multi import CameraSpec, MultiCameraRunner
+
+  def on_metrics(camera_id: str, payload: Dict[str, object]) -> None:
+    try:
+      conn.send((camera_id, payload))
+    except (BrokenPipeError, OSError):
+      pass
+
+  cameras = [
+    CameraSpec(id=camera_id, source=source, config=load_config(Path(config_path)))
+    for camera_id, source, config_path in spec.cameras
+  ]
+  runner = MultiCameraRunner(
+    cameras=cameras,
+    output_dir=Path(str(options["output_dir"])),
+    model_path=str(options["model_path"]),
+    sample_interval=float(options["sample_interval"]),
+    detector=DetectorSpec(**options["detector"]),
+    on_metrics=on_metrics,
+  )
+  runner.run()
+
+
+class CameraSupervisor:
+  """
+  Shard cameras across a pool of worker processes.
+
+  Each worker owns a ``MultiCameraRunner`` for its cameras, is pinned to its own
+  slice of CPUs with a matching torch/onnxruntime thread budget, and streams the
+  per-camera metrics payloads back over a one-way pipe. A worker that crashes
+  (non-zero exit code) is restarted on its own after ``restart_delay`` seconds;
+  the others keep running. A worker that exits cleanly, as it does when its
+  file sources end, stays stopped, and the supervisor returns once all have.
+  """
+
+  def __init__(
+    self,
+    cameras: Sequence[CameraEntry],
+    output_dir: Path,
+    workers: Optional[int] = None,
+    threads_per_worker: Optional[int] = None,
+    model_path: str = "yolov8n.pt",
+    sample_interval: float = 1.0,
+    detector: Optional["DetectorSpec"] = None,
+    restart_delay: float = 2.0,
+    on_metrics: Optional[Callable[[str, Dict[str, object]], None]] = None,
+  ) -> None:
+    if not cameras:
+      raise ValueError("CameraSupervisor needs at least one camera")
+    worker_count = min(len(cameras), workers or len(cameras))
+    shards = cpu_shards(worker_count)
+
+    self.workers: Dict[int, WorkerState] = {}
+    for worker_id in range(worker_count):
+      cpus = shards[worker_id]
+      spec = WorkerSpec(
+        id=worker_id,
+        cameras=list(cameras[worker_id::worker_count]),
+        cpus=cpus,
+        threads=threads_per_worker or len(cpus),
+      )
+      self.workers[worker_id] = WorkerState(spec=spec)
+
+    self.options: Dict[str, object] = {
+      "output_dir": str(output_dir),
+      "model_path": model_path,
+      "sample_interval": sample_interval,
+      # Sent as plain fields so unpickling the options does not import detectors
+      "detector": asdict(detector) if detector is not None else {},
+    }
+    self.restart_delay = restart_delay
+    self.on_metrics = on_metrics
+    self.latest: Dict[str, Dict[str, object]] = {}
+    self._ctx = mp.get_context("spawn")
+    self._stopping = False
+
+  def run(self) -> None:
+    from .detectors import DetectorSpec, ensure_exported
+
+    detector = DetectorSpec(**self.options["detector"])
+    if detector.backend != "pytorch":
+      # Export once up front so workers don't race to write the same artifact
+      ensure_exported(str(self.options["model_path"]), detector)
+    for state in self.workers.values():
+      self._spawn(state)
+    try:
+      while not self._stopping and not all(state.finished for state in self.workers.values()):
+        self._poll(timeout=1.0)
+        self._restart_due()
+    except KeyboardInterrupt:
+      print("\n[INFO] Supervisor interrupted, stopping workers...")
+    finally:
+      self.stop()
+
+  def stop(self) -> None:
+    self._stopping = True
+    for state in self.workers.values():
+      if state.process is not None and state.process.is_alive():
+        state.process.terminate()
+    for state in self.workers.values():
+      if state.process is not None:
+        state.process.join(timeout=5.0)
+      if state.reader is not None:
+        state.reader.close()
+        state.reader = None
+
+  def _spawn(self, state: WorkerState) -> None:
+    reader, writer = self._ctx.Pipe(duplex=False)
+    process = self._ctx.Process(
+      target=_worker_main,
+      args=(state.spec, writer, self.options),
+      name=f"camera-worker-{state.spec.id}",
+      daemon=True,
+    )
+    process.start()
+    # The child holds its own copy; closing ours lets recv() see EOF if it dies
+    writer.close()
+    state.process = process
+    state.reader = reader
+    state.restart_at = None
+    camera_ids = ", ".join(camera_id for camera_id, _, _ in state.spec.cameras)
+    print(
+      f"[INFO] Worker {state.spec.id} (pid {process.pid}) -> cameras [{camera_ids}] "
+      f"on CPUs {state.spec.cpus} with {state.spec.threads} threads"
+    )
+
+  def _poll(self, timeout: float) -> None:
+    readers = {state.reader: state for state in self.workers.values() if state.reader is not None}
+    sentinels = {
+      state.process.sentinel: state
+      for state in self.workers.values()
+      if state.process is not None and state.restart_at is None
+    }
+    if not readers and not sentinels:
+      time.sleep(timeout)
+      return
+
+    for ready in wait(list(readers) + list(sentinels), timeout=timeout):
+      if ready in readers:
+        self._drain(readers[ready])
+      elif ready in sentinels:
+        self._handle_exit(sentinels[ready])
+
+  def _drain(self, state: WorkerState) -> None:
+    try:
+      while state.reader is not None and state.reader.poll():
+        camera_id, payload = state.reader.recv()
+        state.messages += 1
+        state.last_message = time.time()
+        self.latest[camera_id] = payload
+        if self.on_metrics is not None:
+          self.on_metrics(camera_id, payload)
+    except (EOFError, OSError):
+      # Worker went away; its sentinel triggers the restart
+      state.reader.close()
+      state.reader = None
+
+  def _handle_exit(self, state: WorkerState) -> None:
+    if self._stopping or state.process is None:
+      return
+    state.process.join(timeout=1.0)
+    exitcode = state.process.exitcode
+    if state.reader is not None:
+      self._drain(state)
+    if state.reader is not None:
+      state.reader.close()
+      state.reader = None
+    if exitcode == 0:
+      # Restarting would reprocess finished file sources and count them again
+      state.finished = True
+      # Its sentinel stays ready; dropping the process keeps it out of _poll
+      state.process = None
+      print(f"[INFO] Worker {state.spec.id} finished")
+      return
+    state.restarts += 1
+    state.restart_at = time.time() + self.restart_delay
+    print(
+      f"[WARN] Worker {state.spec.id} exited with code {exitcode}; "
+      f"restarting in {self.restart_delay:.1f}s (restart #{state.restarts})"
+    )
+
+  def _restart_due(self) -> None:
+    now = time.time()
+    for state in self.workers.values():
+      if state.restart_at is not None and now >= state.restart_at and not self._stopping:
+        self._spawn(state)
+
+
+def parse_args() -> argparse.Namespace:
+  from .detectors import BACKENDS, PRECISIONS
+  from .multi import parse_camera
+
+  default_config = Path(__file__).resolve().parents[1] / "config" / "default_zones.yaml"
+  default_output = Path(__file__).resolve().parents[2] / "data" / "camera"
+
+  parser = argparse.ArgumentParser(description="Run ObservAI analytics for many cameras across worker processes")
+  parser.add_argument(
+    "--camera",
+    type=parse_camera,
+    action="append",
+    required=True,
+    help="Camera as id=source (repeat for each camera)",
+  )
+  parser.add_argument(
+    "--config",
+    type=Path,
+    default=default_config,
+    help=f"Zones configuration shared by all cameras (default: {default_config})",
+  )
+  parser.add_argument(
+    "--camera-config",
+    action="append",
+    default=[],
+    help="Per-camera zones configuration as id=path, overrides --config for that camera",
+  )
+  parser.add_argument(
+    "--output-dir",
+    type=Path,
+    default=default_output,
+    help=f"Directory for per-camera metrics JSON files (default: {default_output})",
+  )
+  parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per camera)")
+  parser.add_argument(
+    "--threads-per-worker",
+    type=int,
+    default=None,
+    help="Inference threads per worker (default: the worker's share of CPUs)",
+  )
+  parser.add_argument("--model", type=str, default="yolov8n.pt", help="YOLO model checkpoint (default: yolov8n.pt)")
+  parser.add_argument("--imgsz", type=int, default=512, help="Inference image size (default: 512)")
+  parser.add_argument("--backend", choices=BACKENDS, default="pytorch", help="Detector runtime (default: pytorch)")
+  parser.add_argument("--precision", choices=PRECISIONS, default="fp32", help="Exported model precision (default: fp32)")
+  parser.add_argument(
+    "--interval",
+    type=float,
+    default=1.0,
+    help="Number of seconds between metrics dumps (default: 1.0)",
+  )
+  parser.add_argument(
+    "--restart-delay",
+    type=float,
+    default=2.0,
+    help="Seconds to wait before restarting a crashed worker (default: 2.0)",
+  )
+  return parser.parse_args()
+
+
+def main() -> None:
+  from .detectors import DetectorSpec
+
+  args = parse_args()
+  overrides = dict(spec.split("=", 1) for spec in args.camera_config)
+  cameras: List[CameraEntry] = [
+    (camera_id, source, str(overrides.get(camera_id, args.config)))
+    for camera_id, source in args.camera
+  ]
+  supervisor = CameraSupervisor(
+    cameras=cameras,
+    output_dir=args.output_dir,
+    workers=args.workers,
+    threads_per_worker=args.threads_per_worker,
+    model_path=args.model,
+    sample_interval=args.interval,
+    detector=DetectorSpec(backend=args.backend, precision=args.precision, imgsz=args.imgsz),
+    restart_delay=args.restart_delay,
+  )
+  supervisor.run()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,440 @@
+"""Columnar track store: one row per live track, with NumPy columns for the per-frame fields."""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .metrics import AGE_BUCKETS, age_bucket_codes
+
+GENDERS = ("unknown", "male", "female")
+GENDER_CODES = {name: code for code, name in enumerate(GENDERS)}
+STATES = ("entering", "present", "exiting")
+ENTERING, PRESENT, EXITING = range(len(STATES))
+
+
+def _optional_float(value: np.floating) -> Optional[float]:
+  return None if np.isnan(value) else float(value)
+
+
+def _optional_point(value: np.ndarray) -> Optional[Tuple[float, float]]:
+  return None if np.isnan(value[0]) else tuple(value.tolist())
+
+
+def _to_point(value: Optional[Tuple[float, ...]]) -> Tuple[float, ...]:
+  return (np.nan, np.nan) if value is None else value
+
+
+class _Column:
+  """
+  Attribute of ``TrackedPerson`` that lives in a ``TrackTable`` column.
+
+  Columns that feed the table's tallies name a ``setter`` method, so that
+  writes through the attribute keep the tallies current.
+  """
+
+  def __init__(
+    self,
+    name: str,
+    read: Callable = lambda value: value,
+    write: Callable = lambda value: value,
+    setter: Optional[str] = None,
+  ) -> None:
+    self.name = name
+    self.read = read
+    self.write = write
+    self.setter = setter
+
+  def __get__(self, person: Optional["TrackedPerson"], owner: type):
+    if person is None:
+      return self
+    return self.read(getattr(person.table, self.name)[person.row])
+
+  def __set__(self, person: "TrackedPerson", value) -> None:
+    if self.setter is not None:
+      getattr(person.table, self.setter)(person.row, self.write(value))
+    else:
+      getattr(person.table, self.name)[person.row] = self.write(value)
+
+
+class TrackedPerson:
+  """
+  One track: a row of a ``TrackTable`` plus the per-track state that is not a column.
+
+  Column-backed attributes read and write the table, so per-track code and
+  the table's array operations always see the same values.
+  """
+
+  __slots__ = ("table", "row", "entry_door", "exit_door", "age_history", "gender_history", "gender_confidence", "embedding")
+
+  track_id = _Column("ids", int)
+  first_seen = _Column("first_seen", float, setter="set_first_seen")
+  last_seen = _Column("last_seen", float)
+  bbox_norm = _Column("bbox", lambda value: tuple(value.tolist()))
+  center_norm = _Column("center", lambda value: tuple(value.tolist()))
+  prev_center_norm = _Column("prev_center", _optional_point, _to_point)
+  counted_in = _Column("counted_in", bool)
+  counted_out = _Column("counted_out", bool)
+  inside = _Column("inside", bool, setter="set_inside")
+  age = _Column("age", _optional_float, lambda value: np.nan if value is None else float(value), setter="set_age")
+  gender = _Column("gender", lambda code: GENDERS[code], lambda name: GENDER_CODES.get(name, 0), setter="set_gender")
+  state = _Column("state", lambda code: STATES[code], STATES.index)
+
+  def __init__(self, table: "TrackTable", row: int) -> None:
+    self.table = table
+    self.row = row
+    # Doors this track was counted in and out through
+    self.entry_door: Optional[str] = None
+    self.exit_door: Optional[str] = None
+    # Temporal smoothing for demographics
+    self.age_history: deque = deque(maxlen=24)
+    self.gender_history: deque = deque(maxlen=24)
+    self.gender_confidence = 0.5
+    # Smoothed, unit-length face embedding used for re-identification
+    self.embedding: Optional[np.ndarray] = None
+
+  @property
+  def active_zones(self) -> Dict[str, float]:
+    """Zone id -> time the track entered it, for the zones it is in."""
+    zones = np.flatnonzero(self.table.zone_in[self.row])
+    since = self.table.zone_since[self.row, zones].tolist()
+    return {self.table.zone_ids[zone]: entered_at for zone, entered_at in zip(zones.tolist(), since)}
+
+  def contains_pixel(self, px: float, py: float) -> bool:
+    x1, y1, x2, y2 = self.bbox_norm
+    return x1 <= px <= x2 and y1 <= py <= y2
+
+  def update_age(self, new_age: float, max_samples: int = 10) -> None:
+    """Update age with temporal smoothing - increased samples for stability"""
+    if new_age is None:
+      return
+    self.age_history.append(float(new_age))
+    samples = list(self.age_history)
+    if len(samples) >= 3:
+      self.age = float(np.median(samples))
+    else:
+      self.age = float(np.mean(samples))
+
+  def update_gender(self, new_gender: str, max_samples: int = 10) -> None:
+    """Update gender with majority voting - increased samples for stability"""
+    if not new_gender or new_gender == "unknown":
+      return
+
+    self.gender_history.append(new_gender)
+    if len(self.gender_history) > max_samples:
+      self.gender_history.popleft()
+
+    male_votes = self.gender_history.count("male")
+    female_votes = self.gender_history.count("female")
+
+    total_votes = len(self.gender_history)
+    if total_votes == 0:
+      return
+
+    if male_votes / total_votes >= 0.6:
+      self.gender = "male"
+    elif female_votes / total_votes >= 0.6:
+      self.gender = "female"
+
+
+class DetachedRow:
+  """
+  Private copy of a dropped track's row, read like a one-row ``TrackTable``.
+
+  The values sit in one structured record, so detaching a track costs a single
+  small allocation. The row is not live, so its setters just store values and
+  no tallies change.
+  """
+
+  __slots__ = ("record", "zone_ids", "epoch")
+
+  def __init__(self, record: np.ndarray, zone_ids: List[str], epoch: Optional[float]) -> None:
+    self.record = record
+    self.zone_ids = zone_ids
+    self.epoch = epoch
+
+  def __getattr__(self, name: str) -> np.ndarray:
+    # Column name -> a length-1 view of that field, indexed by row 0
+    try:
+      return self.record[name]
+    except (KeyError, ValueError):
+      raise AttributeError(name) from None
+
+  def set_inside(self, row: int, inside: bool) -> None:
+    self.record["inside"][row] = inside
+
+  def set_gender(self, row: int, code: int) -> None:
+    self.record["gender"][row] = code
+
+  def set_age(self, row: int, age: float) -> None:
+    self.record["age"][row] = age
+    self.record["age_bucket"][row] = age_bucket_codes(age)
+
+  def set_first_seen(self, row: int, first_seen: float) -> None:
+    self.record["first_seen"][row] = first_seen
+
+  def enter_zone(self, row: int, zone: int, now: float) -> None:
+    self.record["zone_in"][row, zone] = True
+    self.record["zone_since"][row, zone] = now
+
+  def leave_zone(self, row: int, zone: int) -> None:
+    self.record["zone_in"][row, zone] = False
+
+  def leave_zones(self, row: int) -> None:
+    self.record["zone_in"][row] = False
+
+
+class TrackTable:
+  """
+  Struct-of-arrays store for live tracks, keyed by track id.
+
+  Rows of dropped tracks are reused, and the columns double in size when they
+  run out. It behaves like the ``Dict[int, TrackedPerson]`` it replaces
+  (``get``, ``values``, ``items``, ``pop``...), with iteration in insertion order.
+
+  It also keeps tallies over the live tracks: how many are inside, their
+  genders, age buckets and summed ``first_seen``, and how many are in each
+  zone. These are adjusted whenever one of the inputs changes, so a metrics
+  snapshot reads them in O(1). Writes to ``inside``, ``gender``, ``age``,
+  ``first_seen`` and ``zone_in`` must therefore go through the ``set_*``,
+  ``enter_zone`` and ``leave_zone(s)`` methods (the ``TrackedPerson``
+  attributes already do).
+  """
+
+  def __init__(self, zone_ids: Sequence[str] = (), capacity: int = 64) -> None:
+    # zone_in / zone_since have one column per zone, in this order
+    self.zone_ids = list(zone_ids)
+    self.capacity = 0
+    # Rows handed out so far; rows below this are either live or on the free list
+    self.size = 0
+    self.rows: Dict[int, int] = {}
+    self.people: List[Optional[TrackedPerson]] = []
+    self.free: List[int] = []
+    # Min-heap of (last_seen when pushed, serial, person); entries are checked only when due
+    self.expiry: List[Tuple[float, int, TrackedPerson]] = []
+    self._serial = itertools.count()
+    # Tallies; inside_buckets has a last slot for unknown ages, so bucket -1 indexes it.
+    # first_seen is summed relative to epoch to keep the float sum small.
+    self.epoch: Optional[float] = None
+    self.inside_count = 0
+    self.inside_genders = [0] * len(GENDERS)
+    self.inside_buckets = [0] * (len(AGE_BUCKETS) + 1)
+    self.inside_first_seen = 0.0
+    self.zone_counts = [0] * len(self.zone_ids)
+    # One row as a single record, for detaching dropped tracks
+    self.record_dtype = np.dtype([(name, dtype, shape) for name, shape, dtype, _ in self._columns()])
+    self._grow(max(1, capacity))
+
+  def _columns(self) -> List[Tuple[str, Tuple[int, ...], type, object]]:
+    return [
+      ("ids", (), np.int64, 0),
+      ("bbox", (4,), np.float64, 0.0),
+      ("center", (2,), np.float64, 0.0),
+      # NaN until the track has been seen twice
+      ("prev_center", (2,), np.float64, np.nan),
+      ("first_seen", (), np.float64, 0.0),
+      ("last_seen", (), np.float64, 0.0),
+      ("counted_in", (), bool, False),
+      ("counted_out", (), bool, False),
+      ("inside", (), bool, False),
+      ("age", (), np.float64, np.nan),
+      ("age_bucket", (), np.int8, -1),
+      ("gender", (), np.int8, 0),
+      ("state", (), np.int8, ENTERING),
+      ("live", (), bool, False),
+      ("zone_in", (len(self.zone_ids),), bool, False),
+      ("zone_since", (len(self.zone_ids),), np.float64, 0.0),
+    ]
+
+  def _grow(self, capacity: int) -> None:
+    for name, shape, dtype, fill in self._columns():
+      column = np.full((capacity,) + shape, fill, dtype=dtype)
+      if self.capacity:
+        column[: self.capacity] = getattr(self, name)
+      setattr(self, name, column)
+    self.people.extend([None] * (capacity - self.capacity))
+    self.capacity = capacity
+
+  def _reset(self, row: int) -> None:
+    for name, _, _, fill in self._columns():
+      getattr(self, name)[row] = fill
+
+  def add(self, track_id: int, now: float) -> TrackedPerson:
+    if self.free:
+      row = self.free.pop()
+    else:
+      if self.size == self.capacity:
+        self._grow(self.capacity * 2)
+      row = self.size
+      self.size += 1
+    if self.epoch is None:
+      self.epoch = now
+    self._reset(row)
+    self.ids[row] = track_id
+    self.first_seen[row] = now
+    self.last_seen[row] = now
+    self.live[row] = True
+    person = TrackedPerson(self, row)
+    self.people[row] = person
+    self.rows[track_id] = row
+    heapq.heappush(self.expiry, (now, next(self._serial), person))
+    return person
+
+  def expired(self, now: float, ttl: float) -> List[TrackedPerson]:
+    """
+    Live tracks unseen for more than ``ttl`` seconds.
+
+    Seeing a track does not touch the heap. When an entry comes due, a track
+    seen since is pushed back with its current ``last_seen``, and an entry
+    for a track that was already dropped is discarded.
+    """
+    due: List[TrackedPerson] = []
+    while self.expiry and now - self.expiry[0][0] > ttl:
+      _, _, person = heapq.heappop(self.expiry)
+      if person.table is not self:
+        continue
+      last_seen = float(self.last_seen[person.row])
+      if now - last_seen > ttl:
+        due.append(person)
+      else:
+        heapq.heappush(self.expiry, (last_seen, next(self._serial), person))
+    return due
+
+  def _tally(self, row: int, sign: int) -> None:
+    """Add (+1) or remove (-1) an inside track's share of the tallies."""
+    self.inside_count += sign
+    self.inside_genders[self.gender[row]] += sign
+    self.inside_buckets[self.age_bucket[row]] += sign
+    self.inside_first_seen += sign * (float(self.first_seen[row]) - self.epoch)
+
+  def _tallied(self, row: int) -> bool:
+    return bool(self.live[row] and self.inside[row])
+
+  def set_inside(self, row: int, inside: bool) -> None:
+    if self.live[row] and self.inside[row] != inside:
+      self._tally(row, 1 if inside else -1)
+    self.inside[row] = inside
+
+  def set_inside_rows(self, rows: np.ndarray, inside) -> None:
+    """Vectorised ``set_inside``: ``inside`` is one flag or one per row."""
+    if not len(rows):
+      return
+    changed = (self.inside[rows] != inside) & self.live[rows]
+    if changed.any():
+      flags = np.broadcast_to(inside, rows.shape)[changed]
+      for row, flag in zip(rows[changed].tolist(), flags.tolist()):
+        self._tally(row, 1 if flag else -1)
+    self.inside[rows] = inside
+
+  def set_gender(self, row: int, code: int) -> None:
+    if self._tallied(row):
+      self.inside_genders[self.gender[row]] -= 1
+      self.inside_genders[code] += 1
+    self.gender[row] = code
+
+  def set_age(self, row: int, age: float) -> None:
+    bucket = int(age_bucket_codes(age))
+    if self._tallied(row):
+      self.inside_buckets[self.age_bucket[row]] -= 1
+      self.inside_buckets[bucket] += 1
+    self.age[row] = age
+    self.age_bucket[row] = bucket
+
+  def set_first_seen(self, row: int, first_seen: float) -> None:
+    if self._tallied(row):
+      self.inside_first_seen += first_seen - float(self.first_seen[row])
+    self.first_seen[row] = first_seen
+
+  def enter_zone(self, row: int, zone: int, now: float) -> None:
+    if self.live[row] and not self.zone_in[row, zone]:
+      self.zone_counts[zone] += 1
+    self.zone_in[row, zone] = True
+    self.zone_since[row, zone] = now
+
+  def leave_zone(self, row: int, zone: int) -> None:
+    if self.live[row] and self.zone_in[row, zone]:
+      self.zone_counts[zone] -= 1
+    self.zone_in[row, zone] = False
+
+  def leave_zones(self, row: int) -> None:
+    if self.live[row]:
+      for zone in np.flatnonzero(self.zone_in[row]).tolist():
+        self.zone_counts[zone] -= 1
+    self.zone_in[row] = False
+
+  def mean_first_seen(self) -> Optional[float]:
+    """Mean ``first_seen`` of the tracks inside, or None when there are none."""
+    if not self.inside_count:
+      return None
+    return self.epoch + self.inside_first_seen / self.inside_count
+
+  def observe(self, track_ids: np.ndarray, boxes_norm: np.ndarray, now: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Add or update one frame's tracks; return their rows and which of them are new."""
+    rows = np.empty(len(track_ids), dtype=np.intp)
+    new = np.zeros(len(track_ids), dtype=bool)
+    for index, track_id in enumerate(track_ids.tolist()):
+      row = self.rows.get(track_id)
+      if row is None:
+        row = self.add(track_id, now).row
+        new[index] = True
+      rows[index] = row
+    seen = rows[~new]
+    self.prev_center[seen] = self.center[seen]
+    self.bbox[rows] = boxes_norm
+    self.center[rows] = (boxes_norm[:, :2] + boxes_norm[:, 2:]) / 2.0
+    self.last_seen[rows] = now
+    return rows, new
+
+  def live_rows(self) -> np.ndarray:
+    """Rows of the live tracks, in insertion order."""
+    return np.fromiter(self.rows.values(), dtype=np.intp, count=len(self.rows))
+
+  def pop(self, track_id: int, default: Optional[TrackedPerson] = None) -> Optional[TrackedPerson]:
+    row = self.rows.pop(track_id, None)
+    if row is None:
+      return default
+    person = self.people[row]
+    if self.inside[row]:
+      self._tally(row, -1)
+    for zone in np.flatnonzero(self.zone_in[row]).tolist():
+      self.zone_counts[zone] -= 1
+    # The row will be reused, so the dropped person keeps a private copy of it.
+    # The copy is not live, so later writes to it leave every tally alone.
+    record = np.empty(1, dtype=self.record_dtype)
+    for name in self.record_dtype.names:
+      record[name][0] = getattr(self, name)[row]
+    record["live"][0] = False
+    person.table, person.row = DetachedRow(record, self.zone_ids, self.epoch), 0
+    self.people[row] = None
+    self.live[row] = False
+    self.free.append(row)
+    return person
+
+  def get(self, track_id: int, default: Optional[TrackedPerson] = None) -> Optional[TrackedPerson]:
+    row = self.rows.get(track_id)
+    return default if row is None else self.people[row]
+
+  def __getitem__(self, track_id: int) -> TrackedPerson:
+    return self.people[self.rows[track_id]]
+
+  def __contains__(self, track_id: object) -> bool:
+    return track_id in self.rows
+
+  def __len__(self) -> int:
+    return len(self.rows)
+
+  def __iter__(self) -> Iterator[int]:
+    return iter(self.rows)
+
+  def keys(self):
+    return self.rows.keys()
+
+  def values(self) -> List[TrackedPerson]:
+    return [self.people[row] for row in self.rows.values()]
+
+  def items(self) -> List[Tuple[int, TrackedPerson]]:
+    return [(track_id, self.people[row]) for track_id, row in self.rows.items()]
@@ -0,0 +1,173 @@
+"""Background metrics writer: coalesced, compact and atomically replaced JSON snapshots."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Deque, Optional, Tuple
+
+from .metrics import CameraMetrics
+
+if TYPE_CHECKING:
+  from .history import MetricsHistory
+
+# Keys that change on every snapshot without anything happening in the scene
+_TELEMETRY = ("ts", "fps", "pipeline")
+
+
+@dataclass
+class MetricsWriterStats:
+  submitted: int = 0
+  written: int = 0
+  # Replaced in the mailbox by a newer snapshot before the writer got to them
+  coalesced: int = 0
+  # Identical to the file already on disk apart from the timestamp and telemetry
+  skipped: int = 0
+  failed: int = 0
+  history_records: int = 0
+  history_dropped: int = 0
+  bytes: int = 0
+  write_ms: float = 0.0
+  max_write_ms: float = 0.0
+
+  def record(self, elapsed: float, size: int) -> None:
+    self.written += 1
+    self.bytes = size
+    elapsed_ms = elapsed * 1000.0
+    self.write_ms = elapsed_ms if self.written == 1 else 0.9 * self.write_ms + 0.1 * elapsed_ms
+    self.max_write_ms = max(self.max_write_ms, elapsed_ms)
+
+  def to_dict(self) -> dict:
+    return {
+      "submitted": self.submitted,
+      "written": self.written,
+      "coalesced": self.coalesced,
+      "skipped": self.skipped,
+      "failed": self.failed,
+      "historyRecords": self.history_records,
+      "historyDropped": self.history_dropped,
+      "bytes": self.bytes,
+      "writeMs": round(self.write_ms, 2),
+      "maxWriteMs": round(self.max_write_ms, 2),
+    }
+
+
+class MetricsWriter:
+  """
+  Write metrics snapshots to ``path`` on a background thread so the frame loop never waits on the disk.
+
+  ``submit`` leaves the snapshot in a single-slot mailbox, so a newer snapshot
+  replaces one that is still waiting. The writer serialises it as compact
+  JSON and skips the write when nothing but ``ts``, ``fps`` and ``pipeline``
+  changed, unless the file is ``refresh_seconds`` old. Otherwise it writes a
+  temporary file beside ``path``, fsyncs it and renames it over ``path``, so
+  readers always see a complete file. Snapshots for ``history``
+  are queued rather than coalesced (up to ``history_backlog``) and recorded
+  on the same thread.
+  """
+
+  def __init__(
+    self,
+    path: Path,
+    history: Optional["MetricsHistory"] = None,
+    refresh_seconds: float = 30.0,
+    history_backlog: int = 600,
+  ) -> None:
+    self.path = path
+    self.history = history
+    self.refresh_seconds = refresh_seconds
+    self.stats = MetricsWriterStats()
+    self._temp_path = path.with_name(f".{path.name}.tmp")
+    self._last_body: Optional[str] = None
+    self._last_written = 0.0
+
+    self._slot: Optional[CameraMetrics] = None
+    self._samples: Deque[Tuple[CameraMetrics, float]] = deque()
+    self._history_backlog = history_backlog
+    self._cond = threading.Condition()
+    self._stopped = threading.Event()
+    self._thread: Optional[threading.Thread] = None
+
+  def start(self) -> "MetricsWriter":
+    if self._thread is None:
+      self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+      self._thread.start()
+    return self
+
+  def stop(self) -> None:
+    """Write whatever is still waiting, then stop the thread."""
+    self._stopped.set()
+    with self._cond:
+      self._cond.notify_all()
+    if self._thread is not None:
+      self._thread.join(timeout=10.0)
+      self._thread = None
+
+  def submit(self, metrics: CameraMetrics, timestamp: float) -> None:
+    """Hand over a snapshot; the caller must not modify it afterwards."""
+    self.start()
+    with self._cond:
+      if self._slot is not None:
+        self.stats.coalesced += 1
+      self._slot = metrics
+      self.stats.submitted += 1
+      if self.history is not None:
+        if len(self._samples) >= self._history_backlog:
+          self._samples.popleft()
+          self.stats.history_dropped += 1
+        self._samples.append((metrics, timestamp))
+      self._cond.notify()
+
+  def _run(self) -> None:
+    while True:
+      with self._cond:
+        self._cond.wait_for(lambda: self._slot is not None or self._samples or self._stopped.is_set())
+        metrics, self._slot = self._slot, None
+        samples = list(self._samples)
+        self._samples.clear()
+        stopping = self._stopped.is_set()
+
+      for sample, timestamp in samples:
+        try:
+          self.history.record(sample, timestamp)
+          self.stats.history_records += 1
+        except Exception as err:  # pragma: no cover - runtime-only
+          self.stats.failed += 1
+          print(f"[WARN] Metrics history write failed: {err}")
+      if metrics is not None:
+        try:
+          self._write(metrics)
+        except Exception as err:  # pragma: no cover - runtime-only
+          self.stats.failed += 1
+          print(f"[WARN] Metrics write to {self.path} failed: {err}")
+      if stopping:
+        return
+
+  def _write(self, metrics: CameraMetrics) -> None:
+    started = time.perf_counter()
+    payload = metrics.to_dict()
+    telemetry = {key: payload.pop(key) for key in _TELEMETRY}
+    body = json.dumps(payload, separators=(",", ":"))
+    if body == self._last_body and started - self._last_written < self.refresh_seconds:
+      self.stats.skipped += 1
+      return
+    # ts goes back in front, as in to_dict; the rest of the snapshot is never empty
+    data = (
+      f'{{"ts":{json.dumps(telemetry["ts"])},{body[1:-1]},'
+      f'"fps":{json.dumps(telemetry["fps"])},"pipeline":{json.dumps(telemetry["pipeline"], separators=(",", ":"))}}}'
+    ).encode("utf-8")
+    if self._last_body is None:
+      self.path.parent.mkdir(parents=True, exist_ok=True)
+    with self._temp_path.open("wb") as handle:
+      handle.write(data)
+      handle.flush()
+      os.fsync(handle.fileno())
+    os.replace(self._temp_path, self.path)
+    self._last_body = body
+    self._last_written = started
+    self.stats.record(time.perf_counter() - started, len(data))